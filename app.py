@@ -6,28 +6,42 @@ import os
 import io
 import csv
 import socket
+import time
 from datetime import date, timedelta
-from collections import defaultdict
-from flask import Flask, render_template, request, redirect, url_for, flash, make_response, Response, jsonify
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response, Response, jsonify, abort
 from werkzeug.exceptions import HTTPException
 import logging
 import traceback
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, User, Supplier, Client, Invoice, InvoiceItem, ActivityLog, InvoiceView, RecurringInvoice
-from utils.company_lookup import lookup_company
-from utils.pay_by_square import generate_qr_code_base64, generate_sepa_qr
+from models import db, User, Supplier, Client, Invoice, InvoiceItem, ActivityLog, RecurringInvoice
+from utils.company_lookup import lookup_company, autocomplete_companies
+from utils.company_cache import configure_company_cache
+from utils.migrations import schema_guard, SchemaOutdated
+from utils.instrumentation import init_instrumentation, timed
+from utils.profiling import init_profiling
+from utils.structured_logging import init_logging
+from utils.request_context import get_current_supplier, invalidate_supplier, current_supplier
+from utils.recurring import init_recurring_scheduler
+from utils.activity_log import writer as activity_writer
+from utils.pay_by_square import generate_sepa_qr, get_invoice_qr_code
+from utils.invoice_views import record_view as record_invoice_view
+from utils import public_invoice
+from utils.money import from_cents, sum_cents
+from utils.invoice_items import reconcile_items
 from utils.email_service import mail
 import base64
-import sentry_sdk
-from sentry_sdk.integrations.flask import FlaskIntegration
 from utils import (
     suma_slovom, format_currency, format_date_sk,
     get_payment_method_label, get_status_label, get_status_color,
     generate_pay_by_square
 )
 
-# Inicializácia Sentry (ak je DSN dostupné)
+# Inicializácia Sentry (ak je DSN dostupné) - bez DSN sa sentry_sdk vôbec nenačíta
 if os.environ.get('SENTRY_DSN'):
+    import sentry_sdk
+    from sentry_sdk.integrations.flask import FlaskIntegration
+    
     sentry_sdk.init(
         dsn=os.environ.get('SENTRY_DSN'),
         integrations=[FlaskIntegration()],
@@ -43,9 +57,15 @@ app = Flask(__name__)
 # Načítanie konfigurácie
 app.config.from_object(get_config())
 
+init_logging(app)
+
 # Inicializácia rozšírení
 db.init_app(app)
 mail.init_app(app)
+configure_company_cache(app)
+init_instrumentation(app)
+init_profiling(app)
+init_recurring_scheduler(app)
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -56,20 +76,24 @@ login_manager.login_message_category = 'error'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Flask-Login si výsledok drží v g._login_user - volá sa max. raz na request
+    return db.session.get(User, int(user_id))
 
-# Ensure database tables exist on first request (serverless-safe)
-_tables_checked = False
+@app.context_processor
+def inject_current_supplier():
+    return {'current_supplier': current_supplier}
 
+# Verzia schémy sa overí raz na proces jedným SELECT-om (migrácie: flask db-upgrade)
 @app.before_request
-def ensure_tables():
-    global _tables_checked
-    if not _tables_checked:
-        try:
-            db.create_all()
-            _tables_checked = True
-        except Exception as e:
-            app.logger.error(f"Failed to create tables: {e}")
+def check_schema_version():
+    if schema_guard.checked or not app.config.get('SCHEMA_CHECK', True):
+        return
+    try:
+        schema_guard.check(db.engine, auto_migrate=app.config.get('AUTO_MIGRATE', False), log=app.logger.info)
+    except SchemaOutdated as e:
+        app.logger.error(str(e))
+    except Exception as e:
+        app.logger.error(f"Schema version check failed: {e}")
 
 @app.route('/debug/db')
 def debug_db():
@@ -348,6 +372,8 @@ def logout():
             Invoice.query.filter_by(user_id=demo_user_id).delete()
             Client.query.filter_by(user_id=demo_user_id).delete()
             Supplier.query.filter_by(user_id=demo_user_id).delete()
+            invalidate_supplier(demo_user_id)
+            activity_writer.flush()
             ActivityLog.query.filter_by(user_id=demo_user_id).delete()
             User.query.filter_by(id=demo_user_id).delete()
             db.session.commit()
@@ -448,21 +474,18 @@ def gdpr():
 @login_required
 def dashboard():
     """Hlavný dashboard s prehľadom a analytics"""
-    app.logger.info("Accessing dashboard...")
     try:
-        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        supplier = get_current_supplier()
         
         # Všetky faktúry tohto používateľa
-        app.logger.info("Loading invoices...")
         try:
             invoices = Invoice.query.filter_by(user_id=current_user.id).all()
-            app.logger.info(f"Loaded {len(invoices)} invoices")
+            app.logger.debug('Dashboard: loaded %d invoices', len(invoices))
         except Exception as e:
-            app.logger.error(f"Failed to load invoices: {e}")
+            app.logger.error('Failed to load invoices: %s', e)
             raise e
         
         # Aktualizujeme stavy po splatnosti
-        app.logger.info("Checking overdue status...")
         try:
             changes_made = False
             for inv in invoices:
@@ -474,9 +497,9 @@ def dashboard():
             
             if changes_made:
                 db.session.commit()
-                app.logger.info("Overdue statuses updated")
+                app.logger.debug('Overdue statuses updated')
         except Exception as e:
-            app.logger.error(f"Failed to update overdue status: {e}")
+            app.logger.error('Failed to update overdue status: %s', e)
             # Non-critical, continue
         
         # Základné štatistiky
@@ -485,56 +508,66 @@ def dashboard():
         overdue_invoices = [i for i in invoices if i.is_overdue]
         issued_invoices = [i for i in invoices if i.status == Invoice.STATUS_ISSUED]
         
-        total_revenue = sum(i.total for i in paid_invoices)
-        total_pending = sum(i.total for i in issued_invoices)
-        total_overdue = sum(i.total for i in overdue_invoices)
+        # Súčty v celých centoch priamo v databáze - bez Decimal objektu na faktúru
+        is_overdue = db.or_(
+            Invoice.status == Invoice.STATUS_OVERDUE,
+            db.and_(Invoice.status == Invoice.STATUS_ISSUED, Invoice.due_date < date.today())
+        )
+        status_totals = {row.status: row for row in db.session.execute(
+            db.select(Invoice.status, sum_cents(Invoice.total).label('total'),
+                      sum_cents(Invoice.profit).label('profit'), sum_cents(Invoice.total_cost).label('cost'))
+            .where(Invoice.user_id == current_user.id).group_by(Invoice.status)
+        )}
+        paid_totals = status_totals.get(Invoice.STATUS_PAID)
+        issued_totals = status_totals.get(Invoice.STATUS_ISSUED)
+        total_revenue = from_cents(paid_totals.total if paid_totals else 0)
+        total_pending = from_cents(issued_totals.total if issued_totals else 0)
+        total_overdue = from_cents(db.session.scalar(
+            db.select(sum_cents(Invoice.total)).where(Invoice.user_id == current_user.id, is_overdue)
+        ))
         
         # === ANALYTICS ===
-        app.logger.info("Calculating analytics...")
         try:
-            active_invoices = [i for i in invoices if i.status != Invoice.STATUS_CANCELLED]
-            total_invoiced = sum(i.total for i in active_invoices)
-            total_profit = sum(i.profit for i in paid_invoices)
-            total_cost = sum(i.total_cost for i in paid_invoices)
+            total_invoiced = from_cents(sum(
+                row.total for status, row in status_totals.items() if status != Invoice.STATUS_CANCELLED
+            ))
+            total_profit = from_cents(paid_totals.profit if paid_totals else 0)
+            total_cost = from_cents(paid_totals.cost if paid_totals else 0)
             expected_income = total_pending
             
-            # Top odberateľ
-            client_totals = defaultdict(float)
-            for inv in paid_invoices:
-                client_totals[inv.client_id] += inv.total
+            paid = db.and_(Invoice.user_id == current_user.id, Invoice.status == Invoice.STATUS_PAID)
             
+            # Top odberateľ
             top_client = None
             top_client_amount = 0
-            if client_totals:
-                top_client_id = max(client_totals, key=client_totals.get)
-                top_client = Client.query.filter_by(id=top_client_id, user_id=current_user.id).first()
-                top_client_amount = client_totals[top_client_id]
+            top = db.session.execute(
+                db.select(Invoice.client_id, sum_cents(Invoice.total).label('total'))
+                .where(paid).group_by(Invoice.client_id).order_by(db.desc('total')).limit(1)
+            ).first()
+            if top:
+                top_client = Client.query.filter_by(id=top.client_id, user_id=current_user.id).first()
+                top_client_amount = from_cents(top.total)
             
             # Mesačný prehľad
+            paid_year = db.extract('year', Invoice.paid_date)
+            paid_month = db.extract('month', Invoice.paid_date)
+            months = {(int(row.year), int(row.month)): row for row in db.session.execute(
+                db.select(paid_year.label('year'), paid_month.label('month'),
+                          sum_cents(Invoice.total).label('revenue'), sum_cents(Invoice.profit).label('profit'))
+                .where(paid, Invoice.paid_date.isnot(None)).group_by(paid_year, paid_month)
+            )}
             monthly_data = []
             today = date.today()
             for i in range(5, -1, -1):
                 month_start = date(today.year, today.month, 1) - timedelta(days=30*i)
-                # month_name = month_start.strftime('%b %Y') # Simple string format
-                
-                # Bezpečný výpočet mesiaca
-                month_revenue = sum(
-                    inv.total for inv in paid_invoices 
-                    if inv.paid_date and inv.paid_date.month == month_start.month and inv.paid_date.year == month_start.year
-                )
-                month_profit = sum(
-                    inv.profit for inv in paid_invoices 
-                    if inv.paid_date and inv.paid_date.month == month_start.month and inv.paid_date.year == month_start.year
-                )
-                
+                month = months.get((month_start.year, month_start.month))
                 monthly_data.append({
                     'month': month_start.strftime('%m/%Y'),
-                    'revenue': month_revenue,
-                    'profit': month_profit
+                    'revenue': from_cents(month.revenue if month else 0),
+                    'profit': from_cents(month.profit if month else 0)
                 })
-        except Exception as e:
-            app.logger.error(f"Analytics calculation failed: {e}")
-            app.logger.error(traceback.format_exc())
+        except Exception:
+            app.logger.exception('Analytics calculation failed')
             # Fallback values
             total_invoiced = 0
             total_profit = 0
@@ -566,9 +599,8 @@ def dashboard():
             recent_activity=recent_activity,
             recent_invoices=recent_invoices
         )
-    except Exception as e:
-        app.logger.error(f"CRITICAL DASHBOARD ERROR: {e}")
-        app.logger.error(traceback.format_exc())
+    except Exception:
+        app.logger.exception('Dashboard error')
         return render_template('500.html'), 500
 
 
@@ -666,7 +698,6 @@ def client_delete(client_id):
 @login_required
 def invoices_list():
     """Zoznam faktúr"""
-    app.logger.info("Accessing invoices list...")
     try:
         status_filter = request.args.get('status', '')
         search_query = request.args.get('q', '')
@@ -684,9 +715,9 @@ def invoices_list():
                     changes = True
             if changes:
                 db.session.commit()
-                app.logger.info("Overdue statuses updated in list view")
+                app.logger.debug('Overdue statuses updated in list view')
         except Exception as e:
-            app.logger.error(f"Failed to update overdue status in list: {e}")
+            app.logger.error('Failed to update overdue status in list: %s', e)
             # Continue anyway
         
         # Filtre
@@ -704,16 +735,15 @@ def invoices_list():
             )
         
         invoices = query.order_by(Invoice.created_at.desc()).all()
-        app.logger.info(f"Loaded {len(invoices)} invoices for list")
+        app.logger.debug('Invoice list: loaded %d invoices', len(invoices))
         
         return render_template('invoices.html', 
             invoices=invoices,
             status_filter=status_filter,
             search_query=search_query
         )
-    except Exception as e:
-        app.logger.error(f"CRITICAL INVOICE LIST ERROR: {e}")
-        app.logger.error(traceback.format_exc())
+    except Exception:
+        app.logger.exception('Invoice list error')
         return render_template('500.html'), 500
 
 
@@ -721,7 +751,7 @@ def invoices_list():
 @login_required
 def invoice_add():
     """Vytvorenie novej faktúry"""
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     clients = Client.query.filter_by(user_id=current_user.id).order_by(Client.name).all()
     
     if not supplier:
@@ -733,7 +763,6 @@ def invoice_add():
         return redirect(url_for('client_add'))
     
     if request.method == 'POST':
-        app.logger.info("Processing invoice creation...")
         try:
             # Získame klienta
             client_id = request.form.get('client_id')
@@ -748,7 +777,6 @@ def invoice_add():
             
             # Generujeme číslo faktúry
             invoice_number = supplier.get_next_invoice_number()
-            app.logger.info(f"Generated invoice number: {invoice_number}")
             
             # Vytvoríme faktúru
             invoice = Invoice(
@@ -768,7 +796,6 @@ def invoice_add():
             
             db.session.add(invoice)
             db.session.flush()
-            app.logger.info(f"Invoice {invoice.id} flushed to DB")
             
             # Pridáme položky
             descriptions = request.form.getlist('item_description[]')
@@ -788,8 +815,7 @@ def invoice_add():
                     except (ValueError, IndexError):
                         qty, price, cost = 1, 0, 0
                     
-                    item = InvoiceItem(
-                        invoice_id=invoice.id,
+                    invoice.add_item(InvoiceItem(
                         description=desc.strip(),
                         item_note=item_notes[i] if i < len(item_notes) else '',
                         quantity=qty,
@@ -797,9 +823,7 @@ def invoice_add():
                         unit_price=price,
                         cost_price=cost,
                         position=i
-                    )
-                    item.calculate_total()
-                    db.session.add(item)
+                    ))
                     items_added += 1
             
             if items_added == 0:
@@ -808,38 +832,32 @@ def invoice_add():
                 return redirect(url_for('invoice_add'))
             
             db.session.flush()
-            invoice.calculate_totals()
             
             # Activity log
-            app.logger.info("Logging activity...")
             ActivityLog.log(
                 ActivityLog.ACTION_INVOICE_CREATED,
                 f'Faktúra {invoice.invoice_number} vytvorená pre {client.name}',
                 user_id=current_user.id,
                 invoice_id=invoice.id,
                 client_id=client.id,
-                extra_data={'total': invoice.total}
+                extra_data={'total': float(invoice.total)}
             )
             
             db.session.commit()
-            app.logger.info("Invoice committed successfully.")
+            app.logger.info('Invoice created', extra={'invoice_id': invoice.id, 'invoice_number': invoice.invoice_number})
             
             flash(f'Faktúra {invoice.invoice_number} bola úspešne vytvorená.', 'success')
             return redirect(url_for('invoice_detail', invoice_id=invoice.id))
             
         except ValueError as e:
             db.session.rollback()
-            print(f'ValueError pri vytváraní faktúry: {e}')
-            import traceback
-            traceback.print_exc()
+            app.logger.warning('ValueError pri vytváraní faktúry: %s', e)
             flash(f'Chyba vo formáte dát: {str(e)}', 'error')
             return redirect(url_for('invoice_add'))
             
         except Exception as e:
             db.session.rollback()
-            print(f'Chyba pri vytváraní faktúry: {e}')
-            import traceback
-            traceback.print_exc()
+            app.logger.exception('Chyba pri vytváraní faktúry')
             flash(f'Chyba pri vytváraní faktúry: {str(e)}', 'error')
             return redirect(url_for('invoice_add'))
     
@@ -860,28 +878,16 @@ def invoice_add():
 @login_required
 def invoice_detail(invoice_id):
     """Detail faktúry"""
-    app.logger.info(f"Viewing invoice {invoice_id}")
     try:
         invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-        app.logger.info(f"Invoice loaded: {invoice.invoice_number}")
         
         # Generujeme QR kód
         qr_code = None
-        if app.config.get('ENABLE_QR_CODES') and invoice.payment_method == 'prevod' and invoice.supplier.iban:
-            app.logger.info("Generating QR code...")
+        if app.config.get('ENABLE_QR_CODES'):
             try:
-                qr_code = generate_qr_code_base64(
-                    amount=invoice.total,
-                    iban=invoice.supplier.iban,
-                    swift=invoice.supplier.swift or '',
-                    variable_symbol=invoice.variable_symbol,
-                    beneficiary_name=invoice.supplier.name,
-                    due_date=invoice.due_date.strftime('%Y%m%d')
-                )
-                app.logger.info("QR code generated successfully")
-            except Exception as e:
-                app.logger.error(f"Chyba pri generovaní QR kódu: {e}")
-                app.logger.error(traceback.format_exc())
+                qr_code = get_invoice_qr_code(invoice)
+            except Exception:
+                app.logger.exception('Chyba pri generovaní QR kódu')
         
         # Parametre pre Gmail (Compose link)
         gmail_link = None
@@ -891,15 +897,14 @@ def invoice_detail(invoice_id):
             body = quote(f"Dobrý deň,\n\nv prílohe Vám zasielame faktúru č. {invoice.invoice_number}.\n\nS pozdravom,\n{invoice.supplier.name}")
             gmail_link = f"https://mail.google.com/mail/?view=cm&fs=1&to={invoice.client.email}&su={subject}&body={body}"
 
-        app.logger.info("Rendering template invoice_detail.html")
         return render_template('invoice_detail.html',
             invoice=invoice,
             qr_code=qr_code,
             gmail_link=gmail_link
         )
     except Exception as e:
-        app.logger.error(f"CRITICAL ERROR in invoice_detail: {e}")
-        app.logger.error(traceback.format_exc())
+        if not isinstance(e, HTTPException):
+            app.logger.exception('Invoice detail error')
         raise e  # Let the global handler handle it
 
 
@@ -907,50 +912,23 @@ def _get_invoice_pdf_data(invoice):
     """Pomocná funkcia na generovanie PDF dát faktúry - ReportLab verzia"""
     # Generujeme QR kód
     qr_code = None
-    if invoice.payment_method == 'prevod' and invoice.supplier.iban:
-        try:
-            qr_code = generate_qr_code_base64(
-                amount=invoice.total,
-                iban=invoice.supplier.iban,
-                swift=invoice.supplier.swift or '',
-                variable_symbol=invoice.variable_symbol,
-                beneficiary_name=invoice.supplier.name,
-                due_date=invoice.due_date.strftime('%Y%m%d')
-            )
-        except Exception as e:
-            app.logger.error(f"Chyba pri generovaní QR kódu pre PDF: {e}")
+    try:
+        qr_code = get_invoice_qr_code(invoice)
+    except Exception as e:
+        app.logger.error('Chyba pri generovaní QR kódu pre PDF: %s', e)
     
     # === REPORTLAB PDF GENERATION (PURE PYTHON) ===
-    app.logger.info("=" * 60)
-    app.logger.info(f"Starting PDF generation for invoice {invoice.invoice_number}")
-    app.logger.info("Using ReportLab (Pure Python - Zero Dependencies)")
-    
     try:
         from utils.reportlab_pdf import generate_invoice_pdf_reportlab
         
-        app.logger.info("ReportLab imported successfully")
-        app.logger.info("Generating PDF with professional layout...")
-        
-        pdf_bytes = generate_invoice_pdf_reportlab(invoice, qr_code)
-        
-        pdf_size = len(pdf_bytes)
-        app.logger.info(f"✓ PDF generated successfully! Size: {pdf_size} bytes")
-        app.logger.info("=" * 60)
+        with timed('pdf'):
+            pdf_bytes = generate_invoice_pdf_reportlab(invoice, qr_code)
         
+        app.logger.debug('PDF generated for invoice %s: %d bytes', invoice.invoice_number, len(pdf_bytes))
         return pdf_bytes, "application/pdf", True
                 
-    except ImportError as e:
-        error_msg = f"ReportLab import failed: {str(e)}"
-        app.logger.error(f"IMPORT ERROR: {error_msg}")
-        app.logger.error("Run: pip install reportlab")
-        app.logger.error(traceback.format_exc())
-        app.logger.info("=" * 60)
-        
-        return pdf_bytes, "application/pdf", True
-                
-    except ImportError as e:
-        error_msg = f"ReportLab import failed: {str(e)}"
-        app.logger.error(f"IMPORT ERROR: {error_msg}")
+    except ImportError:
+        app.logger.exception('ReportLab import failed (pip install reportlab)')
         return None, None, False
         
 
@@ -1151,7 +1129,7 @@ def invoice_mark_paid(invoice_id):
         user_id=current_user.id,
         invoice_id=invoice.id,
         client_id=invoice.client_id,
-        extra_data={'total': invoice.total, 'paid_date': str(invoice.paid_date)}
+        extra_data={'total': float(invoice.total), 'paid_date': str(invoice.paid_date)}
     )
     
     db.session.commit()
@@ -1205,7 +1183,7 @@ def invoice_delete(invoice_id):
 def invoice_edit(invoice_id):
     """Editácia existujúcej faktúry"""
     invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     clients = Client.query.filter_by(user_id=current_user.id).order_by(Client.name).all()
     
     if request.method == 'POST':
@@ -1219,11 +1197,8 @@ def invoice_edit(invoice_id):
         invoice.note = request.form.get('note', '')
         invoice.internal_note = request.form.get('internal_note', '')
         
-        # Vymažeme staré položky
-        for item in invoice.items:
-            db.session.delete(item)
-        
-        # Pridáme nové položky
+        # Položky - zapíše sa len rozdiel oproti uloženým (utils.invoice_items)
+        item_ids = request.form.getlist('item_id[]')
         descriptions = request.form.getlist('item_description[]')
         item_notes = request.form.getlist('item_note[]')
         quantities = request.form.getlist('item_quantity[]')
@@ -1231,23 +1206,24 @@ def invoice_edit(invoice_id):
         unit_prices = request.form.getlist('item_unit_price[]')
         cost_prices = request.form.getlist('item_cost_price[]')
         
+        rows = []
         for i, desc in enumerate(descriptions):
             if desc.strip():
-                item = InvoiceItem(
-                    invoice_id=invoice.id,
-                    description=desc,
-                    item_note=item_notes[i] if i < len(item_notes) else '',
-                    quantity=float(quantities[i]) if quantities[i] else 1,
-                    unit=units[i] if units[i] else 'ks',
-                    unit_price=float(unit_prices[i]) if unit_prices[i] else 0,
-                    cost_price=float(cost_prices[i]) if i < len(cost_prices) and cost_prices[i] else 0,
-                    position=i
-                )
-                item.calculate_total()
-                db.session.add(item)
+                rows.append({
+                    'id': item_ids[i] if i < len(item_ids) else None,
+                    'description': desc,
+                    'item_note': item_notes[i] if i < len(item_notes) else '',
+                    'quantity': float(quantities[i]) if quantities[i] else 1,
+                    'unit': units[i] if units[i] else 'ks',
+                    'unit_price': float(unit_prices[i]) if unit_prices[i] else 0,
+                    'cost_price': float(cost_prices[i]) if i < len(cost_prices) and cost_prices[i] else 0,
+                    'position': i,
+                })
+        reconcile_items(invoice, rows)
+        # Zmena sadzby DPH bez zmeny položiek
+        invoice.calculate_vat()
         
         db.session.flush()
-        invoice.calculate_totals()
         
         ActivityLog.log(
             ActivityLog.ACTION_INVOICE_EDITED,
@@ -1255,7 +1231,7 @@ def invoice_edit(invoice_id):
             user_id=current_user.id,
             invoice_id=invoice.id,
             client_id=invoice.client_id,
-            extra_data={'total': invoice.total}
+            extra_data={'total': float(invoice.total)}
         )
         
         db.session.commit()
@@ -1276,7 +1252,7 @@ def invoice_edit(invoice_id):
 def invoice_clone(invoice_id):
     """Klonovanie faktúry - vytvorí novú faktúru s rovnakými údajmi"""
     original = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     
     # Generujeme nové číslo faktúry
     invoice_number = supplier.get_next_invoice_number()
@@ -1303,8 +1279,7 @@ def invoice_clone(invoice_id):
     
     # Skopírujeme položky
     for orig_item in original.items:
-        new_item = InvoiceItem(
-            invoice_id=new_invoice.id,
+        new_invoice.add_item(InvoiceItem(
             description=orig_item.description,
             item_note=orig_item.item_note,
             quantity=orig_item.quantity,
@@ -1312,12 +1287,9 @@ def invoice_clone(invoice_id):
             unit_price=orig_item.unit_price,
             cost_price=orig_item.cost_price,
             position=orig_item.position
-        )
-        new_item.calculate_total()
-        db.session.add(new_item)
+        ))
     
     db.session.flush()
-    new_invoice.calculate_totals()
     
     ActivityLog.log(
         ActivityLog.ACTION_INVOICE_CREATED,
@@ -1397,7 +1369,7 @@ def invoices_export_csv():
 @login_required
 def supplier_settings():
     """Nastavenia údajov dodávateľa"""
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     
     if request.method == 'POST':
         if supplier:
@@ -1442,6 +1414,7 @@ def supplier_settings():
             db.session.add(supplier)
         
         db.session.commit()
+        invalidate_supplier(current_user.id)
         flash('Nastavenia boli uložené.', 'success')
         return redirect(url_for('supplier_settings'))
     
@@ -1521,11 +1494,94 @@ def rpo_lookup(ico):
         }), 404
 
 
+@app.route('/api/rpo/search')
+@login_required
+def rpo_search():
+    """
+    Našepkávač firiem podľa názvu alebo IČO.
+    Vracia hneď lokálne výsledky, more_coming=True znamená že klient
+    má dotaz zopakovať (upstream výsledky ešte nie sú hotové).
+    """
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 20))
+    wait = request.args.get('wait', 0.0, type=float)
+    
+    result = autocomplete_companies(query, limit, wait)
+    return jsonify({'success': True, **result})
+
+
+@app.route('/api/clients/verify', methods=['POST'])
+@login_required
+def verify_clients_api():
+    """
+    Hromadné overenie klientov používateľa voči RPO po dávkach (CLIENT_VERIFY_MAX).
+    Ďalšia dávka sa vyžiada s offset=next_offset (None = hotovo).
+    Vráti report zmenených údajov, s apply=true ich rovno uloží.
+    """
+    from utils.client_verification import verify_clients, apply_changes
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        offset = max(int(data.get('offset') or 0), 0)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Neplatný offset'}), 400
+    limit = app.config.get('CLIENT_VERIFY_MAX', 25)
+    
+    clients = Client.query.filter_by(user_id=current_user.id).order_by(Client.id) \
+        .offset(offset).limit(limit + 1).all()
+    has_more = len(clients) > limit
+    clients = clients[:limit]
+    report = verify_clients(clients, refresh=not data.get('cached', False))
+    report['next_offset'] = offset + limit if has_more else None
+    
+    if data.get('apply') and report['changed']:
+        report['updated'] = apply_changes(clients, report)
+        db.session.commit()
+    
+    return jsonify({'success': True, 'report': report})
+
+
+@app.route('/api/invoices/bulk', methods=['POST'])
+@login_required
+def api_invoices_bulk():
+    """
+    Hromadné vytvorenie faktúr - JSON {"invoices": [...]} alebo CSV súbor (pole file).
+    S ?dry_run=1 sa vstup len zvaliduje. Pri chybe sa nevytvorí žiadna faktúra.
+    """
+    from utils.bulk_invoices import bulk_create_invoices, read_input, parse_payload, BulkValidationError
+    
+    supplier = get_current_supplier()
+    if not supplier:
+        return jsonify({'success': False, 'error': 'Najprv nastavte údaje dodávateľa'}), 400
+    
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            payloads = read_input(upload.read().decode('utf-8-sig'), upload.filename or '')
+        elif request.is_json:
+            payloads = parse_payload(request.get_json(silent=True))
+        else:
+            payloads = read_input(request.get_data(as_text=True))
+        
+        limit = app.config.get('BULK_INVOICES_MAX', 5000)
+        if len(payloads) > limit:
+            return jsonify({'success': False, 'error': f'Max. {limit} faktúr na request (použite CLI bulk-invoices)'}), 413
+        
+        result = bulk_create_invoices(
+            payloads, current_user.id, supplier,
+            dry_run=request.args.get('dry_run') in ('1', 'true')
+        )
+    except BulkValidationError as e:
+        return jsonify({'success': False, 'error': str(e), 'errors': e.errors[:100]}), 400
+    
+    return jsonify({'success': True, **result}), 200 if result.get('dry_run') else 201
+
+
 @app.route('/api/upload-stamp', methods=['POST'])
 @login_required
 def upload_stamp():
     """Nahrávanie pečiatky alebo podpisu"""
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     if not supplier:
         return jsonify({'success': False, 'error': 'Najprv nastavťe údaje dodávateľa'}), 400
     
@@ -1570,7 +1626,7 @@ def upload_stamp():
 @login_required
 def remove_stamp():
     """Odstranenie peciatky alebo podpisu"""
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     if not supplier:
         return jsonify({'success': False, 'error': 'Dodavatel neexistuje'}), 400
     
@@ -1592,42 +1648,67 @@ def remove_stamp():
 
 @app.route('/invoice/view/<token>')
 def public_invoice_view(token):
-    """Verejna stranka faktury pre klienta - bez prihlasenia"""
-    from datetime import datetime
+    """Verejna stranka faktury pre klienta - bez prihlasenia, cachovatelna na CDN"""
+    invoice = public_invoice.load_public_invoice(token)
+    if invoice is None:
+        abort(404)
     
-    invoice = Invoice.query.filter_by(public_token=token).first_or_404()
+    revision = public_invoice.invoice_revision(invoice)
     
-    # Zaznamenaj zobrazenie
-    invoice.view_count = (invoice.view_count or 0) + 1
-    invoice.last_viewed_at = datetime.utcnow()
-    if not invoice.first_viewed_at:
-        invoice.first_viewed_at = datetime.utcnow()
+    def render():
+        # QR kod z cache - stranka nikdy neceka na externe API
+        qr_code = None
+        try:
+            qr_code = get_invoice_qr_code(invoice, blocking=False)
+        except Exception:
+            app.logger.exception('Chyba pri generovaní QR kódu')
+        return render_template('invoice_public.html', invoice=invoice, qr_code=qr_code)
+    
+    response = make_response(public_invoice.render_cached(token, revision, render))
+    response.set_etag(revision)
+    response.last_modified = public_invoice.last_modified(invoice)
+    response.headers['Cache-Control'] = public_invoice.cache_control()
+    return response.make_conditional(request)
+
+
+@app.route('/invoice/view/<token>/beacon', methods=['GET', 'POST'])
+def public_invoice_beacon(token):
+    """Zaznamena zobrazenie verejnej faktury (sendBeacon zo stranky)"""
+    invoice_id = public_invoice.invoice_id_for_token(token)
+    if invoice_id is not None:
+        record_invoice_view(
+            invoice_id,
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get('User-Agent')
+        )
+    response = make_response('', 204)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/api/invoices/<int:invoice_id>/views')
+@login_required
+def api_invoice_views(invoice_id):
+    """Statistiky zobrazeni faktury (len z agregatov)"""
+    from utils.view_analytics import invoice_view_summary
     
-    # Uloz detailny zaznam
-    view_record = InvoiceView(
-        invoice_id=invoice.id,
-        ip_address=request.remote_addr,
-        user_agent=request.user_agent.string[:500] if request.user_agent else None
+    owned = db.session.scalar(
+        db.select(Invoice.id).where(Invoice.id == invoice_id, Invoice.user_id == current_user.id)
     )
-    db.session.add(view_record)
-    db.session.commit()
-    
-    # Generuj QR kod
-    qr_code = None
-    if invoice.payment_method == 'prevod' and invoice.supplier.iban:
-        try:
-            qr_code = generate_qr_code_base64(
-                amount=invoice.total,
-                iban=invoice.supplier.iban,
-                swift=invoice.supplier.swift or '',
-                variable_symbol=invoice.variable_symbol,
-                beneficiary_name=invoice.supplier.name,
-                due_date=invoice.due_date.strftime('%Y%m%d')
-            )
-        except:
-            pass
+    if owned is None:
+        abort(404)
+    days = min(request.args.get('days', 30, type=int), 366)
+    return jsonify(invoice_view_summary(invoice_id, days=days))
+
+
+@app.route('/api/analytics/views')
+@login_required
+def api_views_analytics():
+    """Denne zobrazenia vsetkych faktur pouzivatela"""
+    from utils.view_analytics import user_view_summary
     
-    return render_template('invoice_public.html', invoice=invoice, qr_code=qr_code)
+    days = min(request.args.get('days', 30, type=int), 366)
+    return jsonify({'daily': user_view_summary(current_user.id, days=days)})
 
 
 @app.route('/invoices/<int:invoice_id>/generate-link', methods=['POST'])
@@ -1642,6 +1723,9 @@ def invoice_generate_link(invoice_id):
         invoice.public_token = secrets.token_urlsafe(32)
         db.session.commit()
     
+    # QR kod pre verejnu stranku sa pripravi do cache vopred
+    get_invoice_qr_code(invoice, blocking=False)
+    
     public_url = url_for('public_invoice_view', token=invoice.public_token, _external=True)
     
     return jsonify({
@@ -1759,7 +1843,7 @@ def invoices_export_excel():
 def invoices_export_xml():
     """Export faktur do XML (format pre uctovne systemy)"""
     invoices = Invoice.query.filter_by(user_id=current_user.id).order_by(Invoice.issue_date.desc()).all()
-    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    supplier = get_current_supplier()
     
     xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
     xml_content += '<Faktury xmlns="http://fakturask.sk/export" verzia="1.0">\n'
@@ -1837,6 +1921,206 @@ def invoices_export_xml():
     )
 
 
+# ==============================================================================
+# CLI PRIKAZY
+# ==============================================================================
+
+@app.cli.command('db-upgrade')
+def db_upgrade():
+    """Aplikuje chybajuce migracie databazovej schemy"""
+    from utils.migrations import migrate, get_schema_version, SCHEMA_VERSION
+    
+    with db.engine.connect() as conn:
+        current = get_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        click.echo(f'Schema je aktualna (verzia {current})')
+        return
+    version = migrate(db.engine, log=click.echo)
+    click.echo(f'Schema zmigrovana z verzie {current} na {version}')
+
+
+@app.cli.command('db-version')
+def db_version():
+    """Vypise verziu databazovej schemy"""
+    from utils.migrations import get_schema_version, SCHEMA_VERSION
+    
+    with db.engine.connect() as conn:
+        current = get_schema_version(conn)
+    click.echo(f'Databaza: {current}, kod: {SCHEMA_VERSION}')
+
+
+@app.cli.command('bulk-invoices')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Pouzivatel (dodavatel), ktoremu faktury patria')
+@click.option('--chunk-size', default=500, show_default=True, help='Faktur v jednej transakcii')
+@click.option('--dry-run', is_flag=True, help='Len zvalidovat vstup')
+def bulk_invoices_command(source, user_id, chunk_size, dry_run):
+    """Hromadne vytvori faktury z JSON alebo CSV suboru"""
+    from utils.bulk_invoices import bulk_create_invoices, read_input, BulkValidationError
+    
+    supplier = Supplier.query.filter_by(user_id=user_id).first()
+    if not supplier:
+        raise click.ClickException(f'Pouzivatel {user_id} nema nastaveneho dodavatela')
+    
+    with open(source, encoding='utf-8-sig') as f:
+        text = f.read()
+    
+    start = time.perf_counter()
+    try:
+        result = bulk_create_invoices(read_input(text, source), user_id, supplier,
+                                      chunk_size=chunk_size, dry_run=dry_run)
+    except BulkValidationError as e:
+        for error in e.errors[:50]:
+            click.echo(f"#{error['index']} {error.get('ref') or ''}: {error['error']}", err=True)
+        raise click.ClickException(f'{len(e.errors)} chyb, nevytvorila sa ziadna faktura')
+    elapsed = time.perf_counter() - start
+    
+    if dry_run:
+        click.echo(f"Vstup je platny: {result['valid']} faktur")
+        return
+    invoices = result['invoices']
+    click.echo(f"Vytvorenych {result['created']} faktur v {result['chunks']} transakciach za {elapsed:.2f} s "
+               f"({result['created'] / elapsed:.0f} faktur/s)")
+    if invoices:
+        click.echo(f"Cisla: {invoices[0]['invoice_number']} - {invoices[-1]['invoice_number']}")
+
+
+@app.cli.command('generate-recurring')
+@click.option('--date', 'on_date', type=click.DateTime(formats=['%Y-%m-%d']), help='Generovat ku dnu (default dnes)')
+@click.option('--batch-size', default=500, show_default=True, help='Sablon v jednej transakcii')
+@click.option('--max-catchup', default=36, show_default=True, help='Max. zmeskanych obdobi na sablonu')
+@click.option('--dry-run', is_flag=True, help='Len vypocitat, nic neulozit')
+def generate_recurring_command(on_date, batch_size, max_catchup, dry_run):
+    """Vygeneruje faktury zo splatnych pravidelnych sablon (spustat z cronu)"""
+    from utils.recurring import generate_recurring_invoices
+    
+    start = time.perf_counter()
+    report = generate_recurring_invoices(today=on_date.date() if on_date else None, batch_size=batch_size,
+                                         max_periods=max_catchup, dry_run=dry_run)
+    elapsed = time.perf_counter() - start
+    
+    for error in report['errors'][:50]:
+        click.echo(f"Sablona #{error['recurring_invoice_id']}: {error['error']}", err=True)
+    prefix = '[dry-run] ' if dry_run else ''
+    click.echo(f"{prefix}Sablon: {report['templates']}, vytvorenych faktur: {report['created']}, "
+               f"preskocenych (uz existuju): {report['skipped_existing']}, ukoncenych: {report['deactivated']}, "
+               f"konfliktov: {report['conflicts']}, chyb: {len(report['errors'])} "
+               f"({report['batches']} davok, {elapsed:.2f} s)")
+
+
+@app.cli.command('archive-activity')
+@click.option('--days', type=int, default=None, help='Archivovat starsie ako N dni (default ACTIVITY_LOG_RETENTION_DAYS)')
+@click.option('--batch-size', default=5000, show_default=True, help='Zaznamov v jednej transakcii')
+def archive_activity_command(days, batch_size):
+    """Presunie stare zaznamy activity logu do activity_logs_archive (spustat z cronu)"""
+    from utils.activity_log import archive_activity_logs
+    
+    moved = archive_activity_logs(older_than_days=days, batch_size=batch_size)
+    click.echo(f'Archivovanych {moved} zaznamov')
+
+
+@app.cli.command('rollup-views')
+@click.option('--batch-size', default=10000, show_default=True, help='Zobrazeni v jednej transakcii')
+@click.option('--purge', is_flag=True, help='Potom zmazat spracovane zobrazenia starsie ako retencia')
+@click.option('--retention-days', type=int, default=None, help='Retencia (default INVOICE_VIEWS_RETENTION_DAYS)')
+def rollup_views_command(batch_size, purge, retention_days):
+    """Zhrnie nove zobrazenia faktur do dennych agregatov (spustat z cronu)"""
+    from utils.view_analytics import rollup_views, purge_raw_views
+    
+    report = rollup_views(batch_size=batch_size)
+    click.echo(f"Spracovanych {report['rows']} zobrazeni v {report['batches']} davkach, "
+               f"znova prejdenych {report['rescanned']}")
+    if purge:
+        click.echo(f'Zmazanych {purge_raw_views(older_than_days=retention_days)} starych zobrazeni')
+
+
+@app.cli.command('check-totals')
+@click.option('--user-id', type=int, default=None, help='Len faktury pouzivatela')
+@click.option('--fix', is_flag=True, help='Odchylky opravit prepoctom z poloziek')
+def check_totals_command(user_id, fix):
+    """Skontroluje ulozene sumy faktur (subtotal, DPH, naklady, zisk) voci polozkam"""
+    from utils.invoice_totals import check_invoice_totals
+    
+    report = check_invoice_totals(user_id=user_id, fix=fix)
+    for drift in report['drifted'][:50]:
+        click.echo(f"{drift['invoice_number']}: {drift['field']} {drift['stored']} != {drift['expected']}")
+    click.echo(f"Skontrolovanych {report['checked']} faktur, odchylok: {len(report['drifted'])}, "
+               f"opravenych faktur: {report['fixed']}")
+
+
+@app.cli.command('warm-company-cache')
+@click.option('--remote', is_flag=True, help='Overi ICO vsetkych klientov a dodavatelov cez RPO API')
+def warm_company_cache(remote):
+    """Naplni cache firemnych udajov (lokalna databaza + volitelne RPO)"""
+    from utils.company_cache import get_company_cache, UpstreamError
+    from utils.company_lookup import get_lookup_service
+    from utils.sk_companies_db import SLOVAK_COMPANIES
+    
+    cache = get_company_cache()
+    count = cache.warm(SLOVAK_COMPANIES.values())
+    click.echo(f'Lokalna databaza: {count} firiem')
+    
+    if remote:
+        icos = {ico for (ico,) in db.session.query(Client.ico).filter(Client.ico != '').distinct()}
+        icos |= {ico for (ico,) in db.session.query(Supplier.ico).filter(Supplier.ico != '').distinct()}
+        service = get_lookup_service()
+        found = 0
+        for ico in sorted(icos):
+            ico = service._clean_ico(ico)
+            if not ico:
+                continue
+            try:
+                result = service.fetch(ico)
+            except UpstreamError as e:
+                click.echo(f'{ico}: RPO nedostupne ({e})')
+                continue
+            cache.set(ico, result)
+            if result:
+                found += 1
+        click.echo(f'RPO: {found}/{len(icos)} ICO najdenych')
+
+
+@app.cli.command('verify-clients')
+@click.option('--user-id', type=int, help='Len klienti daneho pouzivatela')
+@click.option('--workers', default=8, show_default=True, help='Pocet paralelnych lookupov')
+@click.option('--rate', default=5.0, show_default=True, help='Max. requestov na RPO za sekundu')
+@click.option('--cached', is_flag=True, help='Pouzit ceste zaznamy z cache namiesto RPO')
+@click.option('--apply', is_flag=True, help='Zapisat zmenene udaje ku klientom')
+def verify_clients_command(user_id, workers, rate, cached, apply):
+    """Overi udaje klientov (nazov, adresa, DIC, IC DPH) voci RPO"""
+    from utils.client_verification import verify_clients, apply_changes
+    
+    query = Client.query
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    clients = query.all()
+    
+    start = time.perf_counter()
+    report = verify_clients(clients, refresh=not cached, max_workers=workers, rate=rate)
+    elapsed = time.perf_counter() - start
+    
+    for entry in report['changed']:
+        click.echo(f"{entry['ico']} {entry['name']} (klient #{entry['client_id']})")
+        for field, change in entry['changes'].items():
+            click.echo(f"    {field}: '{change['old']}' -> '{change['new']}'")
+    for entry in report['not_found']:
+        click.echo(f"{entry['ico']} {entry['name']}: nenajdene v RPO")
+    for entry in report['errors']:
+        click.echo(f"{entry['ico']} {entry['name']}: {entry['error']}")
+    
+    click.echo(
+        f"Klientov: {report['checked']}, ICO: {report['unique_icos']}, "
+        f"zmenenych: {len(report['changed'])}, bez zmeny: {report['unchanged']}, "
+        f"nenajdenych: {len(report['not_found'])}, chyb: {len(report['errors'])}, "
+        f"bez ICO: {len(report['skipped'])} ({elapsed:.1f} s)"
+    )
+    
+    if apply and report['changed']:
+        updated = apply_changes(clients, report)
+        db.session.commit()
+        click.echo(f'Upravenych klientov: {updated}')
+
+
 # ==============================================================================
 # SPUSTENIE APLIKACIE
 # ==============================================================================
@@ -0,0 +1,123 @@
+"""
+Benchmark hromadného vytvárania faktúr (utils.bulk_invoices)
+Porovná pôvodnú cestu (faktúra po faktúre ako invoice_add: ORM, 2x flush,
+ActivityLog, commit) s dávkovou cestou (blok čísel, bulk INSERT, commit na dávku).
+
+Použitie:
+    python benchmark_bulk_invoices.py                       # SQLite v dočasnom adresári, 1k a 10k
+    python benchmark_bulk_invoices.py --sizes 1000 --url postgresql://...
+    python benchmark_bulk_invoices.py --skip-baseline --sizes 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import ActivityLog, Client, Invoice, InvoiceItem, Supplier, User
+from utils.bulk_invoices import create_invoices, validate_invoices
+from utils.migrations import migrate
+
+CLIENTS = 200
+
+
+def make_payloads(client_ids, count):
+    rng = random.Random(count)
+    return [{
+        'client_id': rng.choice(client_ids),
+        'issue_date': date.today().isoformat(),
+        'vat_rate': 20,
+        'items': [{'description': f'Služba {n}', 'quantity': rng.randint(1, 10), 'unit': 'hod',
+                   'unit_price': rng.randint(10, 500), 'cost_price': 5} for n in range(rng.randint(1, 5))],
+    } for _ in range(count)]
+
+
+def setup(Session, label):
+    with Session() as session:
+        user = User(email=f'bench-{label}-{time.time_ns()}@example.com', name='Benchmark')
+        user.set_password('benchmark')
+        session.add(user)
+        session.flush()
+        supplier = Supplier(user_id=user.id, name='Benchmark s.r.o.', street='Hlavná 1', city='Bratislava',
+                            zip_code='81101', ico='12345678', invoice_prefix=f'B{label}')
+        clients = [Client(user_id=user.id, name=f'Klient {n}', street='Ulica', city='Mesto', zip_code='00000',
+                          ico=f'{n:08d}') for n in range(CLIENTS)]
+        session.add(supplier)
+        session.add_all(clients)
+        session.commit()
+        return user.id, supplier.id, [client.id for client in clients]
+
+
+def run_one_by_one(Session, user_id, supplier_id, payloads):
+    """Ako invoice_add - každá faktúra vo vlastnom requeste/transakcii"""
+    for payload in payloads:
+        with Session() as session:
+            supplier = session.query(Supplier).filter_by(user_id=user_id).first()
+            session.query(Client).filter_by(user_id=user_id).order_by(Client.name).all()
+            client = session.query(Client).filter_by(id=payload['client_id'], user_id=user_id).first()
+            number = supplier.get_next_invoice_number()
+            invoice = Invoice(user_id=user_id, invoice_number=number, variable_symbol=number,
+                              supplier_id=supplier.id, client_id=client.id, issue_date=date.today(),
+                              delivery_date=date.today(), due_date=date.today() + timedelta(days=14),
+                              vat_rate=payload['vat_rate'], status=Invoice.STATUS_ISSUED)
+            session.add(invoice)
+            session.flush()
+            for position, data in enumerate(payload['items']):
+                item = InvoiceItem(invoice_id=invoice.id, description=data['description'],
+                                   quantity=data['quantity'], unit=data['unit'], unit_price=data['unit_price'],
+                                   cost_price=data['cost_price'], position=position)
+                item.calculate_total()
+                session.add(item)
+            session.flush()
+            invoice.calculate_totals()
+            session.add(ActivityLog(user_id=user_id, action=ActivityLog.ACTION_INVOICE_CREATED,
+                                    description=f'Faktúra {number}', invoice_id=invoice.id, client_id=client.id))
+            session.commit()
+
+
+def run_bulk(Session, user_id, supplier_id, payloads, chunk_size):
+    with Session() as session:
+        supplier = session.get(Supplier, supplier_id)
+        specs = validate_invoices(payloads, user_id, session=session)
+        create_invoices(user_id, supplier, specs, chunk_size=chunk_size, session=session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hromadného vytvárania faktúr')
+    parser.add_argument('--url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='URL databázy (predvolene dočasný SQLite súbor)')
+    parser.add_argument('--sizes', default='1000,10000', help='Počty faktúr, čiarkou oddelené')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--skip-baseline', action='store_true', help='Nemerať cestu faktúra po faktúre')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    url = args.url or 'sqlite:///' + os.path.join(tmp.name, 'bench.db')
+    engine = create_engine(url)
+    migrate(engine, log=lambda msg: None)
+    Session = sessionmaker(bind=engine)
+
+    print(f"Databáza: {engine.dialect.name}, dávka: {args.chunk_size}")
+    print(f"{'faktúr':>8} {'cesta':<14} {'sekúnd':>8} {'faktúr/s':>10}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        paths = [('bulk', lambda *a: run_bulk(*a, args.chunk_size))]
+        if not args.skip_baseline:
+            paths.insert(0, ('po jednej', run_one_by_one))
+        for label, run in paths:
+            user_id, supplier_id, client_ids = setup(Session, f'{size}{label[0]}')
+            payloads = make_payloads(client_ids, size)
+            start = time.perf_counter()
+            run(Session, user_id, supplier_id, payloads)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>8} {label:<14} {elapsed:>8.2f} {size / elapsed:>10.0f}")
+    engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark súčtov peňažných súm (utils.money)
+Porovná tri cesty pre súčet N súm:
+- float - pôvodné stĺpce Float, postupné sčítanie (+=) ako pôvodný dashboard
+- Decimal - Decimal objekt na riadok (presné, pomalšie)
+- centy - celé centy (int) v Pythone a SUM v SQL (sum_cents) - cesta dashboardu
+
+Okrem času vypíše aj odchýlku od presného výsledku.
+
+Použitie:
+    python benchmark_money.py                     # 100k a 1M súm v pamäti, 100k faktúr v SQLite
+    python benchmark_money.py --sizes 1000000 --rows 0
+    python benchmark_money.py --rows 50000 --url postgresql://...
+"""
+import argparse
+import operator
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from functools import reduce
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from models import Client, Invoice, Supplier, User
+from utils.migrations import migrate
+from utils.money import ZERO, from_cents, sum_cents
+
+
+def make_cents(count):
+    rng = random.Random(count)
+    return [rng.randint(1, 500000) for _ in range(count)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def deviation(total, exact):
+    """Rozdiel od presného súčtu (float presne tak, ako je uložený v pamäti)"""
+    return f'{Decimal(total) - exact:.2E}' if isinstance(total, float) else f'{total - exact}'
+
+
+def bench_memory(count):
+    cents = make_cents(count)
+    floats = [value / 100 for value in cents]
+    decimals = [Decimal(value).scaleb(-2) for value in cents]
+    exact = from_cents(sum(cents))
+
+    print(f'\n{count} súm v pamäti (presne {exact})')
+    for label, fn in (
+        ('float (+=)', lambda: reduce(operator.add, floats, 0.0)),
+        ('float sum()', lambda: sum(floats)),
+        ('Decimal', lambda: sum(decimals, ZERO)),
+        ('centy (int)', lambda: from_cents(sum(cents))),
+    ):
+        total, elapsed = timed(fn)
+        print(f'  {label:<12} {elapsed * 1000:8.1f} ms   odchýlka {deviation(total, exact)}')
+
+
+def bench_database(url, rows):
+    engine = create_engine(url)
+    migrate(engine, log=lambda msg: None)
+    Session = sessionmaker(bind=engine)
+    cents = make_cents(rows)
+
+    with Session() as session:
+        user = User(email=f'bench-money-{time.time_ns()}@example.com', name='Benchmark')
+        user.set_password('benchmark')
+        session.add(user)
+        session.flush()
+        supplier = Supplier(user_id=user.id, name='Benchmark s.r.o.', street='Hlavná 1', city='Bratislava',
+                            zip_code='81101', ico='12345678')
+        client = Client(user_id=user.id, name='Klient', street='Ulica', city='Mesto', zip_code='00000')
+        session.add_all([supplier, client])
+        session.flush()
+        session.execute(insert(Invoice), [{
+            'user_id': user.id, 'supplier_id': supplier.id, 'client_id': client.id,
+            'invoice_number': f'BM{n:08d}', 'variable_symbol': f'{n:08d}',
+            'due_date': date(2026, 1, 1), 'status': Invoice.STATUS_PAID,
+            'subtotal': from_cents(value), 'total': from_cents(value), 'profit': from_cents(value),
+        } for n, value in enumerate(cents)])
+        session.commit()
+        user_id = user.id
+
+    exact = from_cents(sum(cents))
+    where = Invoice.user_id == user_id
+    print(f'\n{rows} faktúr v databáze ({engine.dialect.name}, presne {exact})')
+    with Session() as session:
+        for label, fn in (
+            ('ORM + Decimal', lambda: sum((invoice.total for invoice in session.query(Invoice).filter(where)), ZERO)),
+            ('stĺpec + Decimal', lambda: sum(session.scalars(select(Invoice.total).where(where)), ZERO)),
+            ('SQL SUM', lambda: session.scalar(select(func.sum(Invoice.total)).where(where))),
+            ('SQL sum_cents', lambda: from_cents(session.scalar(select(sum_cents(Invoice.total)).where(where)))),
+        ):
+            session.expunge_all()
+            total, elapsed = timed(fn)
+            print(f'  {label:<17} {elapsed * 1000:8.1f} ms   odchýlka {deviation(total, exact)}')
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='Počty súm v pamäti')
+    parser.add_argument('--rows', type=int, default=100000, help='Faktúr v databáze (0 = preskočiť)')
+    parser.add_argument('--url', help='Databáza (default SQLite v dočasnom adresári)')
+    args = parser.parse_args()
+
+    for count in args.sizes:
+        bench_memory(count)
+    if args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_database(args.url or 'sqlite:///' + os.path.join(tmp, 'benchmark.db'), args.rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
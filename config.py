@@ -1,9 +1,95 @@
 import os
 import socket
 import re
+import tempfile
 from datetime import timedelta
 
 
+# ==============================================================================
+# PROFILY DATABÁZOVÉHO ENGINE
+# ==============================================================================
+
+# TCP keepalive pre dlhodobé spojenia na PostgreSQL (psycopg2)
+_PG_KEEPALIVES = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 5,
+}
+
+ENGINE_PROFILES = {
+    # Dlho bežiaci gunicorn worker s priamym spojením na PostgreSQL
+    'gunicorn': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'pool_use_lifo': True,  # nevyužité spojenia dožijú a pool sa zmenší
+        'connect_args': dict(_PG_KEEPALIVES, connect_timeout=10,
+                             options='-c statement_timeout=30000'),
+    },
+    # Serverless (Vercel) - spojenie nežije dlhšie ako request, pooluje pooler
+    'serverless': {
+        'poolclass': 'NullPool',
+        'connect_args': {'connect_timeout': 5},
+    },
+    # Transakčný pooler (Supabase :6543, PgBouncer) - malý pool, krátka životnosť,
+    # žiadne session nastavenia ani server-side prepared statements
+    'transaction_pooler': {
+        'pool_size': 2,
+        'max_overflow': 3,
+        'pool_timeout': 5,
+        'pool_recycle': 60,
+        'pool_pre_ping': True,
+        'connect_args': dict(_PG_KEEPALIVES, connect_timeout=5),
+    },
+    # Lokálny vývoj a testy
+    'sqlite': {
+        'pool_pre_ping': False,
+    },
+}
+
+
+def is_serverless():
+    """Vercel / AWS Lambda - proces sa po odpovedi zmrazí alebo ukončí bez atexit"""
+    return bool(os.environ.get('VERCEL') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+
+
+def detect_engine_profile(uri):
+    """Zvolí profil podľa prostredia a URI databázy"""
+    if not uri or uri.startswith('sqlite'):
+        return 'sqlite'
+    if is_serverless():
+        return 'serverless'
+    if ':6543' in uri or 'pooler.' in uri or 'pgbouncer=true' in uri:
+        return 'transaction_pooler'
+    return 'gunicorn'
+
+
+def engine_options(profile, uri):
+    """Vráti SQLALCHEMY_ENGINE_OPTIONS pre profil ('auto' = podľa prostredia)"""
+    if not profile or profile == 'auto':
+        profile = detect_engine_profile(uri)
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f'Neznámy profil databázy: {profile} (možnosti: {", ".join(ENGINE_PROFILES)})')
+
+    options = dict(ENGINE_PROFILES[profile])
+    options['connect_args'] = dict(options.get('connect_args', {}))
+
+    if options.get('poolclass') == 'NullPool':
+        from sqlalchemy.pool import NullPool
+        options['poolclass'] = NullPool
+
+    # psycopg 3 pripravuje dotazy na serveri - cez transakčný pooler to nefunguje
+    if uri and uri.startswith('postgresql+psycopg:') and profile in ('serverless', 'transaction_pooler'):
+        options['connect_args']['prepare_threshold'] = None
+
+    if not options['connect_args']:
+        del options['connect_args']
+    return options
+
+
 class Config:
     """Základná konfigurácia"""
     
@@ -15,10 +101,9 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'fakturacny_system.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-    }
+    # Profil engine: auto, gunicorn, serverless, transaction_pooler, sqlite
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'auto')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DB_ENGINE_PROFILE, SQLALCHEMY_DATABASE_URI)
     
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(
@@ -45,9 +130,89 @@ class Config:
     CACHE_TYPE = 'simple'
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minút
     
+    # Cache firemných údajov (IČO lookup) - 'sqlite', 'database' alebo 'memory'
+    COMPANY_CACHE_BACKEND = os.environ.get('COMPANY_CACHE_BACKEND', 'sqlite')
+    COMPANY_CACHE_PATH = os.environ.get('COMPANY_CACHE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'fakturask_company_cache.sqlite3')
+    COMPANY_CACHE_TTL = int(os.environ.get('COMPANY_CACHE_TTL', 7 * 86400))  # 7 dní
+    COMPANY_CACHE_STALE_TTL = int(os.environ.get('COMPANY_CACHE_STALE_TTL', 30 * 86400))
+    COMPANY_CACHE_NEGATIVE_TTL = int(os.environ.get('COMPANY_CACHE_NEGATIVE_TTL', 86400))
+    
+    # Schéma databázy - verzia sa overí raz na proces, migrácie cez `flask db-upgrade`
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'True') == 'True'
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'False') == 'True'
+    
+    # Meranie requestov (Server-Timing, /metrics, log pomalých requestov)
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'True') == 'True'
+    # Server-Timing hlavička: 'admin' (len prihlásení admini), 'all', 'off';
+    # verejné (cachovateľné) stránky ju nedostanú nikdy
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'admin')
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))
+    # Bearer token pre /metrics - bez tokenu je endpoint mimo debug režimu 404
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Dodávateľ v cache naprieč requestami (s) - predvolene vypnuté, dodávateľ sa
+    # načíta raz na request. Pri zapnutí sa zmena nastavení v ostatných workeroch
+    # prejaví najneskôr po tomto čase (platobné údaje sa z cache neberú nikdy)
+    SUPPLIER_CACHE_TTL = int(os.environ.get('SUPPLIER_CACHE_TTL', 0))
+    
+    # Číslovanie faktúr - rad začína každý rok od 1
+    INVOICE_NUMBER_YEARLY_RESET = os.environ.get('INVOICE_NUMBER_YEARLY_RESET', 'True') == 'True'
+    
+    # Overenie klientov cez API - max. klientov na request (ďalšie cez offset,
+    # celý zoznam naraz cez CLI verify-clients)
+    CLIENT_VERIFY_MAX = int(os.environ.get('CLIENT_VERIFY_MAX', 25))
+    
+    # Hromadné vytváranie faktúr cez API (väčšie dávky cez CLI bulk-invoices)
+    BULK_INVOICES_MAX = int(os.environ.get('BULK_INVOICES_MAX', 5000))
+    
+    # Pravidelné faktúry - v produkcii cron `flask generate-recurring`,
+    # bez cronu lokálny plánovač v procese aplikácie (interval v s)
+    RECURRING_SCHEDULER_ENABLED = os.environ.get('RECURRING_SCHEDULER_ENABLED', 'False') == 'True'
+    RECURRING_INTERVAL = int(os.environ.get('RECURRING_INTERVAL', 3600))
+    
+    # Activity log - zápis po dávkach vláknom na pozadí (False = hneď po commite);
+    # na serverless predvolene synchrónne - vlákno na pozadí by záznamy stratilo
+    ACTIVITY_LOG_ASYNC = os.environ.get('ACTIVITY_LOG_ASYNC', str(not is_serverless())) == 'True'
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 200))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0))
+    ACTIVITY_LOG_MAX_BUFFER = int(os.environ.get('ACTIVITY_LOG_MAX_BUFFER', 10000))
+    # Staršie záznamy presúva `flask archive-activity` do activity_logs_archive
+    ACTIVITY_LOG_RETENTION_DAYS = int(os.environ.get('ACTIVITY_LOG_RETENTION_DAYS', 365))
+    
+    # Zobrazenia verejnej faktúry - zápis po dávkach na pozadí (na serverless
+    # predvolene synchrónne), opakované zobrazenie z rovnakej IP a prehliadača
+    # sa v okne (s) nepočíta - best-effort, každý worker má vlastnú pamäť
+    INVOICE_VIEWS_ASYNC = os.environ.get('INVOICE_VIEWS_ASYNC', str(not is_serverless())) == 'True'
+    INVOICE_VIEWS_BATCH_SIZE = int(os.environ.get('INVOICE_VIEWS_BATCH_SIZE', 500))
+    INVOICE_VIEWS_FLUSH_INTERVAL = float(os.environ.get('INVOICE_VIEWS_FLUSH_INTERVAL', 5.0))
+    INVOICE_VIEW_DEDUPE_WINDOW = int(os.environ.get('INVOICE_VIEW_DEDUPE_WINDOW', 1800))
+    # Surové zobrazenia sa po zhrnutí (`flask rollup-views --purge`) držia len tento počet dní
+    INVOICE_VIEWS_RETENTION_DAYS = int(os.environ.get('INVOICE_VIEWS_RETENTION_DAYS', 90))
+    
+    # Verejná stránka faktúry - cache HTML na revíziu (s, 0 = vypnutá)
+    # a Cache-Control pre prehliadač (max-age) a CDN (s-maxage)
+    PUBLIC_PAGE_CACHE_TTL = int(os.environ.get('PUBLIC_PAGE_CACHE_TTL', 600))
+    PUBLIC_PAGE_MAX_AGE = int(os.environ.get('PUBLIC_PAGE_MAX_AGE', 60))
+    PUBLIC_PAGE_CDN_MAX_AGE = int(os.environ.get('PUBLIC_PAGE_CDN_MAX_AGE', 300))
+    
+    # Administrátori (čiarkou oddelené e-maily) - napr. profilovanie requestov
+    ADMIN_EMAILS = frozenset(
+        email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()
+    )
+    
+    # Profilovanie na požiadanie (?_profile=1 alebo ?_profile=sample, len admin)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'True') == 'True'
+    PROFILING_DIR = os.environ.get('PROFILING_DIR')  # predvolene <tmp>/fakturask_profiles
+    PROFILING_MIN_INTERVAL = int(os.environ.get('PROFILING_MIN_INTERVAL', 30))  # s na používateľa
+    PROFILING_MAX_PER_HOUR = int(os.environ.get('PROFILING_MAX_PER_HOUR', 20))  # na proces
+    PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 50))
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text | json
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')  # napr. "utils.pay_by_square=WARNING,app=DEBUG"
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')  # napr. "utils.company_lookup=0.1"
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
     
     # Email konfigurácia (SendGrid)
@@ -67,6 +232,7 @@ class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = False
     SESSION_COOKIE_SECURE = False
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'True') == 'True'
 
 
 class ProductionConfig(Config):
@@ -74,6 +240,7 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
     
     # PostgreSQL pre production
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
@@ -155,19 +322,8 @@ class ProductionConfig(Config):
     if SQLALCHEMY_DATABASE_URI and ('supabase.co' in SQLALCHEMY_DATABASE_URI or 'rlwy.net' in SQLALCHEMY_DATABASE_URI):
         SQLALCHEMY_DATABASE_URI = resolve_db_host.__func__(SQLALCHEMY_DATABASE_URI)
     
-    # Serverless-optimized pool settings
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 60,
-        'pool_size': 2,
-        'max_overflow': 3,
-        'connect_args': {
-            'keepalives': 1,
-            'keepalives_idle': 30,
-            'keepalives_interval': 10,
-            'keepalives_count': 5,
-        }
-    }
+    # Pool podľa profilu (po prepise URI na pooler)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(Config.DB_ENGINE_PROFILE, SQLALCHEMY_DATABASE_URI)
 
 
 class TestingConfig(Config):
@@ -175,8 +331,14 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options('sqlite', SQLALCHEMY_DATABASE_URI)
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    COMPANY_CACHE_BACKEND = 'memory'
+    AUTO_MIGRATE = True
+    SUPPLIER_CACHE_TTL = 0
+    ACTIVITY_LOG_ASYNC = False
+    INVOICE_VIEWS_ASYNC = False
 
 
 # Mapa konfigurácií
@@ -0,0 +1,131 @@
+"""
+Import databázy firiem do kompaktného SQLite súboru
+Vytvorí utils/data/sk_companies.sqlite3 z CSV alebo JSON dumpu (napr. RPO export).
+
+Použitie:
+    python import_companies.py dump.csv
+    python import_companies.py dump.json --output utils/data/sk_companies.sqlite3
+    python import_companies.py rpo.csv --append
+
+CSV musí mať hlavičku. Stĺpce sa mapujú aj z RPO názvov (cin, nazov, obec, psc...).
+JSON môže byť zoznam záznamov alebo objekt {ico: záznam}.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from utils.sk_companies_db import DEFAULT_DB_PATH, FIELDS, create_schema
+
+
+# Alternatívne názvy stĺpcov v dumpoch
+COLUMN_ALIASES = {
+    'ico': ('ico', 'cin', 'ičo', 'id'),
+    'name': ('name', 'nazov', 'obchodne_meno', 'full_name', 'formatted_name'),
+    'street': ('street', 'ulica', 'formatted_street'),
+    'city': ('city', 'obec', 'municipality'),
+    'zip_code': ('zip_code', 'psc', 'postal_code', 'zip'),
+    'dic': ('dic', 'tin', 'tax_id'),
+    'ic_dph': ('ic_dph', 'vatin', 'vat_id'),
+    'legal_form': ('legal_form', 'pravna_forma'),
+}
+
+BATCH_SIZE = 5000
+
+
+def normalize_record(raw):
+    """Namapuje záznam z dumpu na stĺpce tabuľky, None ak chýba IČO alebo názov"""
+    lowered = {str(k).strip().lower(): v for k, v in raw.items()}
+    record = {}
+    for field in FIELDS:
+        value = ''
+        for alias in COLUMN_ALIASES[field]:
+            if lowered.get(alias) not in (None, ''):
+                value = lowered[alias]
+                break
+        if isinstance(value, dict):
+            value = value.get('name', value.get('value', ''))
+        record[field] = str(value).strip()
+
+    ico = ''.join(ch for ch in record['ico'] if ch.isdigit())
+    if not ico or not record['name'] or len(ico) > 8:
+        return None
+    record['ico'] = ico.zfill(8)
+    record['zip_code'] = record['zip_code'].replace(' ', '')
+    return record
+
+
+def read_records(path):
+    """Načíta záznamy z CSV alebo JSON súboru"""
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.values()
+        yield from data
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            yield from csv.DictReader(f, dialect=dialect)
+
+
+def import_companies(source, output=DEFAULT_DB_PATH, append=False):
+    """Naimportuje záznamy do SQLite súboru, vráti (importované, preskočené)"""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp_path = output if append else output + '.tmp'
+    if not append and os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    create_schema(conn)
+    placeholders = ', '.join('?' for _ in FIELDS)
+    insert_sql = f"INSERT OR REPLACE INTO companies ({', '.join(FIELDS)}) VALUES ({placeholders})"
+
+    imported = skipped = 0
+    batch = []
+    for raw in read_records(source):
+        record = normalize_record(raw)
+        if record is None:
+            skipped += 1
+            continue
+        batch.append(tuple(record[field] for field in FIELDS))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(insert_sql, batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(insert_sql, batch)
+        imported += len(batch)
+
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+    if not append:
+        os.replace(tmp_path, output)
+    return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import databázy firiem do SQLite')
+    parser.add_argument('source', help='CSV alebo JSON dump')
+    parser.add_argument('--output', '-o', default=DEFAULT_DB_PATH, help='Cieľový SQLite súbor')
+    parser.add_argument('--append', action='store_true', help='Doplniť do existujúceho súboru')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    imported, skipped = import_companies(args.source, args.output, args.append)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ Importovaných firiem: {imported} (preskočených: {skipped})")
+    print(f"✓ Súbor: {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB, {elapsed:.1f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Záťažový test našepkávača firiem (/api/rpo/search)
+Simuluje používateľov, ktorí píšu názov firmy po znakoch (debounce ako v UI).
+
+Použitie:
+    python loadtest_autocomplete.py                       # in-process, simulovaný upstream
+    python loadtest_autocomplete.py --users 50 --upstream-ms 800
+    python loadtest_autocomplete.py --url http://localhost:5000 --email a@b.sk --password heslo
+
+In-process režim volá autocomplete_companies() priamo a upstream nahradí
+oneskorením --upstream-ms, aby test nezaťažoval Ekosystém.Digital API.
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+QUERIES = [
+    'Slovenská sporiteľňa', 'Tatra banka', 'Všeobecná úverová banka',
+    'Orange Slovensko', 'Slovak Telekom', 'Slovnaft', 'Volkswagen Slovakia',
+    'Kia Slovakia', 'Železnice Slovenskej republiky', 'Lidl Slovenská republika',
+    'Slovenské elektrárne', 'Poštová banka', 'Stavebná sporiteľňa',
+]
+
+
+def typing_burst(query, keystroke_ms, debounce_ms):
+    """Prefixy, ktoré reálne odídu na server (UI posiela až po debounce)"""
+    sent = []
+    for i in range(2, len(query) + 1):
+        # Náhodná pauza medzi znakmi - dlhšia ako debounce znamená odoslaný dotaz
+        pause = random.expovariate(1 / keystroke_ms)
+        if pause >= debounce_ms or i == len(query):
+            sent.append(query[:i])
+    return sent
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class InProcessClient:
+    """Volá autocomplete priamo, upstream je simulovaný oneskorením"""
+
+    def __init__(self, upstream_ms):
+        from utils import company_lookup
+
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+        service = company_lookup.get_lookup_service()
+
+        def fake_search_remote(query, limit=10, timeout=10):
+            with self._lock:
+                self.upstream_calls += 1
+            time.sleep(min(upstream_ms / 1000, timeout))
+            return []
+
+        service.search_remote = fake_search_remote
+        self._autocomplete = company_lookup.autocomplete_companies
+
+    def search(self, query, wait):
+        return self._autocomplete(query, 10, wait)
+
+
+class HttpClient:
+    """Volá bežiaci server cez HTTP (prihlásená session)"""
+
+    def __init__(self, url, email, password):
+        import requests
+        self.url = url.rstrip('/')
+        self.upstream_calls = None
+        self._local = threading.local()
+        self._credentials = {'email': email, 'password': password}
+        self._requests = requests
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._requests.Session()
+            session.post(f'{self.url}/login', data=self._credentials, timeout=10)
+            self._local.session = session
+        return session
+
+    def search(self, query, wait):
+        response = self._session().get(
+            f'{self.url}/api/rpo/search', params={'q': query, 'wait': wait}, timeout=15
+        )
+        return response.json()
+
+
+def run_user(client, bursts, args, stats, lock):
+    for _ in range(bursts):
+        query = random.choice(QUERIES)
+        for prefix in typing_burst(query, args.keystroke_ms, args.debounce_ms):
+            start = time.perf_counter()
+            result = client.search(prefix, 0)
+            first = time.perf_counter() - start
+            followup = None
+            if result.get('more_coming'):
+                # UI hneď zobrazí lokálne výsledky a zopakuje dotaz s čakaním
+                start = time.perf_counter()
+                client.search(prefix, 1)
+                followup = time.perf_counter() - start
+            with lock:
+                stats['first'].append(first)
+                stats['more_coming'] += bool(result.get('more_coming'))
+                if followup is not None:
+                    stats['followup'].append(followup)
+            time.sleep(args.debounce_ms / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Záťažový test našepkávača firiem')
+    parser.add_argument('--users', type=int, default=20, help='Počet súbežných používateľov')
+    parser.add_argument('--bursts', type=int, default=5, help='Počet písaných názvov na používateľa')
+    parser.add_argument('--keystroke-ms', type=float, default=120, help='Priemerná pauza medzi znakmi')
+    parser.add_argument('--debounce-ms', type=float, default=250, help='Debounce v UI')
+    parser.add_argument('--upstream-ms', type=float, default=400, help='Simulovaná latencia upstream (in-process)')
+    parser.add_argument('--url', help='URL bežiaceho servera (inak in-process)')
+    parser.add_argument('--email', help='Prihlasovací email (pre --url)')
+    parser.add_argument('--password', help='Heslo (pre --url)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.url:
+        client = HttpClient(args.url, args.email, args.password)
+    else:
+        client = InProcessClient(args.upstream_ms)
+
+    stats = {'first': [], 'followup': [], 'more_coming': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_user, args=(client, args.bursts, args, stats, lock))
+        for _ in range(args.users)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    requests_sent = len(stats['first']) + len(stats['followup'])
+    print(f"Používatelia: {args.users}, dotazov: {len(stats['first'])}, requestov: {requests_sent}, čas: {elapsed:.1f} s")
+    print(f"Prvá odpoveď   p50 {percentile(stats['first'], 50) * 1000:7.1f} ms   "
+          f"p95 {percentile(stats['first'], 95) * 1000:7.1f} ms   "
+          f"p99 {percentile(stats['first'], 99) * 1000:7.1f} ms")
+    if stats['followup']:
+        print(f"Doplnenie      p50 {percentile(stats['followup'], 50) * 1000:7.1f} ms   "
+              f"p95 {percentile(stats['followup'], 95) * 1000:7.1f} ms   "
+              f"priemer {statistics.mean(stats['followup']) * 1000:.1f} ms")
+    print(f"more_coming:   {stats['more_coming']} z {len(stats['first'])}")
+    if client.upstream_calls is not None:
+        print(f"Upstream volaní: {client.upstream_calls} (single-flight + cache)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
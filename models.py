@@ -1,13 +1,25 @@
 """
 Databázové modely pre fakturačný systém
 """
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from utils.money import Money, ZERO, money, percent_of, to_decimal
+
 db = SQLAlchemy()
 
+# JSON stĺpec - na PostgreSQL natívny JSONB, inde JSON (SQLite: text)
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
+
+
+def utcnow():
+    """Aktuálny čas UTC bez časovej zóny (ako stĺpce DateTime), náhrada datetime.utcnow()"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class User(UserMixin, db.Model):
     """Používateľ systému"""
@@ -34,6 +46,12 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         """Overuje heslo"""
         return check_password_hash(self.password_hash, password)
+
+    @property
+    def is_admin(self):
+        """Admin = e-mail v ADMIN_EMAILS (konfigurácia, nie stĺpec v DB)"""
+        from flask import current_app
+        return (self.email or '').lower() in current_app.config.get('ADMIN_EMAILS', ())
     
     def __repr__(self):
         return f'<User {self.email}>'
@@ -61,18 +79,30 @@ class Supplier(db.Model):
     phone = db.Column(db.String(20))
     web = db.Column(db.String(100))
     invoice_prefix = db.Column(db.String(10), default='')  # Prefix pre čísla faktúr
-    next_invoice_number = db.Column(db.Integer, default=1)  # Ďalšie číslo faktúry
+    # Pôvodné počítadlo - od migrácie 2 sa čísla prideľujú z InvoiceSequence
+    next_invoice_number = db.Column(db.Integer, default=1)
     
-    # Pečiatka a podpis (Base64 kódované obrázky)
-    stamp_image = db.Column(db.Text)  # Pečiatka (Base64)
-    signature_image = db.Column(db.Text)  # Podpis (Base64)
+    # Pečiatka a podpis (Base64 kódované obrázky, desiatky kB)
+    # Načítajú sa až pri prístupe (PDF, nastavenia) - obe naraz jedným SELECT-om
+    stamp_image = deferred(db.Column(db.Text), group='images')  # Pečiatka (Base64)
+    signature_image = deferred(db.Column(db.Text), group='images')  # Podpis (Base64)
     
     def get_next_invoice_number(self):
-        """Vygeneruje ďalšie číslo faktúry"""
-        year = datetime.now().year
-        number = f"{self.invoice_prefix}{year}{self.next_invoice_number:04d}"
-        self.next_invoice_number += 1
-        return number
+        """Pridelí ďalšie číslo faktúry (atomicky, viď utils.invoice_numbering)"""
+        from utils.invoice_numbering import allocate_invoice_number
+        return allocate_invoice_number(self)
+
+
+class InvoiceSequence(db.Model):
+    """Číselný rad faktúr dodávateľa - jeden riadok na rok (0 = bez ročného resetu)"""
+    __tablename__ = 'invoice_sequences'
+    
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    next_number = db.Column(db.Integer, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<InvoiceSequence {self.supplier_id}/{self.year}: {self.next_number}>'
 
 
 class Client(db.Model):
@@ -102,6 +132,10 @@ class Client(db.Model):
 class Invoice(db.Model):
     """Faktúra"""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('uq_invoices_user_number', 'user_id', 'invoice_number', unique=True),
+        db.Index('uq_invoices_recurring_period', 'recurring_invoice_id', 'recurring_period', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -127,10 +161,14 @@ class Invoice(db.Model):
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
     
     # Sumy (ukladané pre históriu)
-    subtotal = db.Column(db.Float, default=0.0)  # Medzisúčet bez DPH
+    subtotal = db.Column(Money, default=ZERO)  # Medzisúčet bez DPH
     vat_rate = db.Column(db.Float, default=0.0)  # Sadzba DPH (0 alebo 20)
-    vat_amount = db.Column(db.Float, default=0.0)  # Suma DPH
-    total = db.Column(db.Float, default=0.0)  # Celková suma
+    vat_amount = db.Column(Money, default=ZERO)  # Suma DPH
+    total = db.Column(Money, default=ZERO)  # Celková suma
+    # Nákupná cena a zisk - udržiavané pri zmene položiek (add_item/update_item/remove_item),
+    # čítanie (dashboard, exporty) nemusí prechádzať položky
+    total_cost = db.Column(Money, default=ZERO, nullable=False)
+    profit = db.Column(Money, default=ZERO, nullable=False)
     
     # Stav
     STATUS_DRAFT = 'draft'
@@ -155,20 +193,59 @@ class Invoice(db.Model):
     last_viewed_at = db.Column(db.DateTime)  # Posledny pristup
     view_count = db.Column(db.Integer, default=0)  # Pocet zobrazeni
     
+    # Vygenerované z pravidelnej faktúry - šablóna a obdobie (max. jedna faktúra na obdobie)
+    recurring_invoice_id = db.Column(db.Integer, db.ForeignKey('recurring_invoices.id', ondelete='SET NULL'))
+    recurring_period = db.Column(db.Date)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Položky faktúry
-    items = db.relationship('InvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
+    items = db.relationship('InvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan',
+                            order_by='InvoiceItem.position')
     
     def calculate_totals(self):
-        """Prepočíta sumy faktúry"""
-        self.subtotal = sum(item.total for item in self.items)
-        if self.vat_rate > 0:
-            self.vat_amount = round(self.subtotal * (self.vat_rate / 100), 2)
+        """Prepočíta sumy faktúry zo všetkých položiek"""
+        self.subtotal = sum((money(item.total) for item in self.items), ZERO)
+        self.total_cost = sum((item.cost_total for item in self.items), ZERO)
+        self.calculate_vat()
+    
+    def calculate_vat(self):
+        """Prepočíta DPH, celkovú sumu a zisk z medzisúčtu (bez položiek)"""
+        self.subtotal = money(self.subtotal)
+        if self.vat_rate and self.vat_rate > 0:
+            self.vat_amount = percent_of(self.subtotal, self.vat_rate)
         else:
-            self.vat_amount = 0.0
-        self.total = round(self.subtotal + self.vat_amount, 2)
+            self.vat_amount = ZERO
+        self.total = self.subtotal + self.vat_amount
+        self.profit = self.subtotal - money(self.total_cost)
+    
+    def apply_item_delta(self, total_delta, cost_delta):
+        """Upraví sumy o rozdiel položiek (bez ich načítania)"""
+        self.subtotal = money(self.subtotal) + total_delta
+        self.total_cost = money(self.total_cost) + cost_delta
+        self.calculate_vat()
+    
+    def add_item(self, item):
+        """Pridá položku a prirátá ju k sumám"""
+        item.calculate_total()
+        self.items.append(item)
+        self.apply_item_delta(item.total, item.cost_total)
+        return item
+    
+    def update_item(self, item, **fields):
+        """Zmení položku a upraví sumy o rozdiel"""
+        old_total, old_cost = money(item.total), item.cost_total
+        for key, value in fields.items():
+            setattr(item, key, value)
+        item.calculate_total()
+        self.apply_item_delta(item.total - old_total, item.cost_total - old_cost)
+        return item
+    
+    def remove_item(self, item):
+        """Odoberie položku (zmaže sa) a odpočíta ju zo súm"""
+        self.items.remove(item)
+        self.apply_item_delta(-money(item.total), -item.cost_total)
     
     def check_overdue(self):
         """Skontroluje či je faktúra po splatnosti"""
@@ -185,16 +262,6 @@ class Invoice(db.Model):
             self.status == self.STATUS_ISSUED and self.due_date < date.today()
         )
     
-    @property
-    def total_cost(self):
-        """Celková nákupná cena"""
-        return sum((item.cost_price or 0) * item.quantity for item in self.items)
-    
-    @property
-    def profit(self):
-        """Celkový zisk z faktúry"""
-        return round(self.subtotal - self.total_cost, 2)
-    
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
 
@@ -210,29 +277,37 @@ class InvoiceItem(db.Model):
     item_note = db.Column(db.Text)  # Samostatný popis/poznámka k položke
     quantity = db.Column(db.Float, default=1.0)  # Množstvo
     unit = db.Column(db.String(20), default='ks')  # Jednotka (ks, hod, ...)
-    unit_price = db.Column(db.Float, nullable=False)  # Jednotková cena
-    cost_price = db.Column(db.Float, default=0.0)  # Nákupná cena (pre výpočet zisku)
-    total = db.Column(db.Float, nullable=False)  # Celkom za položku
+    unit_price = db.Column(Money, nullable=False)  # Jednotková cena
+    cost_price = db.Column(Money, default=ZERO)  # Nákupná cena (pre výpočet zisku)
+    total = db.Column(Money, nullable=False)  # Celkom za položku
     
     position = db.Column(db.Integer, default=0)  # Poradie položky
     
     def calculate_total(self):
         """Vypočíta celkovú cenu položky"""
-        self.total = round(self.quantity * self.unit_price, 2)
+        self.total = money(to_decimal(self.quantity) * to_decimal(self.unit_price))
+    
+    @property
+    def cost_total(self):
+        """Nákupná cena za položku"""
+        return money(to_decimal(self.cost_price) * to_decimal(self.quantity))
     
     @property
     def profit(self):
         """Vypočíta zisk z položky"""
-        cost = (self.cost_price or 0) * self.quantity
-        return round(self.total - cost, 2)
+        return money(self.total) - self.cost_total
     
     def __repr__(self):
         return f'<InvoiceItem {self.description[:30]}>'
 
 
 class ActivityLog(db.Model):
-    """Audit log - história akcií v systéme"""
+    """Audit log - história akcií v systéme (len pribúda, zápis cez utils.activity_log)"""
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # Posledná aktivita používateľa (dashboard) - bez triedenia celej tabuľky
+        db.Index('ix_activity_logs_user_created', 'user_id', db.text('created_at DESC')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -240,6 +315,7 @@ class ActivityLog(db.Model):
     # Typ akcie
     ACTION_INVOICE_CREATED = 'invoice_created'
     ACTION_INVOICE_EDITED = 'invoice_edited'
+    ACTION_INVOICE_SENT = 'invoice_sent'
     ACTION_INVOICE_PAID = 'invoice_paid'
     ACTION_INVOICE_CANCELLED = 'invoice_cancelled'
     ACTION_INVOICE_DELETED = 'invoice_deleted'
@@ -254,7 +330,7 @@ class ActivityLog(db.Model):
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='SET NULL'), nullable=True)
     
     # Dodatočné údaje (JSON)
-    extra_data = db.Column(db.Text)  # JSON s dodatočnými informáciami
+    extra_data = db.Column(JSONType)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -264,26 +340,51 @@ class ActivityLog(db.Model):
     
     @classmethod
     def log(cls, action, description, user_id, invoice_id=None, client_id=None, extra_data=None):
-        """Pomocná metóda na vytvorenie záznamu"""
-        import json
-        log_entry = cls(
-            user_id=user_id,
-            action=action,
-            description=description,
-            invoice_id=invoice_id,
-            client_id=client_id,
-            extra_data=json.dumps(extra_data) if extra_data else None
-        )
-        db.session.add(log_entry)
-        return log_entry
+        """
+        Zaznamená akciu - zapíše sa až po commite session (hromadne, mimo requestu),
+        pri rollbacku sa zahodí. Vráti riadok záznamu (dict).
+        """
+        from utils.activity_log import record
+        return record(db.session, {
+            'user_id': user_id,
+            'action': action,
+            'description': description[:500],
+            'invoice_id': invoice_id,
+            'client_id': client_id,
+            'extra_data': extra_data or None,
+            'created_at': utcnow(),
+        })
     
     def __repr__(self):
         return f'<ActivityLog {self.action}: {self.description[:30]}>'
 
 
+class ActivityLogArchive(db.Model):
+    """Archív starých záznamov activity logu (bez cudzích kľúčov, presúva archive_activity_logs)"""
+    __tablename__ = 'activity_logs_archive'
+    __table_args__ = (
+        db.Index('ix_activity_logs_archive_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.String(500), nullable=False)
+    invoice_id = db.Column(db.Integer)
+    client_id = db.Column(db.Integer)
+    extra_data = db.Column(JSONType)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=utcnow)
+
+
 class InvoiceView(db.Model):
-    """Zaznam o zobrazeni faktury klientom"""
+    """Zaznam o zobrazeni faktury klientom (surove data, agreguje utils.view_analytics)"""
     __tablename__ = 'invoice_views'
+    __table_args__ = (
+        # Prepočet dňa faktúry a mazanie starých záznamov
+        db.Index('ix_invoice_views_invoice_viewed', 'invoice_id', 'viewed_at'),
+        db.Index('ix_invoice_views_viewed', 'viewed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False)
@@ -298,9 +399,78 @@ class InvoiceView(db.Model):
         return f'<InvoiceView {self.invoice_id} at {self.viewed_at}>'
 
 
+class InvoiceViewDaily(db.Model):
+    """Denný súhrn zobrazení faktúry"""
+    __tablename__ = 'invoice_view_daily'
+    
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)  # IP + prehliadač
+
+
+class UserViewDaily(db.Model):
+    """Denný súhrn zobrazení všetkých faktúr používateľa"""
+    __tablename__ = 'user_view_daily'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)  # súčet za faktúry
+    invoices_viewed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class InvoiceViewer(db.Model):
+    """Unikátny divák faktúry (hash IP + prehliadača) - prežije mazanie surových záznamov"""
+    __tablename__ = 'invoice_viewers'
+    
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), primary_key=True)
+    viewer_hash = db.Column(db.String(40), primary_key=True)
+    first_seen = db.Column(db.DateTime, nullable=False)
+
+
+class InvoiceViewStats(db.Model):
+    """Celkové štatistiky zobrazení faktúry pre detail faktúry"""
+    __tablename__ = 'invoice_view_stats'
+    
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)
+    first_viewed_at = db.Column(db.DateTime)
+    last_viewed_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)  # prvé odoslanie emailom
+    first_open_seconds = db.Column(db.Integer)  # od odoslania po prvé zobrazenie
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
+    
+    def to_dict(self):
+        return {
+            'views': self.views,
+            'unique_viewers': self.unique_viewers,
+            'first_viewed_at': self.first_viewed_at.isoformat() if self.first_viewed_at else None,
+            'last_viewed_at': self.last_viewed_at.isoformat() if self.last_viewed_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'first_open_seconds': self.first_open_seconds,
+        }
+
+
+class AnalyticsState(db.Model):
+    """Stav inkrementálnych úloh (napr. posledné spracované id zobrazenia)"""
+    __tablename__ = 'analytics_state'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
+
+
 class RecurringInvoice(db.Model):
     """Pravidelna faktura - sablona pre automaticke generovanie"""
     __tablename__ = 'recurring_invoices'
+    __table_args__ = (
+        # Výber šablón na generovanie: is_active AND next_generate_date <= dnes
+        db.Index('ix_recurring_due', 'is_active', 'next_generate_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -319,7 +489,9 @@ class RecurringInvoice(db.Model):
     # Datumy
     start_date = db.Column(db.Date, nullable=False)  # Zaciatok
     end_date = db.Column(db.Date)  # Koniec (null = bez limitu)
-    next_generate_date = db.Column(db.Date)  # Datum dalsieho generovania
+    # Datum dalsieho generovania (nova sablona zacina od start_date)
+    next_generate_date = db.Column(
+        db.Date, default=lambda context: context.get_current_parameters().get('start_date'))
     last_generated_at = db.Column(db.DateTime)  # Posledne vygenerovanie
     
     # Nastavenia faktury
@@ -328,7 +500,7 @@ class RecurringInvoice(db.Model):
     note = db.Column(db.Text)
     days_until_due = db.Column(db.Integer, default=14)  # Splatnost v dnoch
     
-    # Polozky ako JSON
+    # Polozky ako JSON: [{"description", "quantity", "unit", "unit_price", "cost_price", "item_note"}]
     items_json = db.Column(db.Text)  # JSON s polozkami
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -369,3 +541,28 @@ class RecurringInvoice(db.Model):
     
     def __repr__(self):
         return f'<RecurringInvoice {self.name}>'
+
+
+
+class CompanyCacheEntry(db.Model):
+    """Cache normalizovaných záznamov z RPO (zdieľaný medzi workermi)"""
+    __tablename__ = 'company_cache'
+    
+    ico = db.Column(db.String(8), primary_key=True)
+    data = db.Column(db.Text)  # JSON so záznamom firmy, NULL = firma neexistuje
+    fetched_at = db.Column(db.Float, nullable=False)  # Unix timestamp
+    
+    def __repr__(self):
+        return f'<CompanyCacheEntry {self.ico}>'
+
+
+class SchemaVersion(db.Model):
+    """Aplikované migrácie schémy (riadok na každú migráciu, aktuálna verzia je maximum; spravuje utils.migrations)"""
+    __tablename__ = 'schema_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    applied_at = db.Column(db.DateTime, default=utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaVersion {self.version}>'
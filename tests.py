@@ -3,6 +3,7 @@ Unit testy pre fakturačný systém
 """
 import unittest
 from datetime import date, timedelta
+from decimal import Decimal
 from app import app, db
 from models import User, Supplier, Client, Invoice, InvoiceItem
 
@@ -95,9 +96,8 @@ class TestModels(unittest.TestCase):
             invoice_number = supplier.get_next_invoice_number()
             year = date.today().year
             
-            self.assertTrue(invoice_number.startswith('FV'))
-            self.assertIn(str(year), invoice_number)
-            self.assertEqual(supplier.next_invoice_number, 2)
+            self.assertEqual(invoice_number, f'FV{year}0001')
+            self.assertEqual(supplier.get_next_invoice_number(), f'FV{year}0002')
     
     def test_invoice_totals_calculation(self):
         """Test výpočtu súm faktúry"""
@@ -170,6 +170,49 @@ class TestModels(unittest.TestCase):
             self.assertEqual(invoice.subtotal, 250.0)  # 2*100 + 1*50
             self.assertEqual(invoice.vat_amount, 50.0)  # 20% z 250
             self.assertEqual(invoice.total, 300.0)  # 250 + 50
+    
+    def test_incremental_item_totals(self):
+        """Sumy a zisk sa upravujú pri zmene položiek, kontrola nájde odchýlku"""
+        from utils.invoice_totals import check_invoice_totals
+        with app.app_context():
+            user = User(email='test@example.com', name='Test')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Test s.r.o.', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678')
+            client = Client(user_id=user.id, name='Klient s.r.o.', street='Ulica 1', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.flush()
+            invoice = Invoice(user_id=user.id, supplier_id=supplier.id, client_id=client.id,
+                              invoice_number='FV20260001', variable_symbol='20260001', issue_date=date.today(),
+                              delivery_date=date.today(), due_date=date.today() + timedelta(days=14), vat_rate=20.0)
+            db.session.add(invoice)
+            db.session.flush()
+            
+            first = invoice.add_item(InvoiceItem(description='Služba', quantity=2, unit_price=100.0, cost_price=30.0))
+            second = invoice.add_item(InvoiceItem(description='Tovar', quantity=3, unit_price=10.1, cost_price=4.05))
+            self.assertEqual((invoice.subtotal, invoice.total_cost, invoice.profit),
+                             (Decimal('230.30'), Decimal('72.15'), Decimal('158.15')))
+            self.assertEqual((invoice.vat_amount, invoice.total), (Decimal('46.06'), Decimal('276.36')))
+            
+            invoice.update_item(first, quantity=1)
+            invoice.remove_item(second)
+            db.session.commit()
+            self.assertEqual((invoice.subtotal, invoice.total_cost, invoice.profit, invoice.total),
+                             (100.0, 30.0, 70.0, 120.0))
+            self.assertEqual(check_invoice_totals()['drifted'], [])
+            
+            # Zápis mimo add_item/update_item - kontrola odchýlku nájde a opraví
+            db.session.execute(db.update(InvoiceItem).where(InvoiceItem.id == first.id).values(cost_price=50.0))
+            db.session.commit()
+            report = check_invoice_totals(fix=True)
+            self.assertEqual({(d['field'], d['expected']) for d in report['drifted']},
+                             {('total_cost', 50.0), ('profit', 50.0)})
+            self.assertEqual(report['fixed'], 1)
+            db.session.refresh(invoice)
+            self.assertEqual((invoice.total_cost, invoice.profit), (50.0, 50.0))
+            self.assertEqual(check_invoice_totals()['drifted'], [])
 
 
 class TestHelpers(unittest.TestCase):
@@ -194,5 +237,1918 @@ class TestHelpers(unittest.TestCase):
         self.assertIn('56', result)
 
 
+
+class TestPayBySquare(unittest.TestCase):
+    """Konformné testy pre PAY by square enkodér"""
+    
+    PAYMENT = {
+        'amount': 123.45,
+        'iban': 'SK31 1200 0000 1987 4263 7541',
+        'swift': 'subasksx',
+        'variable_symbol': '20260001',
+        'beneficiary_name': 'Dodávateľ s.r.o.',
+        'due_date': '2026-02-15',
+        'note': 'Faktúra 20260001',
+    }
+    
+    def _reference_base32hex(self, data):
+        """Referenčné kódovanie cez bitový reťazec (podľa špecifikácie)"""
+        alphabet = '0123456789ABCDEFGHIJKLMNOPQRSTUV'
+        bits = ''.join(f'{b:08b}' for b in data)
+        bits += '0' * (-len(bits) % 5)
+        return ''.join(alphabet[int(bits[i:i + 5], 2)] for i in range(0, len(bits), 5))
+    
+    def test_field_layout(self):
+        """Poradie polí podľa špecifikácie v1.1.0"""
+        from utils.bysquare import encode_payment, decode_fields
+        
+        fields = decode_fields(encode_payment(**self.PAYMENT))
+        self.assertEqual(fields[:7], ['', '1', '1', '123.45', 'EUR', '20260215', '20260001'])
+        self.assertEqual(fields[11:14], ['1', 'SK3112000000198742637541', 'SUBASKSX'])
+        self.assertEqual(fields[14:17], ['0', '0', 'Dodávateľ s.r.o.'])
+        self.assertEqual(len(fields), 19)
+    
+    def test_binary_structure(self):
+        """Header, dĺžka, CRC32 a base32hex zodpovedajú referencii"""
+        import base64
+        import binascii
+        import lzma
+        import struct
+        from utils.bysquare import encode_payment, build_payment_data, LZMA_FILTERS
+        
+        encoded = encode_payment(**self.PAYMENT)
+        data = build_payment_data([self.PAYMENT]).encode('utf-8')
+        payload = struct.pack('<I', binascii.crc32(data)) + data
+        compressed = lzma.compress(payload, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+        expected = b'\x00\x00' + struct.pack('<H', len(payload)) + compressed
+        
+        self.assertEqual(encoded, self._reference_base32hex(expected))
+        self.assertTrue(set(encoded) <= set('0123456789ABCDEFGHIJKLMNOPQRSTUV'))
+        raw = base64.b32hexdecode(encoded + '=' * (-len(encoded) % 8))
+        self.assertEqual(raw[:4], expected[:4])
+    
+    def test_multiple_payments(self):
+        """Viac platieb a viac účtov v jednom kóde"""
+        from utils.bysquare import encode_payments, decode_fields
+        
+        second = dict(self.PAYMENT, amount=10, accounts=[
+            {'iban': 'SK3112000000198742637541'},
+            {'iban': 'CZ6508000000192000145399', 'swift': 'GIBACZPX'},
+        ])
+        fields = decode_fields(encode_payments([self.PAYMENT, second], invoice_id='FV1'))
+        self.assertEqual(fields[:2], ['FV1', '2'])
+        self.assertEqual(fields[19:22], ['1', '10', 'EUR'])
+        self.assertEqual(fields[28:33], ['2', 'SK3112000000198742637541', '', 'CZ6508000000192000145399', 'GIBACZPX'])
+    
+    def test_reference_vector(self):
+        """Reťazec z referenčnej implementácie (xseman/bysquare) sa zhoduje s našimi dátami"""
+        import base64
+        import lzma
+        from utils.bysquare import build_payment_data, decode, encode_data, LZMA_FILTERS
+        
+        reference = ('0004A00090IFU27IV0J6HGGLIOTIBVHNQQJQ6LAVGNBT363HR13JC6CB54HSI0KH9FCRASHNQB'
+                     'SKAQD2LJ4AU400UVKDNDPFRKLOBEVVVU0QJ000')
+        expected = 'random-id\t1\t1\t100\tEUR\t\t123\t\t\t\t\t1\tSK9611000000002918599669\t\t0\t0\t\t\t'
+        
+        self.assertEqual(decode(reference), expected)
+        data = build_payment_data([{
+            'amount': 100, 'iban': 'SK96 1100 0000 0029 1859 9669', 'variable_symbol': '123',
+        }], invoice_id='random-id')
+        self.assertEqual(data, expected)
+        
+        # LZMA bitstream nie je kanonický (iný enkodér = iné bajty), rovnaké musia byť
+        # header, dĺžka aj dekomprimovaný obsah vrátane CRC32
+        def unpack(encoded):
+            raw = base64.b32hexdecode(encoded + '=' * (-len(encoded) % 8))
+            payload = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=LZMA_FILTERS).decompress(
+                raw[4:], max_length=int.from_bytes(raw[2:4], 'little'))
+            return raw[:4], payload
+        
+        self.assertEqual(unpack(encode_data(data)), unpack(reference))
+    
+    def test_corrupted_string_rejected(self):
+        """Poškodený reťazec neprejde kontrolou"""
+        from utils.bysquare import encode_payment, decode, BySquareError
+        
+        encoded = encode_payment(**self.PAYMENT)
+        broken = encoded[:10] + ('0' if encoded[10] != '0' else '1') + encoded[11:]
+        with self.assertRaises(BySquareError):
+            decode(broken)
+    
+    def test_callers_share_engine(self):
+        """Všetky API vracajú rovnaký reťazec"""
+        from utils.bysquare import encode_payment, encode_payment_matrix
+        from utils.pay_by_square import generate_pay_by_square_string
+        from utils.helpers import generate_pay_by_square
+        
+        encoded = encode_payment(**self.PAYMENT)
+        self.assertEqual(generate_pay_by_square_string(**self.PAYMENT), encoded)
+        
+        matrix_encoded, matrix = encode_payment_matrix(**self.PAYMENT)
+        self.assertEqual(matrix_encoded, encoded)
+        self.assertEqual(len(matrix), len(matrix[0]))
+        
+        png = generate_pay_by_square(
+            amount=self.PAYMENT['amount'],
+            iban=self.PAYMENT['iban'],
+            due_date='20260215'
+        )
+        self.assertTrue(png.startswith('data:image/png;base64,'))
+
+
+class TestCompanyCache(unittest.TestCase):
+    """Testy pre perzistentný cache firemných údajov"""
+    
+    RECORD = {'name': 'Test s.r.o.', 'ico': '123456', 'zip_code': '811 01'}
+    
+    def _cache(self, backend=None, **kwargs):
+        from utils.company_cache import CompanyCache, MemoryBackend
+        return CompanyCache(backend or MemoryBackend(), **kwargs)
+    
+    def test_hit_and_normalization(self):
+        """Záznam sa normalizuje a druhé volanie nejde na upstream"""
+        cache = self._cache()
+        calls = []
+        fetch = lambda ico: calls.append(ico) or self.RECORD
+        
+        first = cache.lookup('00123456', fetch)
+        second = cache.lookup('00123456', fetch)
+        
+        self.assertEqual(first['ico'], '00123456')
+        self.assertEqual(first['zip_code'], '81101')
+        self.assertEqual(first['dic'], '')
+        self.assertEqual(second, first)
+        self.assertEqual(calls, ['00123456'])
+    
+    def test_negative_caching(self):
+        """Neexistujúce IČO sa uloží, výpadok upstreamu nie"""
+        from utils.company_cache import UpstreamError
+        cache = self._cache()
+        calls = []
+        
+        def missing(ico):
+            calls.append(ico)
+            return None
+        
+        def failing(ico):
+            raise UpstreamError('timeout')
+        
+        self.assertIsNone(cache.lookup('11111111', missing))
+        self.assertIsNone(cache.lookup('11111111', missing))
+        self.assertEqual(len(calls), 1)
+        
+        with self.assertRaises(UpstreamError):
+            cache.lookup('22222222', failing)
+        self.assertEqual(cache.get('22222222')[0], 'miss')
+    
+    def test_fetch_error_serves_expired_or_miss(self):
+        """Neočakávaná chyba upstreamu vráti expirovaný záznam, inak UpstreamError"""
+        from utils.company_cache import UpstreamError
+        cache = self._cache(ttl=0, stale_ttl=0)
+        
+        def broken(ico):
+            raise ValueError('Expecting value: line 1 column 1')
+        
+        cache.set('00123456', self.RECORD)
+        self.assertEqual(cache.get('00123456')[0], 'miss')
+        self.assertEqual(cache.lookup('00123456', broken)['name'], 'Test s.r.o.')
+        with self.assertRaises(UpstreamError):
+            cache.lookup('33333333', broken)
+        self.assertEqual(cache.get('33333333')[0], 'miss')
+    
+    def test_stale_while_revalidate(self):
+        """Starý záznam sa vráti okamžite a obnoví sa na pozadí"""
+        import threading
+        from utils.company_cache import STALE, FRESH
+        cache = self._cache(ttl=0, stale_ttl=3600)
+        cache.set('00123456', self.RECORD)
+        self.assertEqual(cache.get('00123456')[0], STALE)
+        
+        refreshed = threading.Event()
+        
+        def fetch(ico):
+            refreshed.set()
+            return dict(self.RECORD, name='Nový názov s.r.o.')
+        
+        result = cache.lookup('00123456', fetch)
+        self.assertEqual(result['name'], 'Test s.r.o.')
+        self.assertTrue(refreshed.wait(2))
+        
+        cache.ttl = 3600
+        for _ in range(100):
+            state, data = cache.get('00123456')
+            if data['name'] != 'Test s.r.o.':
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(state, FRESH)
+        self.assertEqual(data['name'], 'Nový názov s.r.o.')
+    
+    def test_sqlite_backend_shared(self):
+        """Dve inštancie nad rovnakým súborom vidia rovnaké dáta"""
+        import os
+        import tempfile
+        from utils.company_cache import SQLiteBackend
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite3')
+            writer = self._cache(SQLiteBackend(path))
+            reader = self._cache(SQLiteBackend(path))
+            
+            self.assertEqual(writer.warm([self.RECORD]), 1)
+            self.assertEqual(reader.get('00123456')[1]['name'], 'Test s.r.o.')
+            
+            writer.set('99999999', None)
+            self.assertEqual(reader.get('99999999'), ('fresh', None))
+
+
+class TestLRUCache(unittest.TestCase):
+    """Testy pre LRU/TTL cache engine"""
+    
+    def test_lru_eviction(self):
+        """Pri prekročení limitu sa vyhodí najdlhšie nepoužitý záznam"""
+        from utils.cache import LRUCache, MISSING
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+    
+    def test_ttl_uses_monotonic_clock(self):
+        """Expirácia sa riadi monotónnymi hodinami"""
+        from unittest import mock
+        from utils.cache import LRUCache, MISSING
+        cache = LRUCache(default_timeout=10)
+        
+        with mock.patch('utils.cache.time.monotonic', return_value=100.0):
+            cache.set('key', 'value')
+        with mock.patch('utils.cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get('key'), 'value')
+        with mock.patch('utils.cache.time.monotonic', return_value=110.0):
+            self.assertIs(cache.get('key'), MISSING)
+        self.assertEqual(cache.stats()['expirations'], 1)
+    
+    def test_decorator_caches_none(self):
+        """Výsledok None sa ukladá (negatívny cache)"""
+        from utils.cache import cached
+        calls = []
+        
+        @cached(timeout=60, key_prefix='test_none')
+        def lookup(ico, detail=False):
+            calls.append(ico)
+            return None
+        
+        self.assertIsNone(lookup('123'))
+        self.assertIsNone(lookup('123'))
+        lookup('123', detail=True)
+        self.assertEqual(calls, ['123', '123'])
+        self.assertEqual(lookup.cache.stats()['hits'], 1)
+    
+    def test_single_flight(self):
+        """Súbežné missy toho istého kľúča volajú funkciu raz"""
+        import threading
+        from utils.cache import LRUCache
+        cache = LRUCache()
+        release = threading.Event()
+        calls = []
+        results = []
+        
+        def factory():
+            calls.append(1)
+            release.wait(2)
+            return 'value'
+        
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('key', factory)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        while cache.stats()['coalesced'] < 7:
+            threading.Event().wait(0.005)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+
+class TestCompanyIndex(unittest.TestCase):
+    """Testy pre vyhľadávací index firiem"""
+    
+    RECORDS = [
+        {'name': 'Slovenská sporiteľňa, a.s.', 'ico': '35697270'},
+        {'name': 'Tatra banka, a.s.', 'ico': '31340890'},
+        {'name': 'Všeobecná úverová banka, a.s.', 'ico': '151653'},
+        {'name': 'Banka', 'ico': '12345678'},
+        {'name': 'Stavebná sporiteľňa, a.s.', 'ico': '31335004'},
+    ]
+    
+    def _index(self):
+        from utils.company_index import CompanyIndex
+        return CompanyIndex(self.RECORDS)
+    
+    def test_fold(self):
+        """Normalizácia bez diakritiky a interpunkcie"""
+        from utils.company_index import fold
+        self.assertEqual(fold('Všeobecná ÚVEROVÁ banka, a.s.'), 'vseobecna uverova banka a s')
+    
+    def test_ranked_prefix_search(self):
+        """Presná zhoda je pred prefixom názvu a prefixom slova"""
+        names = [r['name'] for r in self._index().search('bank')]
+        self.assertEqual(names[0], 'Banka')
+        self.assertEqual(set(names[1:]), {'Tatra banka, a.s.', 'Všeobecná úverová banka, a.s.'})
+        
+        names = [r['name'] for r in self._index().search('Sporitelna slov')]
+        self.assertEqual(names, ['Slovenská sporiteľňa, a.s.'])
+    
+    def test_substring_search(self):
+        """Trigramy nájdu zhodu vo vnútri slova"""
+        names = [r['name'] for r in self._index().search('orite')]
+        self.assertEqual(set(names), {'Slovenská sporiteľňa, a.s.', 'Stavebná sporiteľňa, a.s.'})
+    
+    def test_ico_prefix(self):
+        """Vyhľadávanie podľa prefixu IČO a presné IČO"""
+        index = self._index()
+        self.assertEqual([r['ico'] for r in index.search('313')], ['31335004', '31340890'])
+        self.assertEqual(index.get('151653')['ico'], '151653')
+        self.assertIsNone(index.get('99999999'))
+    
+    def test_large_dataset(self):
+        """Index nad 20 000 záznamami vracia obmedzený počet výsledkov"""
+        from utils.company_index import CompanyIndex
+        records = [
+            {'name': f'Firma {i} Žilina s.r.o.', 'ico': f'{i:08d}'}
+            for i in range(20000)
+        ]
+        index = CompanyIndex(records)
+        self.assertEqual(len(index.search('zilina', limit=10)), 10)
+        self.assertEqual(index.search('firma 19999')[0]['ico'], '00019999')
+        self.assertEqual(len(index.search('0000012', limit=20)), 10)
+
+
+class TestCompanyDatabase(unittest.TestCase):
+    """Testy pre databázu firiem v SQLite súbore"""
+
+    def test_bundled_database(self):
+        """Pribalený súbor obsahuje firmy a index vracia plné záznamy"""
+        from utils.sk_companies_db import get_company, search_companies
+        company = get_company('35697270')
+        self.assertEqual(company['name'], 'Slovenská sporiteľňa, a.s.')
+        self.assertEqual(company['ic_dph'], 'SK2020417809')
+        self.assertIsNone(get_company('99999999'))
+        self.assertEqual(search_companies('tatra')[0]['city'], 'Bratislava')
+
+    def test_import_csv(self):
+        """Import z CSV s RPO názvami stĺpcov, súbor sa otvorí až pri prístupe"""
+        import os
+        import tempfile
+        from import_companies import import_companies
+        from utils.sk_companies_db import CompanyDatabase
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'rpo.csv')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write('cin;nazov;obec;psc\n')
+                f.write('123456;Test s.r.o.;Žilina;010 01\n')
+                f.write(';Bez IČO;Nitra;94901\n')
+            output = os.path.join(tmp, 'companies.sqlite3')
+            self.assertEqual(import_companies(source, output), (1, 1))
+
+            database = CompanyDatabase(output)
+            self.assertFalse(hasattr(database._local, 'conn'))
+            self.assertEqual(len(database), 1)
+            self.assertIn('00123456', database)
+            self.assertEqual(database['00123456']['zip_code'], '01001')
+            self.assertEqual(database.get('00123456')['street'], '')
+            database._local.conn.close()
+
+
+class TestCompanyAutocomplete(unittest.TestCase):
+    """Testy pre našepkávač firiem"""
+
+    def setUp(self):
+        import threading
+        from utils import company_lookup
+        self.module = company_lookup
+        self.service = company_lookup.get_lookup_service()
+        self.release = threading.Event()
+        self.calls = []
+        company_lookup._remote_searches.clear()
+
+        def fake_search_remote(query, limit=10, timeout=10):
+            self.calls.append(query)
+            self.release.wait(5)
+            return [{'name': 'Tatra Leasing s.r.o.', 'ico': '35768444'},
+                    {'name': 'Tatra banka, a.s.', 'ico': '31340890'}]
+
+        self.service.search_remote = fake_search_remote
+
+    def tearDown(self):
+        self.release.set()
+        del self.service.search_remote
+        self.module._remote_searches.clear()
+
+    def test_local_first_then_merged(self):
+        """Lokálne výsledky hneď s more_coming, súbežné dotazy = jedno upstream volanie"""
+        first = self.module.autocomplete_companies('tatra')
+        second = self.module.autocomplete_companies('Tatra ')
+        self.assertTrue(first['more_coming'])
+        self.assertEqual(first['results'][0]['ico'], '31340890')
+        self.assertTrue(second['more_coming'])
+
+        self.release.set()
+        merged = self.module.autocomplete_companies('tatra', wait=1)
+        self.assertFalse(merged['more_coming'])
+        self.assertEqual([r['ico'] for r in merged['results']], ['31340890', '35768444'])
+        self.assertEqual(self.calls, ['tatra'])
+
+    def test_endpoint_requires_login(self):
+        """Endpoint je len pre prihlásených"""
+        app.config['TESTING'] = True
+        response = app.test_client().get('/api/rpo/search?q=tatra')
+        self.assertEqual(response.status_code, 302)
+
+
+class TestClientVerification(unittest.TestCase):
+    """Testy hromadného overenia klientov voči lokálnemu falošnému RPO serveru"""
+
+    COMPANIES = {
+        '35697270': {'cin': 35697270, 'name': 'Slovenská sporiteľňa, a.s.', 'tin': '2020411811',
+                     'vatin': 'SK2020411811',
+                     'address': {'street': 'Tomášikova', 'building_number': '48',
+                                 'municipality': 'Bratislava', 'postal_code': '832 37'}},
+        '31340890': {'cin': 31340890, 'name': 'Tatra banka, a.s.', 'tin': '2020408522',
+                     'vatin': 'SK2020408522',
+                     'address': {'street': 'Hodžovo námestie', 'building_number': '3',
+                                 'municipality': 'Bratislava', 'postal_code': '811 06'}},
+    }
+
+    def setUp(self):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from types import SimpleNamespace
+        from utils.company_cache import CompanyCache, MemoryBackend
+        from utils.company_lookup import CompanyLookup
+
+        companies = self.COMPANIES
+        self.requests = []
+
+        class FakeRPO(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                self.requests.append(handler.path)
+                ico = handler.path.rsplit('/', 1)[-1]
+                if handler.path.startswith('/corporate_bodies/search'):
+                    # Search bez presnej zhody vráti inú firmu
+                    other = 'q=11111111' in handler.path or 'q=99999999' in handler.path
+                    status, body = 200, [companies['31340890']] if other else []
+                elif ico == '99999999':
+                    status, body = 503, {}
+                elif ico in companies:
+                    status, body = 200, companies[ico]
+                else:
+                    status, body = 404, {}
+                payload = json.dumps(body).encode()
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(payload)))
+                handler.end_headers()
+                handler.wfile.write(payload)
+
+            def log_message(handler, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRPO)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{self.server.server_address[1]}/corporate_bodies'
+
+        self.service = CompanyLookup()
+        self.service.EKOSYSTEM_API_URL = base
+        self.service.EKOSYSTEM_SEARCH_URL = base + '/search'
+        self.cache = CompanyCache(MemoryBackend())
+
+        def client(client_id, ico, **fields):
+            data = dict(name='', street='', city='', zip_code='', dic='', ic_dph='')
+            data.update(fields)
+            return SimpleNamespace(id=client_id, ico=ico, **data)
+
+        self.clients = [
+            client(1, '35697270', name='Slovenská sporiteľňa, a.s.', street='Tomášikova 48',
+                   city='Bratislava', zip_code='83237', dic='2020411811', ic_dph='SK2020411811'),
+            client(2, '35 697 270', name='Slovenska sporitelna', street='Tomášikova 48',
+                   city='Bratislava', zip_code='83237', dic='2020411811', ic_dph='SK2020411811'),
+            client(3, '31340890', name='Tatra banka, a.s.', street='Hodžovo námestie 3',
+                   city='Bratislava', zip_code='81106', dic='2020408522', ic_dph=''),
+            client(4, '12345678', name='Neexistujúca s.r.o.'),
+            client(5, '99999999', name='Výpadok s.r.o.'),
+            client(6, '', name='Fyzická osoba'),
+        ]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _verify(self, **kwargs):
+        from utils.client_verification import verify_clients
+        return verify_clients(self.clients, service=self.service, cache=self.cache, rate=0, **kwargs)
+
+    def test_diff_report(self):
+        """Report obsahuje zmeny, nenájdené IČO, chyby a každé IČO sa overí raz"""
+        report = self._verify()
+        self.assertEqual(report['checked'], 6)
+        self.assertEqual(report['unique_icos'], 4)
+        self.assertEqual(report['unchanged'], 1)
+        self.assertEqual(len(self.requests), 8)  # priamy lookup + search súbežne pre každé IČO
+
+        changed = {entry['client_id']: entry['changes'] for entry in report['changed']}
+        self.assertEqual(set(changed), {2, 3})
+        self.assertEqual(changed[2]['name']['new'], 'Slovenská sporiteľňa, a.s.')
+        self.assertEqual(changed[3], {'ic_dph': {'old': '', 'new': 'SK2020408522'}})
+        self.assertEqual([e['client_id'] for e in report['not_found']], [4])
+        self.assertEqual([e['client_id'] for e in report['errors']], [5])
+        self.assertEqual([e['client_id'] for e in report['skipped']], [6])
+
+    def test_cached_and_apply(self):
+        """Druhý beh z cache nejde na server, apply_changes prepíše klientov"""
+        from utils.client_verification import apply_changes
+        report = self._verify()
+        count = len(self.requests)
+        cached_report = self._verify(refresh=False)
+        # Cache drží nájdené aj negatívne záznamy, výpadok (503) sa skúsi znova
+        self.assertEqual(len(self.requests), count + 2)
+        self.assertEqual(cached_report['changed'], report['changed'])
+
+        self.assertEqual(apply_changes(self.clients, report), 2)
+        self.assertEqual(self.clients[2].ic_dph, 'SK2020408522')
+        self.assertEqual(self._verify(refresh=False)['unchanged'], 3)
+
+    def test_mismatched_ico_not_found(self):
+        """Firma s iným IČO (search bez presnej zhody) je nenájdené IČO, neukladá sa do cache"""
+        from types import SimpleNamespace
+        self.clients = [SimpleNamespace(id=7, ico='11111111', name='Iná s.r.o.', street='', city='',
+                                        zip_code='', dic='', ic_dph='')]
+        for refresh in (True, False):
+            report = self._verify(refresh=refresh)
+            self.assertEqual([e['client_id'] for e in report['not_found']], [7])
+            self.assertEqual(report['changed'], [])
+        self.assertEqual(self.cache.get('11111111'), ('fresh', None))
+
+    def test_fetch_rejects_other_company(self):
+        """CompanyLookup.fetch nevráti firmu s iným IČO - do cache ide lokálny záznam alebo negatívny"""
+        from unittest import mock
+        self.assertIsNone(self.cache.lookup('11111111', self.service.fetch))
+        self.assertEqual(self.cache.get('11111111'), ('fresh', None))
+
+        local = {'name': 'Lokálna s.r.o.', 'ico': '11111111'}
+        with mock.patch.object(self.service, '_get_local_data', return_value=local):
+            self.assertEqual(self.service.fetch('11111111'), local)
+
+    def test_upstream_error_not_masked_by_other_company(self):
+        """Výpadok priameho lookupu + search bez presnej zhody = UpstreamError, nie iná firma"""
+        from unittest import mock
+        from utils.company_cache import UpstreamError
+        with self.assertRaises(UpstreamError):
+            self.service.fetch_remote('99999999')
+        local = {'name': 'Lokálna s.r.o.', 'ico': '99999999'}
+        with mock.patch.object(self.service, '_get_local_data', return_value=local):
+            self.assertEqual(self.service.fetch('99999999'), local)
+
+    def test_rate_limiter(self):
+        """Rate limiter rozloží volania v čase, lookup sa počíta za dve volania"""
+        import time
+        from utils.client_verification import RateLimiter
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire(2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.13)
+
+
+class TestAsyncCompanyLookup(unittest.TestCase):
+    """Testy asynchrónneho lookupu (pomalý priamy endpoint, rýchly search)"""
+
+    def setUp(self):
+        import json
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.release = threading.Event()
+        release = self.release
+
+        class SlowDirectRPO(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.startswith('/broken'):
+                    # Upstream vráti HTML chybovú stránku so statusom 200
+                    payload = b'<html>Service Unavailable</html>'
+                    handler.send_response(200)
+                    handler.send_header('Content-Type', 'text/html')
+                    handler.send_header('Content-Length', str(len(payload)))
+                    handler.end_headers()
+                    handler.wfile.write(payload)
+                    return
+                if handler.path.startswith('/corporate_bodies/search'):
+                    body = [{'cin': 31340890, 'name': 'Tatra banka, a.s.'}]
+                else:
+                    release.wait(3)
+                    body = {'cin': 31340890, 'name': 'Tatra banka, a.s.'}
+                payload = json.dumps(body).encode()
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(payload)))
+                handler.end_headers()
+                handler.wfile.write(payload)
+
+            def log_message(handler, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowDirectRPO)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}/corporate_bodies'
+        self.time = time
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sync_facade_races_search(self):
+        """Sync fasáda vráti výsledok zo search bez čakania na pomalý priamy lookup"""
+        from utils.company_lookup import CompanyLookup
+        service = CompanyLookup()
+        service.EKOSYSTEM_API_URL = self.base
+        service.EKOSYSTEM_SEARCH_URL = self.base + '/search'
+
+        start = self.time.monotonic()
+        result = service.fetch_remote('31340890')
+        self.assertEqual(result['name'], 'Tatra banka, a.s.')
+        self.assertLess(self.time.monotonic() - start, 2)
+
+    def test_async_caller(self):
+        """Async volajúci používa klienta priamo vo vlastnom event loop-e"""
+        import asyncio
+        from utils.company_lookup import CompanyLookup
+        from utils.company_lookup_async import AsyncCompanyLookup
+
+        async def run():
+            lookup = AsyncCompanyLookup(self.base, self.base + '/search',
+                                        CompanyLookup()._parse_ekosystem_response)
+            try:
+                results = await asyncio.gather(*(lookup.fetch('31340890') for _ in range(5)))
+                found = await lookup.search('tatra', limit=5)
+            finally:
+                await lookup.aclose()
+            return results, found
+
+        results, found = asyncio.run(run())
+        self.assertEqual({r['ico'] for r in results}, {'31340890'})
+        self.assertEqual(found[0]['name'], 'Tatra banka, a.s.')
+
+    def test_invalid_json_is_upstream_error(self):
+        """Neplatné JSON telo je výpadok upstreamu, lookup_company vráti None"""
+        from unittest import mock
+        from utils import company_lookup
+        from utils.company_cache import CompanyCache, MemoryBackend, UpstreamError
+        broken = self.base.replace('/corporate_bodies', '/broken')
+        service = company_lookup.CompanyLookup()
+        service.EKOSYSTEM_API_URL = broken
+        service.EKOSYSTEM_SEARCH_URL = broken + '/search'
+
+        with self.assertRaises(UpstreamError):
+            service.fetch_remote('31340890')
+        with self.assertRaises(UpstreamError):
+            service.search_remote('tatra')
+        with mock.patch.object(company_lookup, 'get_lookup_service', return_value=service), \
+                mock.patch.object(company_lookup, 'get_company_cache', return_value=CompanyCache(MemoryBackend())):
+            self.assertIsNone(company_lookup.lookup_company('12345678'))
+
+
+class TestImportTime(unittest.TestCase):
+    """Regresný test času importu aplikácie (cold start na Verceli)"""
+
+    # Rozpočet pre `import app` v ms, dá sa prepísať cez IMPORT_TIME_BUDGET_MS
+    BUDGET_MS = 1500
+    # Moduly, ktoré sa majú načítať až pri prvom použití
+    LAZY_MODULES = ('qrcode', 'PIL', 'reportlab', 'openpyxl', 'httpx', 'requests', 'sentry_sdk')
+
+    def _importtime(self):
+        """Spustí `python -X importtime -c 'import app'`, vráti {modul: kumulatívne µs}"""
+        import os
+        import subprocess
+        import sys
+        env = {k: v for k, v in os.environ.items() if k != 'SENTRY_DSN'}
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        modules = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            modules.setdefault(name.strip(), int(cumulative))
+        return modules
+
+    def test_cold_start(self):
+        """Import aplikácie je v rozpočte a nenačíta ťažké moduly"""
+        import os
+        modules = self._importtime()
+        budget = int(os.environ.get('IMPORT_TIME_BUDGET_MS', self.BUDGET_MS))
+        self.assertLess(modules['app'] / 1000, budget)
+        self.assertEqual([m for m in self.LAZY_MODULES if m in modules], [])
+
+
+class TestMigrations(unittest.TestCase):
+    """Testy verzovaných migrácií a kontroly verzie schémy"""
+
+    def setUp(self):
+        import os
+        import tempfile
+        from sqlalchemy import create_engine, event
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine('sqlite:///' + os.path.join(self.tmp.name, 'test.db'))
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_migrate(self):
+        """Migrácia vytvorí tabuľky a verziu, druhý beh nič nerobí"""
+        from sqlalchemy import inspect
+        from utils.migrations import migrate, get_schema_version, SCHEMA_VERSION
+        with self.engine.connect() as conn:
+            self.assertEqual(get_schema_version(conn), 0)
+
+        self.assertEqual(migrate(self.engine, log=lambda msg: None), SCHEMA_VERSION)
+        tables = set(inspect(self.engine).get_table_names())
+        self.assertTrue({'users', 'invoices', 'schema_version', 'company_cache'} <= tables)
+
+        self.assertEqual(migrate(self.engine, log=self.fail), SCHEMA_VERSION)
+
+    def test_guard_checks_once(self):
+        """Kontrola verzie je jeden dotaz na proces, zastaraná schéma sa hlási"""
+        from utils.migrations import SchemaGuard, SchemaOutdated, migrate
+        guard = SchemaGuard()
+        with self.assertRaises(SchemaOutdated):
+            guard.check(self.engine)
+        self.assertFalse(guard.checked)
+
+        migrate(self.engine, log=lambda msg: None)
+        guard.reset()
+        self.statements.clear()
+        guard.check(self.engine)
+        guard.check(self.engine)
+        self.assertTrue(guard.checked)
+        self.assertEqual(len([s for s in self.statements if 'schema_version' in s]), 1)
+        self.assertFalse([s for s in self.statements if 'sqlite_master' in s or 'PRAGMA' in s])
+
+
+class TestEngineProfiles(unittest.TestCase):
+    """Testy výberu profilu databázového engine"""
+
+    def test_profiles(self):
+        """Automatický výber profilu a pooler-safe nastavenia"""
+        import os
+        from unittest import mock
+        from sqlalchemy.pool import NullPool
+        from config import detect_engine_profile, engine_options
+
+        pooler = 'postgresql://u:p@aws-0-eu-central-1.pooler.supabase.com:6543/postgres'
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(detect_engine_profile('sqlite:///x.db'), 'sqlite')
+            self.assertEqual(detect_engine_profile('postgresql://u:p@db:5432/app'), 'gunicorn')
+            self.assertEqual(detect_engine_profile(pooler), 'transaction_pooler')
+        with mock.patch.dict(os.environ, {'VERCEL': '1'}):
+            self.assertEqual(detect_engine_profile(pooler), 'serverless')
+
+        self.assertIs(engine_options('serverless', pooler)['poolclass'], NullPool)
+        pooled = engine_options('transaction_pooler', pooler)
+        self.assertNotIn('options', pooled['connect_args'])
+        self.assertIsNone(engine_options('auto', pooler.replace('postgresql:', 'postgresql+psycopg:'))
+                          ['connect_args']['prepare_threshold'])
+        with self.assertRaises(ValueError):
+            engine_options('neznamy', pooler)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Testy merania requestov"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_sql_and_spans(self):
+        """SQL dotazy a úseky sa pripíšu k requestu"""
+        import time
+        from flask import g
+        from utils.instrumentation import RequestStats, timed, _server_timing
+        with app.test_request_context('/'):
+            g._request_stats = stats = RequestStats()
+            User.query.filter_by(email='nikto@example.com').first()
+            User.query.count()
+            with timed('pdf'):
+                time.sleep(0.01)
+            self.assertEqual(stats.sql_count, 2)
+            self.assertEqual(len(stats.slowest), 2)
+            self.assertGreaterEqual(stats.spans['pdf'], 0.01)
+            header = _server_timing(stats, 0.05)
+            self.assertIn('db;dur=', header)
+            self.assertIn('desc="2 queries"', header)
+            self.assertIn('pdf;dur=', header)
+
+    def test_server_timing_and_metrics(self):
+        """Server-Timing hlavička, /metrics a log pomalých requestov"""
+        client = app.test_client()
+        self.assertNotIn('Server-Timing', client.get('/login').headers)  # predvolene len admin
+        app.config['SLOW_REQUEST_MS'] = 0
+        app.config['SERVER_TIMING'] = 'all'
+        try:
+            with self.assertLogs(app.logger, 'WARNING') as logs:
+                response = client.get('/login')
+        finally:
+            app.config['SLOW_REQUEST_MS'] = 1000
+            app.config['SERVER_TIMING'] = 'admin'
+        self.assertIn('app;dur=', response.headers['Server-Timing'])
+        self.assertIn('Slow request GET /login 200', logs.output[0])
+
+        debug, app.debug = app.debug, False
+        try:
+            self.assertEqual(client.get('/metrics').status_code, 404)  # bez tokenu mimo debug
+        finally:
+            app.debug = debug
+        app.config['METRICS_TOKEN'] = 'tajne'
+        try:
+            self.assertEqual(client.get('/metrics').status_code, 401)
+            response = client.get('/metrics', headers={'Authorization': 'Bearer tajne'})
+            self.assertEqual(response.status_code, 200)
+        finally:
+            app.config['METRICS_TOKEN'] = None
+        body = response.get_data(as_text=True)
+        self.assertIn('app_requests_total{method="GET",route="/login",status="200"}', body)
+        self.assertIn('app_request_duration_seconds_count{route="/login"}', body)
+
+    def test_server_timing_never_on_public_pages(self):
+        """Cachovateľná verejná odpoveď nedostane Server-Timing ani pri SERVER_TIMING=all"""
+        from flask import make_response
+        from utils.instrumentation import _server_timing_allowed
+        app.config['SERVER_TIMING'] = 'all'
+        try:
+            with app.test_request_context('/login'):
+                response = make_response('prihlásenie')
+                self.assertTrue(_server_timing_allowed(app, response))
+                response.headers['Cache-Control'] = 'public, max-age=60, s-maxage=300'
+                self.assertFalse(_server_timing_allowed(app, response))
+            with app.test_request_context('/invoice/view/abc'):
+                self.assertFalse(_server_timing_allowed(app, make_response('faktúra')))
+        finally:
+            app.config['SERVER_TIMING'] = 'admin'
+
+
+class TestProfiling(unittest.TestCase):
+    """Testy profilovania na požiadanie"""
+
+    def setUp(self):
+        import tempfile
+        from utils.profiling import rate_limiter
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.profile_dir = tempfile.mkdtemp()
+        app.config['PROFILING_DIR'] = self.profile_dir
+        app.config['ADMIN_EMAILS'] = frozenset({'admin@example.com'})
+        rate_limiter.reset()
+        with app.app_context():
+            db.create_all()
+            for email in ('admin@example.com', 'user@example.com'):
+                user = User(email=email, name=email)
+                user.set_password('password')
+                db.session.add(user)
+            db.session.commit()
+            self.admin_id = User.query.filter_by(email='admin@example.com').first().id
+            self.user_id = User.query.filter_by(email='user@example.com').first().id
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        app.config['PROFILING_DIR'] = None
+        app.config['ADMIN_EMAILS'] = frozenset()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _client(self, user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+        return client
+
+    def test_admin_profile_and_download(self):
+        """Admin dostane profil (cProfile aj speedscope), ďalší request brzdí rate limit"""
+        import json
+        import os
+        import pstats
+        client = self._client(self.admin_id)
+        response = client.get('/login?_profile=1')
+        name = response.headers['X-Profile-Id']
+        self.assertTrue(name.endswith('.prof'))
+        pstats.Stats(os.path.join(self.profile_dir, name))
+
+        # Rate limit na používateľa
+        with self.assertLogs(app.logger, 'WARNING'):
+            self.assertNotIn('X-Profile-Id', client.get('/login?_profile=1').headers)
+
+        app.config['PROFILING_MIN_INTERVAL'] = 0
+        try:
+            response = client.get('/login', headers={'X-Profile': 'sample'})
+        finally:
+            app.config['PROFILING_MIN_INTERVAL'] = 30
+        sample_name = response.headers['X-Profile-Id']
+        self.assertTrue(sample_name.endswith('.speedscope.json'))
+
+        listing = client.get('/admin/profiles').get_json()
+        self.assertEqual({p['name'] for p in listing['profiles']}, {name, sample_name})
+        download = client.get(f'/admin/profiles/{sample_name}')
+        self.assertEqual(json.loads(download.data)['profiles'][0]['type'], 'sampled')
+        self.assertEqual(client.get('/admin/profiles/..%2Fapp.py').status_code, 404)
+
+    def test_non_admin_ignored(self):
+        """Bežný používateľ ani anonym profil nespustí a admin routy nevidí"""
+        import os
+        client = self._client(self.user_id)
+        self.assertNotIn('X-Profile-Id', client.get('/login?_profile=1').headers)
+        self.assertEqual(client.get('/admin/profiles').status_code, 404)
+        self.assertNotIn('X-Profile-Id', app.test_client().get('/login?_profile=1').headers)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+
+class TestStructuredLogging(unittest.TestCase):
+    """Testy štruktúrovaného logovania"""
+
+    def tearDown(self):
+        import logging
+        from utils.structured_logging import configure_logging
+        logging.getLogger('test.quiet').setLevel(logging.NOTSET)
+        configure_logging(level=app.config.get('LOG_LEVEL', 'INFO'), fmt=app.config.get('LOG_FORMAT', 'text'))
+
+    def test_json_with_request_id_and_levels(self):
+        """JSON záznam nesie request_id a extra polia, úrovne per logger platia"""
+        import io
+        import json
+        import logging
+        from flask import g
+        from utils.structured_logging import configure_logging
+        stream = io.StringIO()
+        configure_logging(level='INFO', fmt='json', levels='test.quiet=ERROR', stream=stream)
+
+        with app.test_request_context('/'):
+            g.request_id = 'abc123'
+            logging.getLogger('test.loud').info('Loaded %d invoices', 3, extra={'invoice_id': 7})
+            logging.getLogger('test.quiet').warning('nezobrazí sa')
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        entry = json.loads(lines[0])
+        self.assertEqual(entry['msg'], 'Loaded 3 invoices')
+        self.assertEqual(entry['request_id'], 'abc123')
+        self.assertEqual(entry['invoice_id'], 7)
+        self.assertNotIn('sample_rate', entry)
+
+    def test_sampling(self):
+        """Vzorkovanie podľa loggera a extra sample_rate, WARNING sa bez sample_rate nevzorkuje"""
+        import io
+        import logging
+        from utils.structured_logging import configure_logging
+        stream = io.StringIO()
+        configure_logging(level='INFO', sample_rates='test.sampled=0', stream=stream)
+
+        logging.getLogger('test.sampled.child').info('zahodené')
+        logging.getLogger('test.sampled').warning('warning prejde')
+        logging.getLogger('test.other').info('tiež zahodené', extra={'sample_rate': 0})
+        logging.getLogger('test.other').info('prejde')
+
+        output = stream.getvalue()
+        self.assertNotIn('zahodené', output)
+        self.assertIn('warning prejde', output)
+        self.assertIn('prejde', output)
+
+    def test_request_id_header(self):
+        """Korelačné ID sa prevezme z hlavičky alebo vygeneruje"""
+        client = app.test_client()
+        self.assertEqual(client.get('/login', headers={'X-Request-ID': 'lb-42'}).headers['X-Request-ID'], 'lb-42')
+        self.assertEqual(len(client.get('/login').headers['X-Request-ID']), 32)
+
+
+class TestRequestContext(unittest.TestCase):
+    """Testy dodávateľa v kontexte requestu"""
+
+    def setUp(self):
+        from utils.request_context import clear_supplier_cache
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        clear_supplier_cache()
+        with app.app_context():
+            db.create_all()
+            user = User(email='firma@example.com', name='Firma')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Moja firma', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678', stamp_image='data:image/png;base64,AAAA')
+            db.session.add(supplier)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        app.config['SUPPLIER_CACHE_TTL'] = 0
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _request(self):
+        from flask import g
+        from flask_login import login_user
+        from utils.instrumentation import RequestStats
+        ctx = app.test_request_context('/')
+        ctx.push()
+        g._request_stats = RequestStats()
+        login_user(db.session.get(User, self.user_id))
+        g._request_stats = stats = RequestStats()
+        return ctx, stats
+
+    def test_loaded_once_images_deferred(self):
+        """Dodávateľ sa načíta raz, obrázky až pri prístupe"""
+        from sqlalchemy import inspect
+        from utils.request_context import get_current_supplier
+        ctx, stats = self._request()
+        try:
+            supplier = get_current_supplier()
+            self.assertIs(get_current_supplier(), supplier)
+            self.assertEqual(stats.sql_count, 1)
+            self.assertIn('stamp_image', inspect(supplier).unloaded)
+            self.assertTrue(supplier.stamp_image.startswith('data:image/png'))
+            self.assertEqual(stats.sql_count, 2)
+        finally:
+            ctx.pop()
+
+    def test_request_scoped_by_default(self):
+        """Bez SUPPLIER_CACHE_TTL sa dodávateľ načíta v každom requeste nanovo"""
+        from config import Config
+        from utils.request_context import get_current_supplier
+        self.assertEqual(Config.SUPPLIER_CACHE_TTL, 0)
+        for _ in range(2):
+            ctx, stats = self._request()
+            try:
+                get_current_supplier()
+                self.assertEqual(stats.sql_count, 1)
+            finally:
+                db.session.remove()
+                ctx.pop()
+
+    def test_cross_request_cache(self):
+        """S SUPPLIER_CACHE_TTL sa ďalší request zaobíde bez SELECT-u, uloženie nastavení cache zahodí"""
+        from utils.request_context import get_current_supplier, invalidate_supplier
+        app.config['SUPPLIER_CACHE_TTL'] = 60
+        ctx, stats = self._request()
+        try:
+            get_current_supplier()
+            self.assertEqual(stats.sql_count, 1)
+        finally:
+            db.session.remove()
+            ctx.pop()
+
+        # Iný worker zmení IBAN bez invalidácie tohto procesu
+        with app.app_context():
+            db.session.execute(db.update(Supplier).values(iban='SK3112000000198742637541'))
+            db.session.commit()
+
+        ctx, stats = self._request()
+        try:
+            supplier = get_current_supplier()
+            self.assertEqual(supplier.name, 'Moja firma')
+            self.assertEqual(stats.sql_count, 0)
+            # Počítadlo faktúr ani platobné údaje sa z cache neberú
+            self.assertEqual(supplier.next_invoice_number, 1)
+            self.assertEqual(supplier.iban, 'SK3112000000198742637541')
+            self.assertEqual(stats.sql_count, 1)
+
+            supplier.name = 'Nový názov'
+            db.session.commit()
+            invalidate_supplier(self.user_id)
+        finally:
+            db.session.remove()
+            ctx.pop()
+
+        ctx, stats = self._request()
+        try:
+            self.assertEqual(get_current_supplier().name, 'Nový názov')
+            self.assertEqual(stats.sql_count, 1)
+        finally:
+            db.session.remove()
+            ctx.pop()
+
+
+class TestInvoiceNumbering(unittest.TestCase):
+    """Testy atomického prideľovania čísel faktúr
+
+    Záťažový test beží nad SQLite súborom, proti PostgreSQL cez
+    STRESS_DATABASE_URL=postgresql://... python -m pytest tests.py -k InvoiceNumbering
+    """
+
+    CREATIONS = 300
+    THREADS = 16
+
+    def setUp(self):
+        import os
+        import tempfile
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from utils.migrations import migrate
+        self.tmp = tempfile.TemporaryDirectory()
+        url = os.environ.get('STRESS_DATABASE_URL') or 'sqlite:///' + os.path.join(self.tmp.name, 'numbers.db')
+        self.engine = create_engine(url, pool_size=self.THREADS)
+        migrate(self.engine, log=lambda msg: None)
+        self.Session = sessionmaker(bind=self.engine)
+
+        with self.Session() as session:
+            user = User(email=f'rad-{id(self)}@example.com', name='Rad')
+            user.set_password('password')
+            session.add(user)
+            session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678', invoice_prefix='FV')
+            client = Client(user_id=user.id, name='Odberateľ', street='Dlhá 2', city='Košice', zip_code='04001')
+            session.add_all([supplier, client])
+            session.commit()
+            self.user_id, self.supplier_id, self.client_id = user.id, supplier.id, client.id
+
+    def tearDown(self):
+        from models import InvoiceSequence
+        with self.Session() as session:
+            session.query(Invoice).filter_by(user_id=self.user_id).delete()
+            session.query(InvoiceSequence).filter_by(supplier_id=self.supplier_id).delete()
+            session.query(Client).filter_by(user_id=self.user_id).delete()
+            session.query(Supplier).filter_by(user_id=self.user_id).delete()
+            session.query(User).filter_by(id=self.user_id).delete()
+            session.commit()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _create_invoice(self, _):
+        from utils.invoice_numbering import allocate_invoice_number
+        with self.Session() as session:
+            supplier = session.get(Supplier, self.supplier_id)
+            number = allocate_invoice_number(supplier, session=session)
+            session.add(Invoice(user_id=self.user_id, invoice_number=number, variable_symbol=number[2:],
+                                supplier_id=supplier.id, client_id=self.client_id, due_date=date.today()))
+            session.commit()
+            return number
+
+    def test_parallel_creations_get_unique_numbers(self):
+        """Stovky súbežných vytvorení faktúr - žiadne duplicity ani diery v rade"""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            numbers = list(pool.map(self._create_invoice, range(self.CREATIONS)))
+
+        year = date.today().year
+        self.assertEqual(len(set(numbers)), self.CREATIONS)
+        self.assertEqual(sorted(numbers), [f'FV{year}{n:04d}' for n in range(1, self.CREATIONS + 1)])
+
+    def test_blocks_yearly_reset_and_unique_index(self):
+        """Blok čísel, nový rok od 1, duplicitné číslo zastaví unikátny index"""
+        from sqlalchemy.exc import IntegrityError
+        from utils.invoice_numbering import allocate_invoice_numbers
+        with self.Session() as session:
+            supplier = session.get(Supplier, self.supplier_id)
+            self.assertEqual(allocate_invoice_numbers(supplier, 3, year=2030, session=session),
+                             ['FV20300001', 'FV20300002', 'FV20300003'])
+            self.assertEqual(allocate_invoice_numbers(supplier, 1, year=2030, session=session), ['FV20300004'])
+            self.assertEqual(allocate_invoice_numbers(supplier, 1, year=2031, session=session), ['FV20310001'])
+            session.commit()
+
+            for _ in range(2):
+                session.add(Invoice(user_id=self.user_id, invoice_number='FV20300001', variable_symbol='20300001',
+                                    supplier_id=self.supplier_id, client_id=self.client_id, due_date=date.today()))
+            with self.assertRaises(IntegrityError):
+                session.commit()
+
+    def test_disabling_yearly_reset_continues_sequence(self):
+        """Po vypnutí ročného resetu rad pokračuje za existujúcimi číslami (žiadny IntegrityError)"""
+        year = date.today().year
+        numbers = [self._create_invoice(n) for n in range(3)]
+        self.assertEqual(numbers[-1], f'FV{year}0003')
+
+        app.config['INVOICE_NUMBER_YEARLY_RESET'] = False
+        try:
+            with app.app_context():
+                self.assertEqual([self._create_invoice(n) for n in range(2)], [f'FV{year}0004', f'FV{year}0005'])
+        finally:
+            app.config['INVOICE_NUMBER_YEARLY_RESET'] = True
+
+
+class TestBulkInvoices(unittest.TestCase):
+    """Testy hromadného vytvárania faktúr"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+            user = User(email='hromadne@example.com', name='Hromadne')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678', invoice_prefix='HB')
+            clients = [Client(user_id=user.id, name=f'Klient {n}', street='Dlhá 2', city='Košice',
+                              zip_code='04001', ico=f'1111111{n}') for n in range(3)]
+            db.session.add(supplier)
+            db.session.add_all(clients)
+            db.session.commit()
+            self.user_id = user.id
+            self.client_ids = [client.id for client in clients]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _client(self):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+        return client
+
+    def test_json_bulk_create(self):
+        """JSON dávka - súvislé čísla, položky, sumy a ActivityLog"""
+        from models import ActivityLog
+        payload = {'invoices': [{
+            'client_id': self.client_ids[n % 3],
+            'issue_date': '2026-10-31',
+            'vat_rate': 20,
+            'items': [{'description': 'Hosting', 'quantity': 2, 'unit_price': 10.5},
+                      {'description': 'Doména', 'unit_price': '12,00'}],
+        } for n in range(7)]}
+        response = self._client().post('/api/invoices/bulk', json=payload)
+        self.assertEqual(response.status_code, 201, response.get_data(as_text=True))
+        data = response.get_json()
+        self.assertEqual(data['created'], 7)
+
+        year = date.today().year
+        with app.app_context():
+            numbers = [invoice.invoice_number for invoice in Invoice.query.order_by(Invoice.id)]
+            self.assertEqual(numbers, [f'HB{year}{n:04d}' for n in range(1, 8)])
+            invoice = Invoice.query.first()
+            self.assertEqual(len(invoice.items), 2)
+            self.assertEqual(invoice.subtotal, 33.0)
+            self.assertEqual(invoice.total, Decimal('39.60'))
+            self.assertEqual(ActivityLog.query.count(), 7)
+
+    def test_csv_and_validation(self):
+        """CSV (riadky s rovnakým ref = jedna faktúra), chybný vstup nevytvorí nič"""
+        import io
+        from utils.bulk_invoices import parse_csv
+        csv_text = (
+            'ref;client_ico;due_days;description;quantity;unit_price\n'
+            'A;11111110;30;Konzultácie;3;50\n'
+            'A;11111110;30;Cestovné;1;20\n'
+            'B;11111111;;Licencia;1;99\n'
+        )
+        parsed = parse_csv(csv_text)
+        self.assertEqual([len(invoice['items']) for invoice in parsed], [2, 1])
+
+        client = self._client()
+        bad = [{'client_id': self.client_ids[0], 'items': [{'description': 'OK', 'unit_price': 1}]},
+               {'client_id': 999, 'items': [{'description': 'X', 'unit_price': 1}]},
+               {'client_id': self.client_ids[1], 'items': []}]
+        response = client.post('/api/invoices/bulk', json=bad)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.get_json()['errors']], [1, 2])
+
+        response = client.post('/api/invoices/bulk?dry_run=1',
+                               data={'file': (io.BytesIO(csv_text.encode('utf-8')), 'davka.csv')})
+        self.assertEqual(response.get_json()['valid'], 2)
+        with app.app_context():
+            self.assertEqual(Invoice.query.count(), 0)
+
+        response = client.post('/api/invoices/bulk',
+                               data={'file': (io.BytesIO(csv_text.encode('utf-8')), 'davka.csv')})
+        self.assertEqual(response.status_code, 201)
+        with app.app_context():
+            first = Invoice.query.order_by(Invoice.id).first()
+            self.assertEqual(first.total, 170.0)
+            self.assertEqual((first.due_date - first.issue_date).days, 30)
+
+
+class TestRecurringInvoices(unittest.TestCase):
+    """Testy generovania pravidelných faktúr"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+            user = User(email='pravidelne@example.com', name='Pravidelne')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678', invoice_prefix='PF')
+            client = Client(user_id=user.id, name='Klient', street='Dlhá 2', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.commit()
+            self.user_id = user.id
+            self.client_id = client.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _template(self, **kwargs):
+        import json
+        from models import RecurringInvoice
+        values = dict(user_id=self.user_id, client_id=self.client_id, name='Hosting',
+                      frequency=RecurringInvoice.FREQ_MONTHLY, start_date=date(2025, 11, 5), vat_rate=20.0,
+                      items_json=json.dumps([{'description': 'Hosting', 'quantity': 1, 'unit_price': 100}]))
+        values.update(kwargs)
+        template = RecurringInvoice(**values)
+        db.session.add(template)
+        db.session.commit()
+        return template.id
+
+    def test_catch_up_and_idempotent_rerun(self):
+        """Zmeškané obdobia sa dobehnú, čísla podľa roku obdobia, opakovaný beh nič nezdvojí"""
+        from models import RecurringInvoice
+        from utils.recurring import generate_recurring_invoices
+        with app.app_context():
+            template_id = self._template()
+            self.assertEqual(db.session.get(RecurringInvoice, template_id).next_generate_date, date(2025, 11, 5))
+
+            report = generate_recurring_invoices(today=date(2026, 1, 10))
+            self.assertEqual(report['created'], 3)
+            invoices = Invoice.query.order_by(Invoice.recurring_period).all()
+            self.assertEqual([invoice.issue_date for invoice in invoices],
+                             [date(2025, 11, 5), date(2025, 12, 5), date(2026, 1, 5)])
+            self.assertEqual([invoice.invoice_number for invoice in invoices],
+                             ['PF20250001', 'PF20250002', 'PF20260001'])
+            self.assertEqual(invoices[0].total, 120.0)
+            self.assertEqual(invoices[0].due_date, date(2025, 11, 19))
+            self.assertEqual(len(invoices[0].items), 1)
+            self.assertEqual(db.session.get(RecurringInvoice, template_id).next_generate_date, date(2026, 2, 5))
+
+            self.assertEqual(generate_recurring_invoices(today=date(2026, 1, 10))['created'], 0)
+
+            # Pád po vložení faktúry, pred posunom dátumu - obdobie sa preskočí
+            db.session.get(RecurringInvoice, template_id).next_generate_date = date(2026, 1, 5)
+            db.session.commit()
+            report = generate_recurring_invoices(today=date(2026, 1, 10))
+            self.assertEqual((report['created'], report['skipped_existing']), (0, 1))
+            self.assertEqual(Invoice.query.count(), 3)
+
+    def test_end_date_invalid_template_and_dry_run(self):
+        """Šablóna po end_date sa deaktivuje, chybná šablóna neblokuje ostatné"""
+        from models import RecurringInvoice
+        from utils.recurring import generate_recurring_invoices
+        with app.app_context():
+            ending = self._template(end_date=date(2025, 12, 31))
+            broken = self._template(name='Chybná', items_json='[]')
+
+            report = generate_recurring_invoices(today=date(2026, 3, 1), dry_run=True)
+            self.assertEqual(report['created'], 2)
+            self.assertEqual(Invoice.query.count(), 0)
+
+            report = generate_recurring_invoices(today=date(2026, 3, 1), batch_size=1)
+            self.assertEqual(report['created'], 2)
+            self.assertEqual(report['batches'], 2)
+            self.assertEqual([error['recurring_invoice_id'] for error in report['errors']], [broken])
+            self.assertFalse(db.session.get(RecurringInvoice, ending).is_active)
+            self.assertEqual(generate_recurring_invoices(today=date(2027, 1, 1))['templates'], 1)
+
+    def test_conflicting_batch_not_counted(self):
+        """Dávka zrušená kvôli súbežnému behu sa v reporte vôbec neprejaví"""
+        from unittest import mock
+        from sqlalchemy.exc import IntegrityError
+        from utils.recurring import generate_recurring_invoices
+        with app.app_context():
+            self._template(end_date=date(2025, 12, 31))
+            self._template(name='Chybná', items_json='[]')
+            conflict = IntegrityError('INSERT', {}, Exception('UNIQUE constraint failed'))
+            with mock.patch('utils.recurring.insert_invoice_batch', side_effect=conflict):
+                report = generate_recurring_invoices(today=date(2026, 3, 1))
+            self.assertEqual((report['templates'], report['created'], report['deactivated'], report['errors']),
+                             (0, 0, 0, []))
+            self.assertEqual((report['conflicts'], report['batches']), (1, 1))
+            self.assertEqual(Invoice.query.count(), 0)
+
+
+class TestActivityLog(unittest.TestCase):
+    """Testy zápisu a archivácie activity logu"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+            user = User(email='log@example.com', name='Log')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_written_after_commit_discarded_on_rollback(self):
+        """Záznam sa zapíše až po commite (natívny JSON), rollback ho zahodí"""
+        from models import ActivityLog
+        with app.app_context():
+            ActivityLog.log(ActivityLog.ACTION_INVOICE_PAID, 'Zahodená', user_id=self.user_id)
+            db.session.rollback()
+            ActivityLog.log(ActivityLog.ACTION_INVOICE_PAID, 'Uhradená', user_id=self.user_id,
+                            extra_data={'total': 12.5})
+            self.assertEqual(ActivityLog.query.count(), 0)
+            db.session.commit()
+
+            entries = ActivityLog.query.all()
+            self.assertEqual([entry.description for entry in entries], ['Uhradená'])
+            self.assertEqual(entries[0].extra_data, {'total': 12.5})
+
+            plan = ' '.join(str(row[-1]) for row in db.session.execute(db.text(
+                'EXPLAIN QUERY PLAN SELECT * FROM activity_logs WHERE user_id = 1 ORDER BY created_at DESC LIMIT 10'
+            )))
+            self.assertIn('ix_activity_logs_user_created', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_async_batches(self):
+        """Asynchrónny režim - záznamy čakajú v bufferi a zapíšu sa jednou dávkou"""
+        from models import ActivityLog
+        from utils.activity_log import writer
+        app.config.update(TESTING=False, ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_FLUSH_INTERVAL=3600)
+        try:
+            with app.app_context():
+                for n in range(5):
+                    ActivityLog.log(ActivityLog.ACTION_INVOICE_EDITED, f'Úprava {n}', user_id=self.user_id)
+                    db.session.commit()
+                self.assertEqual(writer.pending(), 5)
+                self.assertEqual(writer.flush(), 5)
+                self.assertEqual(ActivityLog.query.count(), 5)
+        finally:
+            app.config.update(TESTING=True, ACTIVITY_LOG_ASYNC=False)
+            writer.flush()
+
+    def test_sync_by_default_on_serverless(self):
+        """Na Verceli/Lambde je zápis predvolene synchrónny, explicitné nastavenie má prednosť"""
+        import importlib
+        import os
+        from unittest import mock
+        import config
+        try:
+            for env, expected in (({'VERCEL': '1'}, False), ({'AWS_LAMBDA_FUNCTION_NAME': 'faktury'}, False),
+                                  ({'VERCEL': '1', 'ACTIVITY_LOG_ASYNC': 'True'}, True), ({}, True)):
+                clean = {k: v for k, v in os.environ.items()
+                         if k not in ('VERCEL', 'AWS_LAMBDA_FUNCTION_NAME', 'ACTIVITY_LOG_ASYNC')}
+                with mock.patch.dict(os.environ, dict(clean, **env), clear=True):
+                    self.assertIs(importlib.reload(config).Config.ACTIVITY_LOG_ASYNC, expected, env)
+        finally:
+            importlib.reload(config)
+
+    def test_archive(self):
+        """Staré záznamy sa presunú do archívu po dávkach"""
+        from datetime import datetime
+        from models import ActivityLog, ActivityLogArchive
+        from utils.activity_log import archive_activity_logs
+        with app.app_context():
+            now = datetime(2026, 10, 1)
+            db.session.add_all([ActivityLog(user_id=self.user_id, action='x', description=f'#{days}',
+                                            extra_data={'days': days}, created_at=now - timedelta(days=days))
+                                for days in (1, 100, 400, 500, 800)])
+            db.session.commit()
+
+            self.assertEqual(archive_activity_logs(older_than_days=365, batch_size=2, now=now), 3)
+            self.assertEqual(sorted(entry.description for entry in ActivityLog.query), ['#1', '#100'])
+            archived = ActivityLogArchive.query.order_by(ActivityLogArchive.created_at).all()
+            self.assertEqual([entry.extra_data['days'] for entry in archived], [800, 500, 400])
+
+
+class TestPublicInvoiceView(unittest.TestCase):
+    """Testy verejnej stránky faktúry - počítanie zobrazení a QR z cache"""
+
+    def setUp(self):
+        from utils.invoice_views import clear_recent_views
+        from utils.public_invoice import clear_page_cache
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        clear_recent_views()
+        clear_page_cache()
+        with app.app_context():
+            db.create_all()
+            user = User(email='verejna@example.com', name='Verejna')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678', iban='SK3112000000198742637541')
+            client = Client(user_id=user.id, name='Klient', street='Dlhá 2', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.flush()
+            invoice = Invoice(user_id=user.id, supplier_id=supplier.id, client_id=client.id,
+                              invoice_number='FV20260001', variable_symbol='20260001', issue_date=date.today(),
+                              delivery_date=date.today(), due_date=date.today() + timedelta(days=14),
+                              total=100.0, public_token='verejny-token')
+            db.session.add(invoice)
+            db.session.commit()
+            self.invoice_id = invoice.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_views_counted_with_dedupe(self):
+        """Zobrazenia cez beacon - atomický prírastok, opakované zobrazenie v okne sa nepočíta"""
+        from models import InvoiceView
+        client = app.test_client()
+        for agent in ('Mozilla/5.0', 'Mozilla/5.0', 'Outlook-Scanner'):
+            response = client.post('/invoice/view/verejny-token/beacon', headers={'User-Agent': agent})
+            self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.post('/invoice/view/neexistuje/beacon').status_code, 204)
+
+        with app.app_context():
+            invoice = db.session.get(Invoice, self.invoice_id)
+            self.assertEqual(invoice.view_count, 2)
+            self.assertIsNotNone(invoice.first_viewed_at)
+            self.assertEqual(InvoiceView.query.count(), 2)
+
+    def test_sync_views_on_serverless(self):
+        """Na Verceli sa zobrazenia zapisujú synchrónne (vlákno na pozadí by ich stratilo)"""
+        import importlib
+        import os
+        from unittest import mock
+        import config
+        clean = {k: v for k, v in os.environ.items() if k != 'INVOICE_VIEWS_ASYNC'}
+        try:
+            with mock.patch.dict(os.environ, dict(clean, VERCEL='1'), clear=True):
+                self.assertFalse(importlib.reload(config).Config.INVOICE_VIEWS_ASYNC)
+        finally:
+            importlib.reload(config)
+
+    def test_cached_page_with_etag(self):
+        """HTML sa renderuje raz na revíziu, podmienený request dostane 304, zmena faktúry novú revíziu"""
+        from unittest import mock
+        from flask import render_template
+        client = app.test_client()
+        with mock.patch('utils.pay_by_square._warm_in_background'), \
+                mock.patch('app.render_template', wraps=render_template) as render:
+            first = client.get('/invoice/view/verejny-token')
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('s-maxage=', first.headers['Cache-Control'])
+            self.assertIn('/invoice/view/verejny-token/beacon', first.get_data(as_text=True))
+            etag = first.headers['ETag']
+
+            self.assertEqual(client.get('/invoice/view/verejny-token').get_data(), first.get_data())
+            self.assertEqual(client.get('/invoice/view/verejny-token',
+                                        headers={'If-None-Match': etag}).status_code, 304)
+            self.assertEqual(render.call_count, 1)
+
+            # Zobrazenia revíziu nemenia, úprava faktúry áno
+            client.post('/invoice/view/verejny-token/beacon')
+            self.assertEqual(client.get('/invoice/view/verejny-token').headers['ETag'], etag)
+            with app.app_context():
+                db.session.get(Invoice, self.invoice_id).note = 'Nová poznámka'
+                db.session.commit()
+            changed = client.get('/invoice/view/verejny-token', headers={'If-None-Match': etag})
+            self.assertEqual(changed.status_code, 200)
+            self.assertIn('Nová poznámka', changed.get_data(as_text=True))
+            self.assertEqual(render.call_count, 2)
+
+    def test_batched_writer(self):
+        """Viac zobrazení jednej faktúry = jeden UPDATE s prírastkom"""
+        from models import utcnow
+        from utils.invoice_views import writer
+        with app.app_context():
+            db.session.get(Invoice, self.invoice_id).view_count = 5
+            db.session.commit()
+            now = utcnow()
+            writer.write(db.engine, [{'invoice_id': self.invoice_id, 'viewed_at': now + timedelta(seconds=n),
+                                      'ip_address': f'10.0.0.{n}', 'user_agent': None} for n in range(3)])
+            db.session.expire_all()
+            invoice = db.session.get(Invoice, self.invoice_id)
+            self.assertEqual(invoice.view_count, 8)
+            self.assertEqual(invoice.last_viewed_at, now + timedelta(seconds=2))
+
+    def test_qr_from_cache_without_blocking(self):
+        """Verejná stránka nečaká na externé API - miss = lokálny QR, hit = cache"""
+        from unittest import mock
+        from utils.pay_by_square import get_invoice_qr_code, invoice_qr_params, _qr_cache
+        with app.app_context():
+            invoice = db.session.get(Invoice, self.invoice_id)
+            _qr_cache.delete(tuple(sorted(invoice_qr_params(invoice).items())))
+            with mock.patch('utils.pay_by_square.generate_qr_code_external') as external, \
+                    mock.patch('utils.pay_by_square._warm_in_background') as warm:
+                qr_code = get_invoice_qr_code(invoice, blocking=False)
+                self.assertTrue(qr_code.startswith('data:image/png;base64,'))
+                external.assert_not_called()
+                warm.assert_called_once()
+
+            _qr_cache.set(tuple(sorted(invoice_qr_params(invoice).items())), 'data:image/png;base64,CACHED')
+            response = app.test_client().get('/invoice/view/verejny-token')
+            self.assertIn('data:image/png;base64,CACHED', response.get_data(as_text=True))
+
+
+class TestViewAnalytics(unittest.TestCase):
+    """Testy agregácie zobrazení faktúr"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+            user = User(email='analytika@example.com', name='Analytika')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678')
+            client = Client(user_id=user.id, name='Klient', street='Dlhá 2', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.flush()
+            invoices = [Invoice(user_id=user.id, supplier_id=supplier.id, client_id=client.id,
+                                invoice_number=f'FV2026000{n}', variable_symbol=f'2026000{n}',
+                                issue_date=date(2026, 3, 1),
+                                delivery_date=date(2026, 3, 1), due_date=date(2026, 3, 15), public_token=f'token-{n}')
+                        for n in (1, 2)]
+            db.session.add_all(invoices)
+            db.session.commit()
+            self.user_id = user.id
+            self.invoice_ids = [invoice.id for invoice in invoices]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _views(self, invoice_id, *views):
+        from datetime import datetime
+        from models import InvoiceView
+        db.session.add_all([InvoiceView(invoice_id=invoice_id, viewed_at=datetime.fromisoformat(at), ip_address=ip,
+                                        user_agent='Mozilla') for at, ip in views])
+        db.session.commit()
+
+    def test_incremental_rollup(self):
+        """Denné agregáty, unikátni diváci, čas po prvé otvorenie a idempotentný opakovaný beh"""
+        from datetime import datetime
+        from models import ActivityLog, InvoiceViewDaily, InvoiceViewStats, UserViewDaily
+        from utils.view_analytics import rollup_views
+        first, second = self.invoice_ids
+        with app.app_context():
+            db.session.add(ActivityLog(user_id=self.user_id, action=ActivityLog.ACTION_INVOICE_SENT,
+                                       description='Odoslaná', invoice_id=first,
+                                       created_at=datetime(2026, 3, 1, 9, 0)))
+            db.session.commit()
+            self._views(first, ('2026-03-01T08:00', '10.0.0.1'), ('2026-03-01T11:30', '10.0.0.2'),
+                        ('2026-03-01T12:00', '10.0.0.2'))
+            self._views(second, ('2026-03-01T10:00', '10.0.0.3'))
+            self.assertEqual(rollup_views(batch_size=3)['rows'], 4)
+
+            # Ďalšie zobrazenia - prepočíta sa len dotknutý deň
+            self._views(first, ('2026-03-01T18:00', '10.0.0.4'), ('2026-03-02T07:00', '10.0.0.1'))
+            self.assertEqual(rollup_views()['rows'], 2)
+            self.assertEqual(rollup_views()['rows'], 0)
+
+            daily = {row.day: (row.views, row.unique_viewers)
+                     for row in InvoiceViewDaily.query.filter_by(invoice_id=first)}
+            self.assertEqual(daily, {date(2026, 3, 1): (4, 3), date(2026, 3, 2): (1, 1)})
+            user_day = db.session.get(UserViewDaily, (self.user_id, date(2026, 3, 1)))
+            self.assertEqual((user_day.views, user_day.unique_viewers, user_day.invoices_viewed), (5, 4, 2))
+
+            stats = db.session.get(InvoiceViewStats, first)
+            self.assertEqual((stats.views, stats.unique_viewers), (5, 3))
+            self.assertEqual(stats.first_viewed_at, datetime(2026, 3, 1, 8, 0))
+            self.assertEqual(stats.last_viewed_at, datetime(2026, 3, 2, 7, 0))
+            self.assertEqual(stats.first_open_seconds, 9000)
+
+    def test_late_commit_rescanned(self):
+        """Záznam s nižším id commitnutý až po posunutí značky sa započíta v ďalšom behu"""
+        from datetime import datetime
+        from models import InvoiceView, InvoiceViewDaily, InvoiceViewStats
+        from utils.view_analytics import rollup_views
+        first = self.invoice_ids[0]
+        run = datetime(2026, 3, 1, 12, 0)
+        with app.app_context():
+            # Id 1 si rezervoval iný worker, commitne ho až po behu rollupu
+            db.session.add(InvoiceView(id=2, invoice_id=first, viewed_at=datetime(2026, 3, 1, 11, 59),
+                                       ip_address='10.0.0.2', user_agent='Mozilla'))
+            db.session.commit()
+            self.assertEqual(rollup_views(now=run)['rows'], 1)
+
+            db.session.add(InvoiceView(id=1, invoice_id=first, viewed_at=datetime(2026, 3, 1, 11, 58),
+                                       ip_address='10.0.0.1', user_agent='Mozilla'))
+            db.session.commit()
+            report = rollup_views(now=run + timedelta(hours=1))
+            self.assertEqual((report['rows'], report['rescanned']), (0, 2))
+
+            daily = db.session.get(InvoiceViewDaily, (first, date(2026, 3, 1)))
+            self.assertEqual((daily.views, daily.unique_viewers), (2, 2))
+            stats = db.session.get(InvoiceViewStats, first)
+            self.assertEqual((stats.views, stats.unique_viewers), (2, 2))
+            self.assertEqual(stats.first_viewed_at, datetime(2026, 3, 1, 11, 58))
+
+            # Mimo okna sa už nič znova neprechádza
+            self.assertEqual(rollup_views(now=run + timedelta(days=1))['rescanned'], 0)
+            self.assertEqual(InvoiceView.query.count(), 2)
+
+    def test_purge_and_endpoint(self):
+        """Retencia maže len spracované surové záznamy, endpoint číta agregáty"""
+        from datetime import datetime
+        from models import InvoiceView
+        from utils.view_analytics import purge_raw_views, rollup_views
+        first = self.invoice_ids[0]
+        with app.app_context():
+            self._views(first, ('2026-01-01T10:00', '10.0.0.1'), ('2026-03-01T10:00', '10.0.0.2'))
+            rollup_views()
+            self._views(first, ('2025-12-01T10:00', '10.0.0.9'))  # ešte nespracované
+            now = datetime(2026, 3, 10)
+            self.assertEqual(purge_raw_views(older_than_days=30, now=now), 1)
+            self.assertEqual(InvoiceView.query.count(), 2)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+        data = client.get(f'/api/invoices/{first}/views?days=3650').get_json()
+        self.assertEqual((data['views'], data['unique_viewers']), (2, 2))
+        self.assertEqual([day['day'] for day in data['daily']], ['2026-01-01', '2026-03-01'])
+        self.assertEqual(client.get('/api/invoices/99999/views').status_code, 404)
+
+
+class TestMoney(unittest.TestCase):
+    """Testy presnej aritmetiky súm (utils.money)"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_rounding_and_cents(self):
+        """Zaokrúhlenie na centy (half-up), prevod na centy a späť"""
+        from utils.money import from_cents, money, percent_of, to_cents
+        self.assertEqual(money(2.675), Decimal('2.68'))  # float round() dá 2.67
+        self.assertEqual(money('10,5'.replace(',', '.')), Decimal('10.50'))
+        self.assertEqual(sum((money(0.1) for _ in range(10)), Decimal(0)), Decimal('1.00'))
+        self.assertEqual(percent_of(Decimal('0.25'), 20.0), Decimal('0.05'))
+        self.assertEqual(to_cents(Decimal('1234.56')), 123456)
+        self.assertEqual(from_cents(123456), Decimal('1234.56'))
+
+    def test_dashboard_sums_in_cents(self):
+        """Uložené sumy sú Decimal, dashboard sčíta v celých centoch"""
+        from utils.money import from_cents, sum_cents
+        with app.app_context():
+            user = User(email='peniaze@example.com', name='Peniaze')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678')
+            client = Client(user_id=user.id, name='Klient', street='Dlhá 2', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.flush()
+            for n in range(10):
+                invoice = Invoice(user_id=user.id, supplier_id=supplier.id, client_id=client.id,
+                                  invoice_number=f'FV202600{n:02d}', variable_symbol=f'202600{n:02d}',
+                                  due_date=date.today(), vat_rate=0.0, status=Invoice.STATUS_PAID,
+                                  paid_date=date.today())
+                db.session.add(invoice)
+                db.session.flush()
+                invoice.add_item(InvoiceItem(description='Drobnosť', quantity=1, unit_price=0.1, cost_price=0.03))
+            db.session.commit()
+            user_id = user.id
+
+            invoice = Invoice.query.first()
+            self.assertIsInstance(invoice.total, Decimal)
+            self.assertEqual((invoice.total, invoice.profit), (Decimal('0.10'), Decimal('0.07')))
+            cents = db.session.scalar(db.select(sum_cents(Invoice.total)).where(Invoice.user_id == user_id))
+            self.assertEqual(from_cents(cents), Decimal('1.00'))
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+        response = client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('0,70', response.get_data(as_text=True))  # zisk 10 x 0,07
+
+
+class TestInvoiceItemEditing(unittest.TestCase):
+    """Testy úpravy položiek faktúry len rozdielom (utils.invoice_items)"""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        with app.app_context():
+            db.create_all()
+            user = User(email='polozky@example.com', name='Položky')
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            supplier = Supplier(user_id=user.id, name='Dodávateľ', street='Hlavná 1', city='Bratislava',
+                                zip_code='81101', ico='12345678')
+            client = Client(user_id=user.id, name='Klient', street='Dlhá 2', city='Košice', zip_code='04001')
+            db.session.add_all([supplier, client])
+            db.session.flush()
+            invoice = Invoice(user_id=user.id, supplier_id=supplier.id, client_id=client.id,
+                              invoice_number='FV20260001', variable_symbol='20260001', due_date=date.today(),
+                              vat_rate=20.0)
+            db.session.add(invoice)
+            db.session.flush()
+            for position, (description, price) in enumerate([('Prvá', 100), ('Druhá', 50), ('Tretia', 10)]):
+                invoice.add_item(InvoiceItem(description=description, quantity=1, unit='ks', unit_price=price,
+                                             cost_price=0, item_note='', position=position))
+            db.session.commit()
+            self.user_id, self.client_id, self.invoice_id = user.id, client.id, invoice.id
+            self.item_ids = [item.id for item in invoice.items]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_edit_writes_only_changes(self):
+        """Nezmenená položka sa nezapíše, zmenená/nová/odobratá jedným príkazom, id ostávajú"""
+        from sqlalchemy import event
+        from utils.invoice_totals import check_invoice_totals
+        first, second, _ = self.item_ids
+        form = {
+            'client_id': str(self.client_id), 'issue_date': date.today().isoformat(),
+            'delivery_date': date.today().isoformat(), 'due_date': date.today().isoformat(),
+            'payment_method': 'prevod', 'vat_rate': '20',
+            'item_id[]': [str(first), str(second), ''],
+            'item_description[]': ['Prvá', 'Druhá', 'Nová'],
+            'item_note[]': ['', '', ''],
+            'item_quantity[]': ['1', '2', '3'],
+            'item_unit[]': ['ks', 'ks', 'hod'],
+            'item_unit_price[]': ['100', '50', '0.1'],
+            'item_cost_price[]': ['0', '0', '0'],
+        }
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+
+        statements = []
+        with app.app_context():
+            listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0:3])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = client.post(f'/invoices/{self.invoice_id}/edit', data=form)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 302)
+        item_writes = [words[0] for words in statements if 'invoice_items' in words]
+        self.assertEqual(sorted(item_writes), ['DELETE', 'INSERT', 'UPDATE'])
+
+        with app.app_context():
+            invoice = db.session.get(Invoice, self.invoice_id)
+            self.assertEqual([(item.id, item.description) for item in invoice.items][:2],
+                             [(first, 'Prvá'), (second, 'Druhá')])
+            self.assertEqual([item.description for item in invoice.items], ['Prvá', 'Druhá', 'Nová'])
+            self.assertEqual((invoice.subtotal, invoice.total), (Decimal('200.30'), Decimal('240.36')))
+            self.assertEqual(check_invoice_totals()['drifted'], [])
+
+            # Opätovné uloženie bez zmien nič nezapíše
+            from utils.invoice_items import reconcile_items
+            rows = [{'id': item.id, 'description': item.description, 'item_note': item.item_note,
+                     'quantity': item.quantity, 'unit': item.unit, 'unit_price': item.unit_price,
+                     'cost_price': item.cost_price, 'position': item.position} for item in invoice.items]
+            self.assertEqual(reconcile_items(invoice, rows),
+                             {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,116 @@
+"""
+Activity log - hromadný zápis mimo requestu
+ActivityLog.log() len pridá riadok k session. Po commite sa riadky presunú
+do bufferu procesu a vlákno na pozadí ich zapíše jedným INSERT-om na dávku
+(ACTIVITY_LOG_BATCH_SIZE, najneskôr po ACTIVITY_LOG_FLUSH_INTERVAL s).
+Rollback ich zahodí - v logu je len to, čo sa naozaj stalo.
+
+- ACTIVITY_LOG_ASYNC=False (a testy) zapisuje hneď po commite
+- buffer je obmedzený (ACTIVITY_LOG_MAX_BUFFER), pri zahltení sa zahodia
+  najstaršie záznamy s varovaním - log nikdy nezdrží ani nezhodí request
+- pri ukončení procesu sa zvyšok bufferu zapíše (atexit)
+- staré záznamy presúva archive_activity_logs() do activity_logs_archive
+  (`flask archive-activity`, ACTIVITY_LOG_RETENTION_DAYS)
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, scoped_session
+
+from models import db, utcnow, ActivityLog, ActivityLogArchive, Client, Invoice
+from utils.buffered_writer import BufferedWriter
+
+_PENDING_KEY = '_activity_log_pending'
+
+
+class ActivityLogWriter(BufferedWriter):
+    """Hromadný INSERT záznamov activity logu"""
+
+    name = 'activity-log-writer'
+    config_prefix = 'ACTIVITY_LOG_'
+
+    def write(self, engine, rows):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(ActivityLog), rows)
+        except IntegrityError:
+            # Faktúra/klient bol zmazaný skôr, než sa záznam zapísal - odkaz sa vynuluje
+            with engine.begin() as conn:
+                conn.execute(insert(ActivityLog), _without_dangling(conn, rows))
+
+
+def _without_dangling(conn, rows):
+    invoice_ids = {row['invoice_id'] for row in rows if row.get('invoice_id')}
+    client_ids = {row['client_id'] for row in rows if row.get('client_id')}
+    if invoice_ids:
+        invoice_ids = set(conn.scalars(select(Invoice.id).where(Invoice.id.in_(invoice_ids))))
+    if client_ids:
+        client_ids = set(conn.scalars(select(Client.id).where(Client.id.in_(client_ids))))
+    return [dict(row,
+                 invoice_id=row.get('invoice_id') if row.get('invoice_id') in invoice_ids else None,
+                 client_id=row.get('client_id') if row.get('client_id') in client_ids else None)
+            for row in rows]
+
+
+writer = ActivityLogWriter()
+
+
+def record(session, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Pridá záznam k session - zapíše sa po jej commite"""
+    if isinstance(session, scoped_session):
+        session = session()
+    if not session.in_transaction():
+        # Aby aj rollback pred prvým dotazom záznam zahodil
+        session.begin()
+    session.info.setdefault(_PENDING_KEY, []).append(row)
+    return row
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    rows = session.info.pop(_PENDING_KEY, None)
+    if rows:
+        writer.enqueue(session.get_bind(), rows)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    # Aj rollback bez začatej transakcie; rollback savepointu záznamy nechá
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def archive_activity_logs(older_than_days: Optional[int] = None, batch_size: int = 5000,
+                          session=None, now: Optional[datetime] = None) -> int:
+    """
+    Presunie záznamy staršie ako older_than_days (ACTIVITY_LOG_RETENTION_DAYS)
+    do activity_logs_archive. Po dávkach, každá dávka = jedna transakcia.
+    Vráti počet presunutých záznamov.
+    """
+    session = session or db.session
+    if older_than_days is None:
+        older_than_days = current_app.config.get('ACTIVITY_LOG_RETENTION_DAYS', 365) if has_app_context() else 365
+    cutoff = (now or utcnow()) - timedelta(days=older_than_days)
+    columns = ['id', 'user_id', 'action', 'description', 'invoice_id', 'client_id', 'extra_data', 'created_at']
+
+    moved = 0
+    while True:
+        ids = session.scalars(
+            select(ActivityLog.id).where(ActivityLog.created_at < cutoff).order_by(ActivityLog.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        try:
+            session.execute(insert(ActivityLogArchive).from_select(
+                columns, select(*(getattr(ActivityLog, name) for name in columns)).where(ActivityLog.id.in_(ids))
+            ))
+            session.execute(delete(ActivityLog).where(ActivityLog.id.in_(ids)))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        moved += len(ids)
+    return moved
@@ -0,0 +1,116 @@
+"""
+Buffer zápisov procesu s vláknom na pozadí
+Spoločný základ pre activity log a počítanie zobrazení faktúr: riadky sa
+zbierajú v pamäti a zapíšu po dávkach vlastnou transakciou mimo requestu.
+
+Nastavenia sa čítajú z konfigurácie podľa prefixu (napr. ACTIVITY_LOG_):
+- <PREFIX>_ASYNC - False (a TESTING) zapisuje hneď pri enqueue(); na serverless
+  (Vercel, Lambda) predvolene False - zmrazený proces vlákno nespustí a atexit
+  sa pri ukončení nezavolá, buffer by sa stratil
+- <PREFIX>_BATCH_SIZE - riadkov v jednom príkaze, pri naplnení sa zapisuje hneď
+- <PREFIX>_FLUSH_INTERVAL - najneskôr po tomto čase (s)
+- <PREFIX>_MAX_BUFFER - pri zahltení sa zahodia najstaršie riadky s varovaním
+"""
+import atexit
+from abc import ABC, abstractmethod
+import logging
+import os
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import is_serverless
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter(ABC):
+    """Základ bufferovaných zápisov, podtriedy implementujú write()"""
+
+    name = 'writer'
+    config_prefix = ''
+    defaults = {'ASYNC': not is_serverless(), 'BATCH_SIZE': 200, 'FLUSH_INTERVAL': 2.0, 'MAX_BUFFER': 10000}
+
+    def __init__(self):
+        self.engine = None
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _after_fork(self):
+        # Vlákno ani zámky sa do gunicorn workera neprenesú - začne nanovo
+        if self._pid != os.getpid():
+            self._reset()
+
+    def setting(self, key):
+        default = self.defaults[key]
+        return current_app.config.get(f'{self.config_prefix}{key}', default) if has_app_context() else default
+
+    @abstractmethod
+    def write(self, engine, rows):
+        """Zapíše dávku riadkov (zoznam dict) vlastnou transakciou na engine, chyby propaguje"""
+
+    def enqueue(self, engine, rows):
+        self._after_fork()
+        max_buffer = self.setting('MAX_BUFFER')
+        with self._lock:
+            self.engine = engine
+            self._rows.extend(rows)
+            overflow = len(self._rows) - max_buffer
+            if overflow > 0:
+                del self._rows[:overflow]
+                logger.warning('%s buffer full, dropped %d oldest entries', self.name, overflow)
+            pending = len(self._rows)
+
+        if not self.setting('ASYNC') or (has_app_context() and current_app.config.get('TESTING')):
+            self.flush()
+            return
+        self._ensure_thread(self.setting('FLUSH_INTERVAL'))
+        if pending >= self.setting('BATCH_SIZE'):
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        """Zapíše celý buffer (po dávkach), vráti počet zapísaných riadkov"""
+        self._after_fork()
+        batch_size = self.setting('BATCH_SIZE')
+        written = 0
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                try:
+                    self.write(self.engine, chunk)
+                    written += len(chunk)
+                except SQLAlchemyError:
+                    logger.exception('%s batch of %d entries dropped', self.name, len(chunk))
+        return written
+
+    def _ensure_thread(self, interval):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, args=(interval,), name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('%s failed', self.name)
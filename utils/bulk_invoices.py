@@ -0,0 +1,294 @@
+"""
+Hromadné vytváranie faktúr (mesačná fakturácia)
+Vstup je JSON zoznam faktúr s položkami alebo CSV (riadok = položka,
+riadky s rovnakým `ref` tvoria jednu faktúru).
+
+- celý vstup sa najprv zvaliduje, pri chybe sa nevytvorí nič
+- klienti sa načítajú raz (podľa id aj IČO)
+- po dávkach (chunk_size): blok čísel faktúr, bulk INSERT faktúr
+  (RETURNING id), položiek a ActivityLog záznamov, jeden commit na dávku
+"""
+import csv
+import io
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+
+from models import db, utcnow, ActivityLog, Client, Invoice, InvoiceItem
+from utils.invoice_numbering import allocate_invoice_numbers
+from utils.money import ZERO, money, percent_of, to_decimal
+
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_DUE_DAYS = 14
+
+INVOICE_FIELDS = ('ref', 'client_id', 'client_ico', 'issue_date', 'delivery_date', 'due_date',
+                  'due_days', 'payment_method', 'vat_rate', 'note', 'internal_note')
+ITEM_FIELDS = ('description', 'item_note', 'quantity', 'unit', 'unit_price', 'cost_price')
+
+PAYMENT_METHODS = {value for value, _ in Invoice.PAYMENT_CHOICES}
+
+
+class BulkValidationError(ValueError):
+    """Vstup obsahuje chyby - nevytvorila sa žiadna faktúra"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} chýb vo vstupe')
+        self.errors = errors
+
+
+def parse_csv(text: str) -> List[Dict[str, Any]]:
+    """CSV (riadok = položka) -> zoznam faktúr; bez stĺpca ref je každý riadok faktúra"""
+    invoices = {}
+    reader = csv.DictReader(io.StringIO(text.lstrip('﻿')), delimiter=';' if ';' in text.split('\n', 1)[0] else ',')
+    for line, row in enumerate(reader, start=2):
+        row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        ref = row.get('ref') or f'line-{line}'
+        invoice = invoices.get(ref)
+        if invoice is None:
+            invoice = invoices[ref] = {field: row[field] for field in INVOICE_FIELDS if row.get(field)}
+            invoice['items'] = []
+        invoice['items'].append({field: row[field] for field in ITEM_FIELDS if row.get(field)})
+    return list(invoices.values())
+
+
+def parse_payload(data: Any) -> List[Dict[str, Any]]:
+    """JSON telo ({"invoices": [...]} alebo priamo zoznam)"""
+    if isinstance(data, dict):
+        data = data.get('invoices')
+    if not isinstance(data, list):
+        raise BulkValidationError([{'index': None, 'error': 'Očakáva sa zoznam faktúr'}])
+    return data
+
+
+def _date(value, field):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{field}: neplatný dátum {value!r} (RRRR-MM-DD)')
+
+
+def _number(value, field, default=None):
+    if value in (None, ''):
+        if default is None:
+            raise ValueError(f'{field}: chýba')
+        return default
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        raise ValueError(f'{field}: neplatné číslo {value!r}')
+
+
+def _validate_invoice(raw, clients_by_id, clients_by_ico, today):
+    if not isinstance(raw, dict):
+        raise ValueError('faktúra musí byť objekt')
+
+    client = None
+    if raw.get('client_id') not in (None, ''):
+        try:
+            client = clients_by_id.get(int(raw['client_id']))
+        except (TypeError, ValueError):
+            pass
+    elif raw.get('client_ico'):
+        client = clients_by_ico.get(str(raw['client_ico']).replace(' ', ''))
+    if client is None:
+        raise ValueError('klient neexistuje (client_id alebo client_ico)')
+
+    issue_date = _date(raw['issue_date'], 'issue_date') if raw.get('issue_date') else today
+    delivery_date = _date(raw['delivery_date'], 'delivery_date') if raw.get('delivery_date') else issue_date
+    if raw.get('due_date'):
+        due_date = _date(raw['due_date'], 'due_date')
+    else:
+        due_date = issue_date + timedelta(days=int(_number(raw.get('due_days'), 'due_days', DEFAULT_DUE_DAYS)))
+
+    payment_method = raw.get('payment_method') or Invoice.PAYMENT_TRANSFER
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError(f'payment_method: {payment_method!r} (povolené: {", ".join(sorted(PAYMENT_METHODS))})')
+    vat_rate = _number(raw.get('vat_rate'), 'vat_rate', 0.0)
+    if not 0 <= vat_rate <= 100:
+        raise ValueError('vat_rate: mimo rozsahu 0-100')
+
+    items = parse_items(raw.get('items'))
+    subtotal, vat_amount, total = invoice_totals(items, vat_rate)
+    return {
+        'client': client,
+        'issue_date': issue_date,
+        'delivery_date': delivery_date,
+        'due_date': due_date,
+        'payment_method': payment_method,
+        'vat_rate': vat_rate,
+        'note': raw.get('note') or '',
+        'internal_note': raw.get('internal_note') or '',
+        'subtotal': subtotal,
+        'vat_amount': vat_amount,
+        'total': total,
+        'items': items,
+    }
+
+
+def parse_items(raw_items) -> List[Dict[str, Any]]:
+    """Zvaliduje položky a vráti riadky pre invoice_items (bez invoice_id)"""
+    items = []
+    for position, item in enumerate(raw_items or []):
+        description = str(item.get('description') or '').strip()
+        if not description:
+            raise ValueError(f'items[{position}].description: chýba')
+        quantity = _number(item.get('quantity'), f'items[{position}].quantity', 1.0)
+        unit_price = money(_number(item.get('unit_price'), f'items[{position}].unit_price'))
+        items.append({
+            'description': description[:500],
+            'item_note': item.get('item_note') or '',
+            'quantity': quantity,
+            'unit': item.get('unit') or 'ks',
+            'unit_price': unit_price,
+            'cost_price': money(_number(item.get('cost_price'), f'items[{position}].cost_price', 0.0)),
+            'total': money(to_decimal(quantity) * unit_price),
+            'position': position,
+        })
+    if not items:
+        raise ValueError('faktúra nemá položky')
+    return items
+
+
+def invoice_totals(items, vat_rate):
+    """(subtotal, vat_amount, total) - rovnaký výpočet ako Invoice.calculate_totals()"""
+    subtotal = sum((item['total'] for item in items), ZERO)
+    vat_amount = percent_of(subtotal, vat_rate) if vat_rate > 0 else ZERO
+    return subtotal, vat_amount, subtotal + vat_amount
+
+
+def invoice_cost(items, subtotal):
+    """(total_cost, profit) - rovnaký výpočet ako InvoiceItem.cost_total"""
+    total_cost = sum((money(item['cost_price'] * to_decimal(item['quantity'])) for item in items), ZERO)
+    return total_cost, subtotal - total_cost
+
+
+def validate_invoices(payloads: Iterable[Dict[str, Any]], user_id: int,
+                      session=None, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Zvaliduje celý vstup; pri akejkoľvek chybe vyhodí BulkValidationError so zoznamom chýb"""
+    session = session or db.session
+    clients = session.query(Client).filter_by(user_id=user_id).all()
+    clients_by_id = {client.id: client for client in clients}
+    clients_by_ico = {(client.ico or '').replace(' ', ''): client for client in clients if client.ico}
+    today = today or date.today()
+
+    specs, errors = [], []
+    for index, raw in enumerate(payloads):
+        try:
+            specs.append(_validate_invoice(raw, clients_by_id, clients_by_ico, today))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            errors.append({'index': index, 'ref': raw.get('ref') if isinstance(raw, dict) else None,
+                           'error': str(e)})
+    if not specs and not errors:
+        errors.append({'index': None, 'error': 'Vstup neobsahuje žiadne faktúry'})
+    if errors:
+        raise BulkValidationError(errors)
+    return specs
+
+
+def insert_invoice_batch(session, rows) -> List[int]:
+    """
+    Bulk INSERT pripravených faktúr - rows: stĺpce faktúry + 'items' (riadky položiek)
+    + 'log_description' a 'log_extra' pre ActivityLog. Vráti id faktúr v poradí rows.
+    """
+    now = utcnow()
+    invoice_rows = [
+        dict({key: value for key, value in row.items() if key not in ('items', 'log_description', 'log_extra')},
+             status=Invoice.STATUS_ISSUED, view_count=0, created_at=now, updated_at=now)
+        for row in rows
+    ]
+    for invoice_row, row in zip(invoice_rows, rows):
+        invoice_row['total_cost'], invoice_row['profit'] = invoice_cost(row['items'], row['subtotal'])
+    invoice_ids = session.scalars(
+        insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True), invoice_rows
+    ).all()
+
+    item_rows = [dict(item, invoice_id=invoice_id)
+                 for invoice_id, row in zip(invoice_ids, rows) for item in row['items']]
+    if item_rows:
+        session.execute(insert(InvoiceItem), item_rows)
+
+    log_rows = [{
+        'user_id': row['user_id'],
+        'action': ActivityLog.ACTION_INVOICE_CREATED,
+        'description': row['log_description'][:500],
+        'invoice_id': invoice_id,
+        'client_id': row['client_id'],
+        'extra_data': dict(row.get('log_extra') or {}, total=float(row['total'])),
+        'created_at': now,
+    } for invoice_id, row in zip(invoice_ids, rows)]
+    session.execute(insert(ActivityLog), log_rows)
+    return invoice_ids
+
+
+def _insert_chunk(session, user_id, supplier, specs):
+    numbers = allocate_invoice_numbers(supplier, len(specs), session=session)
+    rows = [{
+        'user_id': user_id,
+        'invoice_number': number,
+        'variable_symbol': number.replace('/', ''),
+        'supplier_id': supplier.id,
+        'client_id': spec['client'].id,
+        'issue_date': spec['issue_date'],
+        'delivery_date': spec['delivery_date'],
+        'due_date': spec['due_date'],
+        'payment_method': spec['payment_method'],
+        'vat_rate': spec['vat_rate'],
+        'note': spec['note'],
+        'internal_note': spec['internal_note'],
+        'subtotal': spec['subtotal'],
+        'vat_amount': spec['vat_amount'],
+        'total': spec['total'],
+        'items': spec['items'],
+        'log_description': f"Faktúra {number} vytvorená pre {spec['client'].name}",
+        'log_extra': {'bulk': True},
+    } for number, spec in zip(numbers, specs)]
+    return list(zip(insert_invoice_batch(session, rows), numbers))
+
+
+def create_invoices(user_id: int, supplier, specs: List[Dict[str, Any]],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, session=None) -> Dict[str, Any]:
+    """
+    Vytvorí zvalidované faktúry po dávkach (každá dávka = jedna transakcia).
+    Vráti {'created', 'invoices': [{'id', 'invoice_number'}], 'chunks'}.
+    """
+    session = session or db.session
+    created = []
+    chunks = 0
+    for start in range(0, len(specs), chunk_size):
+        try:
+            created.extend(_insert_chunk(session, user_id, supplier, specs[start:start + chunk_size]))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        chunks += 1
+    return {
+        'created': len(created),
+        'chunks': chunks,
+        'invoices': [{'id': invoice_id, 'invoice_number': number} for invoice_id, number in created],
+    }
+
+
+def bulk_create_invoices(payloads, user_id: int, supplier, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         dry_run: bool = False, session=None) -> Dict[str, Any]:
+    """Validácia + vytvorenie; dry_run len overí vstup"""
+    specs = validate_invoices(payloads, user_id, session=session)
+    if dry_run:
+        return {'created': 0, 'valid': len(specs), 'dry_run': True}
+    return create_invoices(user_id, supplier, specs, chunk_size=chunk_size, session=session)
+
+
+def read_input(text: str, filename: str = '') -> List[Dict[str, Any]]:
+    """Načíta JSON alebo CSV podľa prípony / obsahu"""
+    stripped = text.lstrip('﻿ \n\r\t')
+    if filename.lower().endswith('.json') or stripped[:1] in '[{':
+        try:
+            return parse_payload(json.loads(stripped))
+        except json.JSONDecodeError as e:
+            raise BulkValidationError([{'index': None, 'error': f'Neplatný JSON: {e}'}])
+    return parse_csv(text)
@@ -0,0 +1,257 @@
+"""
+PAY by square enkodér
+Jediná implementácia kódovania podľa SBA štandardu (verzia 1.1.0),
+ktorú zdieľajú všetky miesta generujúce QR kódy.
+
+Postup kódovania:
+    tab-separated dáta -> CRC32 (4B LE) + dáta -> LZMA1 raw
+    -> [2B bysquare header][2B dĺžka LE][LZMA] -> base32hex
+"""
+import base64
+import binascii
+import lzma
+import struct
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
+
+from utils.money import money
+
+
+# ==============================================================================
+# PREDPOČÍTANÉ KONŠTANTY
+# ==============================================================================
+
+# LZMA1 raw: lc=3, lp=0, pb=2, slovník 128 KiB (podľa špecifikácie)
+LZMA_FILTERS = (
+    {
+        'id': lzma.FILTER_LZMA1,
+        'lc': 3,
+        'lp': 0,
+        'pb': 2,
+        'dict_size': 128 * 1024,
+    },
+)
+
+# bySquareType=0 (PAY), version=0, documentType=0, reserved=0
+BYSQUARE_HEADER = b'\x00\x00'
+
+_LENGTH_STRUCT = struct.Struct('<H')
+_CRC_STRUCT = struct.Struct('<I')
+
+# Trvalé príkazy a inkaso sa nekódujú (StandingOrderExt/DirectDebitExt = 0)
+PAYMENT_ORDER = '1'
+
+NOTE_MAX_LENGTH = 140
+NAME_MAX_LENGTH = 70
+
+
+class BySquareError(ValueError):
+    """Chyba pri kódovaní alebo dekódovaní PAY by square reťazca"""
+
+
+# ==============================================================================
+# ZOSTAVENIE DÁT
+# ==============================================================================
+
+def _clean_iban(iban: str) -> str:
+    return (iban or '').replace(' ', '').replace('-', '').upper()
+
+
+def _format_amount(amount) -> str:
+    """Suma na centy bez koncových núl (100 -> '100', 10.50 -> '10.5') ako referenčná implementácia"""
+    if amount is None or amount == '':
+        return ''
+    return f'{money(amount).normalize():f}'
+
+
+def _format_date(value) -> str:
+    if not value:
+        return ''
+    if isinstance(value, date):
+        return value.strftime('%Y%m%d')
+    return str(value).replace('-', '')
+
+
+def _payment_fields(payment: Dict[str, Any]) -> List[str]:
+    """Vráti polia jednej platby v poradí podľa špecifikácie"""
+    accounts = payment.get('accounts')
+    if not accounts:
+        accounts = [{'iban': payment.get('iban', ''), 'swift': payment.get('swift', '')}]
+
+    fields = [
+        payment.get('type', PAYMENT_ORDER),
+        _format_amount(payment.get('amount')),
+        payment.get('currency') or 'EUR',
+        _format_date(payment.get('due_date')),
+        payment.get('variable_symbol') or '',
+        payment.get('constant_symbol') or '',
+        payment.get('specific_symbol') or '',
+        payment.get('reference') or '',
+        (payment.get('note') or '')[:NOTE_MAX_LENGTH],
+        str(len(accounts)),
+    ]
+    for account in accounts:
+        fields.append(_clean_iban(account.get('iban', '')))
+        fields.append((account.get('swift') or '').upper())
+
+    fields += [
+        '0',  # StandingOrderExt
+        '0',  # DirectDebitExt
+        (payment.get('beneficiary_name') or '')[:NAME_MAX_LENGTH],
+        (payment.get('beneficiary_address_1') or '')[:NAME_MAX_LENGTH],
+        (payment.get('beneficiary_address_2') or '')[:NAME_MAX_LENGTH],
+    ]
+    return fields
+
+
+def build_payment_data(payments: Iterable[Dict[str, Any]], invoice_id: str = '') -> str:
+    """
+    Zostaví tab-separated dátový reťazec pre jednu alebo viac platieb.
+
+    Každá platba je dict s kľúčmi amount, iban, swift (alebo accounts),
+    currency, due_date, variable_symbol, constant_symbol, specific_symbol,
+    reference, note, beneficiary_name, beneficiary_address_1/2.
+    """
+    payments = list(payments)
+    if not payments:
+        raise BySquareError('PAY by square vyžaduje aspoň jednu platbu')
+
+    fields = [invoice_id or '', str(len(payments))]
+    for payment in payments:
+        fields.extend(_payment_fields(payment))
+    return '\t'.join(fields)
+
+
+# ==============================================================================
+# KÓDOVANIE
+# ==============================================================================
+
+def _to_base32hex(data: bytes) -> str:
+    """base32hex (RFC 4648) bez '=' paddingu, bity doplnené nulami"""
+    num_chars = (len(data) * 8 + 4) // 5
+    padding = -len(data) % 5
+    return base64.b32hexencode(data + b'\x00' * padding)[:num_chars].decode('ascii')
+
+
+def encode_data(data: str) -> str:
+    """Zakóduje hotový dátový reťazec do PAY by square"""
+    data_bytes = data.encode('utf-8')
+    payload = _CRC_STRUCT.pack(binascii.crc32(data_bytes) & 0xFFFFFFFF) + data_bytes
+    if len(payload) > 0xFFFF:
+        raise BySquareError('Dáta sú pre PAY by square príliš dlhé')
+
+    compressed = lzma.compress(payload, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    return _to_base32hex(BYSQUARE_HEADER + _LENGTH_STRUCT.pack(len(payload)) + compressed)
+
+
+def encode_payments(payments: Iterable[Dict[str, Any]], invoice_id: str = '') -> str:
+    """Zakóduje jednu alebo viac platieb do jedného PAY by square reťazca"""
+    return encode_data(build_payment_data(payments, invoice_id))
+
+
+def encode_payment(
+    amount: float,
+    iban: str,
+    swift: str = '',
+    variable_symbol: str = '',
+    constant_symbol: str = '',
+    specific_symbol: str = '',
+    beneficiary_name: str = '',
+    beneficiary_address_1: str = '',
+    beneficiary_address_2: str = '',
+    note: str = '',
+    due_date: str = '',
+    currency: str = 'EUR'
+) -> str:
+    """Zakóduje jednu platbu (len reťazec, bez QR matice)"""
+    return encode_payments([{
+        'amount': amount,
+        'iban': iban,
+        'swift': swift,
+        'variable_symbol': variable_symbol,
+        'constant_symbol': constant_symbol,
+        'specific_symbol': specific_symbol,
+        'beneficiary_name': beneficiary_name,
+        'beneficiary_address_1': beneficiary_address_1,
+        'beneficiary_address_2': beneficiary_address_2,
+        'note': note,
+        'due_date': due_date,
+        'currency': currency,
+    }])
+
+
+# ==============================================================================
+# QR MATICA
+# ==============================================================================
+
+def make_qr(encoded: str, border: int = 4, box_size: int = 10) -> 'qrcode.QRCode':
+    """Vytvorí QRCode objekt pre zakódovaný reťazec"""
+    import qrcode  # qrcode/PIL sa načítajú až pri prvom QR kóde
+    
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(encoded)
+    qr.make(fit=True)
+    return qr
+
+
+def encode_payment_matrix(border: int = 4, **payment) -> Tuple[str, List[List[bool]]]:
+    """Zakóduje jednu platbu a vráti (reťazec, QR matica)"""
+    encoded = encode_payment(**payment)
+    return encoded, make_qr(encoded, border=border).get_matrix()
+
+
+def encode_payments_matrix(
+    payments: Iterable[Dict[str, Any]],
+    invoice_id: str = '',
+    border: int = 4
+) -> Tuple[str, List[List[bool]]]:
+    """Zakóduje viac platieb a vráti (reťazec, QR matica)"""
+    encoded = encode_payments(payments, invoice_id)
+    return encoded, make_qr(encoded, border=border).get_matrix()
+
+
+# ==============================================================================
+# DEKÓDOVANIE (overenie / testy)
+# ==============================================================================
+
+def decode(encoded: str) -> str:
+    """
+    Dekóduje PAY by square reťazec späť na tab-separated dáta.
+    Overuje header, dĺžku aj CRC32.
+    """
+    encoded = encoded.strip().upper()
+    padded = encoded + '=' * (-len(encoded) % 8)
+    try:
+        raw = base64.b32hexdecode(padded)
+    except (binascii.Error, ValueError) as e:
+        raise BySquareError(f'Neplatný base32hex reťazec: {e}')
+
+    if len(raw) < 4 or raw[:2] != BYSQUARE_HEADER:
+        raise BySquareError('Neplatný PAY by square header')
+
+    (length,) = _LENGTH_STRUCT.unpack_from(raw, 2)
+    decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    try:
+        payload = decompressor.decompress(raw[4:], max_length=length)
+    except lzma.LZMAError as e:
+        raise BySquareError(f'LZMA dekompresia zlyhala: {e}')
+
+    if len(payload) != length:
+        raise BySquareError('Nesprávna dĺžka dát')
+
+    (crc,) = _CRC_STRUCT.unpack_from(payload)
+    data_bytes = payload[_CRC_STRUCT.size:]
+    if binascii.crc32(data_bytes) & 0xFFFFFFFF != crc:
+        raise BySquareError('Nesprávny CRC32 kontrolný súčet')
+
+    return data_bytes.decode('utf-8')
+
+
+def decode_fields(encoded: str) -> List[str]:
+    """Dekóduje reťazec a vráti zoznam polí"""
+    return decode(encoded).split('\t')
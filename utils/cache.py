@@ -1,77 +1,214 @@
 """
 Cache wrapper pre API volania
 Znižuje počet requestov na externé API
+
+In-memory LRU cache s TTL (monotónne hodiny), limitom veľkosti pre každý
+namespace, negatívnym cache (uložené None), single-flight pre súbežné
+missy a počítadlami hit/miss/eviction. Bezpečný pre gunicorn vlákna.
 """
 from functools import wraps
-from datetime import datetime, timedelta
-import json
+from collections import OrderedDict
+import threading
+import time
+
+
+# Sentinel pre chýbajúcu hodnotu (None je platná uložená hodnota)
+MISSING = object()
+
+DEFAULT_NAMESPACE = 'default'
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TIMEOUT = 300
+
 
+class _InFlight:
+    """Prebiehajúci výpočet hodnoty pre jeden kľúč"""
+    __slots__ = ('event', 'value', 'error')
 
-class SimpleCache:
-    """Jednoduchý in-memory cache"""
-    
     def __init__(self):
-        self._cache = {}
-        self._timestamps = {}
-    
-    def get(self, key):
-        """Získa hodnotu z cache"""
-        if key in self._cache:
-            # Skontroluj expiraciu
-            if key in self._timestamps:
-                if datetime.now() < self._timestamps[key]:
-                    return self._cache[key]
-                else:
-                    # Expirované - vymaž
-                    del self._cache[key]
-                    del self._timestamps[key]
-        return None
-    
-    def set(self, key, value, timeout=300):
+        self.event = threading.Event()
+        self.value = MISSING
+        self.error = None
+
+
+class LRUCache:
+    """Ohraničený, vláknovo bezpečný LRU cache s TTL"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, default_timeout=DEFAULT_TIMEOUT):
+        self.maxsize = maxsize
+        self.default_timeout = default_timeout
+        self._data = OrderedDict()  # key -> (value, expires_at alebo None)
+        self._inflight = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def get(self, key, default=MISSING):
+        """Získa hodnotu z cache, pri chýbajúcom zázname vráti default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or time.monotonic() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # Expirované - vymaž
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, timeout=None):
         """Uloží hodnotu do cache
-        
+
         Args:
-            key: Kľúč
-            value: Hodnota
-            timeout: Čas expirácie v sekundách (default 5 minút)
+            key: Kľúč (hashovateľný)
+            value: Hodnota (aj None)
+            timeout: Čas expirácie v sekundách (None = default, 0 = bez expirácie)
         """
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now() + timedelta(seconds=timeout)
-    
+        if timeout is None:
+            timeout = self.default_timeout
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, factory, timeout=None):
+        """Vráti hodnotu z cache alebo ju vypočíta cez factory().
+
+        Súbežné missy toho istého kľúča čakajú na jeden výpočet.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = factory()
+            self.set(key, call.value, timeout)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
     def delete(self, key):
         """Vymaže hodnotu z cache"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._timestamps:
-            del self._timestamps[key]
-    
+        with self._lock:
+            self._data.pop(key, None)
+
     def clear(self):
         """Vymaže celý cache"""
-        self._cache.clear()
-        self._timestamps.clear()
-    
+        with self._lock:
+            self._data.clear()
+
     def cleanup(self):
         """Vymaže expirované záznamy"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, timestamp in self._timestamps.items()
-            if now >= timestamp
-        ]
-        for key in expired_keys:
-            self.delete(key)
+        now = time.monotonic()
+        with self._lock:
+            expired_keys = [
+                key for key, (_, expires_at) in self._data.items()
+                if expires_at is not None and now >= expires_at
+            ]
+            for key in expired_keys:
+                del self._data[key]
+            self.expirations += len(expired_keys)
 
+    def __len__(self):
+        return len(self._data)
 
-# Globálny cache instance
-_cache = SimpleCache()
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
 
+    def stats(self):
+        """Vráti počítadlá cache"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+            }
 
-def cached(timeout=300, key_prefix=''):
+
+# Namespace -> cache instance
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace=DEFAULT_NAMESPACE, maxsize=None, timeout=None):
+    """Vráti cache instanciu pre daný namespace (vytvorí ju ak neexistuje)"""
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(namespace)
+            if cache is None:
+                cache = LRUCache(
+                    maxsize=maxsize or DEFAULT_MAXSIZE,
+                    default_timeout=DEFAULT_TIMEOUT if timeout is None else timeout
+                )
+                _caches[namespace] = cache
+    return cache
+
+
+def configure_namespace(namespace, maxsize=None, timeout=None):
+    """Nastaví limit veľkosti a default TTL pre namespace"""
+    cache = get_cache(namespace, maxsize, timeout)
+    with cache._lock:
+        if maxsize is not None:
+            cache.maxsize = maxsize
+            while len(cache._data) > maxsize:
+                cache._data.popitem(last=False)
+                cache.evictions += 1
+        if timeout is not None:
+            cache.default_timeout = timeout
+    return cache
+
+
+def _make_key(args, kwargs):
+    """Vytvorí hashovateľný kľúč z argumentov funkcie"""
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        key = repr(key)
+    return key
+
+
+def cached(timeout=DEFAULT_TIMEOUT, key_prefix='', maxsize=None, cache_none=True):
     """Dekorátor pre cachovanie funkcií
-    
+
     Args:
         timeout: Čas expirácie v sekundách
-        key_prefix: Prefix pre cache kľúč
-    
+        key_prefix: Namespace cache (default: modul.názov funkcie)
+        maxsize: Maximálny počet záznamov v namespace
+        cache_none: Ukladať aj výsledok None (negatívny cache)
+
     Example:
         @cached(timeout=600, key_prefix='company')
         def lookup_company(ico):
@@ -79,38 +216,41 @@ def cached(timeout=300, key_prefix=''):
             return result
     """
     def decorator(f):
+        namespace = key_prefix or f"{f.__module__}.{f.__qualname__}"
+        cache = get_cache(namespace, maxsize, timeout)
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Vytvor cache kľúč
-            cache_key = f"{key_prefix}:{f.__name__}:{str(args)}:{str(kwargs)}"
-            
-            # Skús získať z cache
-            result = _cache.get(cache_key)
-            if result is not None:
+            cache_key = (f.__name__, _make_key(args, kwargs))
+
+            if cache_none:
+                return cache.get_or_set(cache_key, lambda: f(*args, **kwargs), timeout)
+
+            result = cache.get(cache_key)
+            if result is not MISSING and result is not None:
                 return result
-            
-            # Zavolaj funkciu
             result = f(*args, **kwargs)
-            
-            # Ulož do cache
             if result is not None:
-                _cache.set(cache_key, result, timeout)
-            
+                cache.set(cache_key, result, timeout)
             return result
+
+        decorated_function.cache = cache
         return decorated_function
     return decorator
 
 
-def get_cache():
-    """Vráti cache instanciu"""
-    return _cache
-
-
 def clear_cache():
-    """Vymaže celý cache"""
-    _cache.clear()
+    """Vymaže celý cache (všetky namespace)"""
+    for cache in list(_caches.values()):
+        cache.clear()
 
 
 def cleanup_cache():
     """Vymaže expirované záznamy"""
-    _cache.cleanup()
+    for cache in list(_caches.values()):
+        cache.cleanup()
+
+
+def cache_stats():
+    """Vráti štatistiky všetkých namespace"""
+    return {namespace: cache.stats() for namespace, cache in list(_caches.items())}
@@ -0,0 +1,156 @@
+"""
+Hromadné overenie klientov voči RPO (napr. pred podaním DPH)
+Porovná názov, adresu, DIČ a IČ DPH klientov s registrom a vráti rozdiely.
+
+- každé IČO sa overí len raz (aj keď ho má viac klientov)
+- lookupy bežia paralelne v ohraničenom thread poole
+- upstream volania sú obmedzené rate limiterom
+- výsledky idú cez zdieľaný company cache
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from utils.company_cache import get_company_cache, normalize_company, UpstreamError
+from utils.company_lookup import get_lookup_service
+
+
+# Polia klienta porovnávané s RPO
+VERIFIED_FIELDS = ('name', 'street', 'city', 'zip_code', 'dic', 'ic_dph')
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0  # upstream requestov za sekundu
+# Lookup jedného IČO = priamy lookup + search súbežne
+CALLS_PER_LOOKUP = 2
+
+
+class RateLimiter:
+    """Rovnomerne rozloží volania na max. `rate` za sekundu (zdieľaný medzi vláknami)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, calls: int = 1):
+        """Počká na slot pre `calls` upstream volaní"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval * calls
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _clean(value) -> str:
+    return re.sub(r'\s+', ' ', str(value or '')).strip()
+
+
+def _same(field: str, old: str, new: str) -> bool:
+    if field == 'zip_code':
+        return old.replace(' ', '') == new.replace(' ', '')
+    return old.casefold() == new.casefold()
+
+
+def diff_client(client, record: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """Vráti zmenené polia {pole: {'old': ..., 'new': ...}} (prázdne v RPO sa ignorujú)"""
+    changes = {}
+    for field in VERIFIED_FIELDS:
+        old = _clean(getattr(client, field, ''))
+        new = _clean(record.get(field))
+        if new and not _same(field, old, new):
+            changes[field] = {'old': old, 'new': new}
+    return changes
+
+
+def verify_clients(clients: Iterable[Any], refresh: bool = True, max_workers: int = DEFAULT_WORKERS,
+                   rate: float = DEFAULT_RATE, service=None, cache=None) -> Dict[str, Any]:
+    """
+    Overí klientov voči RPO a vráti report.
+
+    Args:
+        clients: Klienti (objekty s atribútmi id, name, ico, street, ...)
+        refresh: Ignorovať čerstvé záznamy v cache a načítať údaje z RPO
+        max_workers: Počet paralelných lookupov
+        rate: Max. počet upstream requestov za sekundu
+    """
+    service = service or get_lookup_service()
+    cache = cache or get_company_cache()
+    limiter = RateLimiter(rate)
+
+    by_ico = {}
+    report = {
+        'checked': 0,
+        'unique_icos': 0,
+        'unchanged': 0,
+        'changed': [],
+        'not_found': [],
+        'errors': [],
+        'skipped': [],
+    }
+
+    for client in clients:
+        report['checked'] += 1
+        ico = service._clean_ico(client.ico or '')
+        if not ico:
+            report['skipped'].append({'client_id': client.id, 'name': client.name, 'ico': client.ico or ''})
+            continue
+        by_ico.setdefault(ico, []).append(client)
+    report['unique_icos'] = len(by_ico)
+
+    def fetch(ico: str) -> Optional[Dict[str, Any]]:
+        limiter.acquire(CALLS_PER_LOOKUP)
+        record = service.fetch_remote(ico)
+        # Search bez presnej zhody vráti inú firmu - pre overenie je to nenájdené IČO
+        if record and (normalize_company(record) or {}).get('ico') != ico:
+            return None
+        return record
+
+    def verify(ico: str):
+        try:
+            if refresh:
+                record = fetch(ico)
+                cache.set(ico, record)
+                return ico, normalize_company(record), None
+            return ico, cache.lookup(ico, fetch), None
+        except UpstreamError as e:
+            return ico, None, f'RPO nedostupné ({e})'
+        except Exception as e:
+            return ico, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='verify-clients') as pool:
+        results = list(pool.map(verify, sorted(by_ico)))
+
+    for ico, record, error in results:
+        for client in by_ico[ico]:
+            entry = {'client_id': client.id, 'name': client.name, 'ico': ico}
+            if error:
+                report['errors'].append(dict(entry, error=error))
+            elif record is None:
+                report['not_found'].append(entry)
+            else:
+                changes = diff_client(client, record)
+                if changes:
+                    report['changed'].append(dict(entry, changes=changes))
+                else:
+                    report['unchanged'] += 1
+
+    return report
+
+
+def apply_changes(clients: Iterable[Any], report: Dict[str, Any]) -> int:
+    """Prepíše údaje klientov podľa reportu, vráti počet upravených klientov"""
+    changes_by_id = {entry['client_id']: entry['changes'] for entry in report['changed']}
+    updated = 0
+    for client in clients:
+        changes = changes_by_id.get(client.id)
+        if not changes:
+            continue
+        for field, change in changes.items():
+            setattr(client, field, change['new'])
+        updated += 1
+    return updated
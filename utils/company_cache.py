@@ -0,0 +1,316 @@
+"""
+Perzistentný cache pre údaje firiem (IČO lookup)
+Zdieľaný medzi gunicorn workermi cez SQLite súbor alebo databázovú tabuľku.
+
+Podporuje:
+- TTL pre čerstvé záznamy
+- stale-while-revalidate (starý záznam sa vráti hneď, obnova beží na pozadí)
+- negatívny cache pre neexistujúce IČO
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.cache import LRUCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+
+COMPANY_FIELDS = (
+    'name', 'street', 'city', 'zip_code', 'ico', 'dic', 'ic_dph',
+    'legal_form', 'established_on', 'terminated_on'
+)
+
+# Stavy záznamu v cache
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+
+class UpstreamError(Exception):
+    """Externý zdroj je nedostupný - výsledok sa nesmie uložiť ako negatívny"""
+
+
+def normalize_company(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """Zjednotí záznam firmy na rovnaké kľúče a typy"""
+    if not data:
+        return None
+    record = {key: str(data.get(key) or '').strip() for key in COMPANY_FIELDS}
+    if record['ico']:
+        record['ico'] = record['ico'].zfill(8)
+    record['zip_code'] = record['zip_code'].replace(' ', '')
+    return record
+
+
+# ==============================================================================
+# BACKENDY
+# ==============================================================================
+
+class MemoryBackend:
+    """In-memory backend (jeden proces, testy), ohraničený LRU"""
+
+    def __init__(self, maxsize=10000):
+        self._data = LRUCache(maxsize=maxsize, default_timeout=0)
+
+    def get(self, ico):
+        entry = self._data.get(ico)
+        return None if entry is MISSING else entry
+
+    def set(self, ico, data, fetched_at):
+        self._data.set(ico, (data, fetched_at))
+
+    def delete(self, ico):
+        self._data.delete(ico)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteBackend:
+    """Lokálny SQLite súbor zdieľaný všetkými workermi na jednom stroji"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS company_cache ('
+            'ico TEXT PRIMARY KEY, data TEXT, fetched_at REAL NOT NULL)'
+        )
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, ico):
+        row = self._connect().execute(
+            'SELECT data, fetched_at FROM company_cache WHERE ico = ?', (ico,)
+        ).fetchone()
+        if row is None:
+            return None
+        return (json.loads(row[0]) if row[0] else None), row[1]
+
+    def set(self, ico, data, fetched_at):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO company_cache (ico, data, fetched_at) VALUES (?, ?, ?)',
+            (ico, json.dumps(data, ensure_ascii=False) if data else None, fetched_at)
+        )
+        conn.commit()
+
+    def delete(self, ico):
+        conn = self._connect()
+        conn.execute('DELETE FROM company_cache WHERE ico = ?', (ico,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM company_cache')
+        conn.commit()
+
+
+class DatabaseBackend:
+    """Tabuľka company_cache v hlavnej databáze (SQLite/PostgreSQL)"""
+
+    def __init__(self, engine):
+        from models import CompanyCacheEntry
+        self.engine = engine
+        self.table = CompanyCacheEntry.__table__
+
+    def get(self, ico):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                self.table.select().where(self.table.c.ico == ico)
+            ).first()
+        if row is None:
+            return None
+        return (json.loads(row.data) if row.data else None), row.fetched_at
+
+    def set(self, ico, data, fetched_at):
+        from sqlalchemy.exc import IntegrityError
+        values = {
+            'data': json.dumps(data, ensure_ascii=False) if data else None,
+            'fetched_at': fetched_at,
+        }
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                self.table.update().where(self.table.c.ico == ico).values(**values)
+            )
+            if result.rowcount:
+                return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.table.insert().values(ico=ico, **values))
+        except IntegrityError:
+            # Iný worker vložil záznam súčasne
+            pass
+
+    def delete(self, ico):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.ico == ico))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete())
+
+
+# ==============================================================================
+# CACHE
+# ==============================================================================
+
+class CompanyCache:
+    """Cache firemných údajov s TTL, stale-while-revalidate a negatívnym cache"""
+
+    def __init__(self, backend, ttl=7 * 86400, stale_ttl=30 * 86400, negative_ttl=86400):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, ico) -> Tuple[str, Optional[Dict[str, str]]]:
+        """Vráti (stav, dáta). Negatívny záznam má stav FRESH a dáta None."""
+        try:
+            entry = self.backend.get(ico)
+        except Exception as e:
+            logger.warning('Company cache read error: %s', e)
+            return MISS, None
+        if entry is None:
+            return MISS, None
+
+        data, fetched_at = entry
+        age = time.time() - fetched_at
+        if data is None:
+            return (FRESH, None) if age < self.negative_ttl else (MISS, None)
+        if age < self.ttl:
+            return FRESH, data
+        if age < self.ttl + self.stale_ttl:
+            return STALE, data
+        return MISS, None
+
+    def set(self, ico, data):
+        """Uloží normalizovaný záznam (None = negatívny záznam)"""
+        try:
+            self.backend.set(ico, normalize_company(data), time.time())
+        except Exception as e:
+            logger.warning('Company cache write error: %s', e)
+
+    def delete(self, ico):
+        self.backend.delete(ico)
+
+    def clear(self):
+        self.backend.clear()
+
+    def lookup(self, ico, fetch: Callable[[str], Optional[Dict[str, Any]]]):
+        """
+        Vráti údaje firmy z cache, pri chýbajúcom zázname zavolá fetch(ico).
+        Pri chybe fetch sa nič neukladá - vráti sa aj expirovaný záznam, ak existuje,
+        inak sa vyhodí UpstreamError (neočakávané chyby sa naň prevedú).
+        """
+        state, data = self.get(ico)
+        if state == FRESH:
+            return data
+        if state == STALE:
+            self._refresh_async(ico, fetch)
+            return data
+
+        try:
+            result = fetch(ico)
+        except Exception as e:
+            if not isinstance(e, UpstreamError):
+                logger.warning('Company lookup error for %s: %s', ico, e)
+            expired = self._expired(ico)
+            if expired is not None:
+                return expired
+            if isinstance(e, UpstreamError):
+                raise
+            raise UpstreamError(str(e)) from e
+        self.set(ico, result)
+        return normalize_company(result)
+
+    def _expired(self, ico) -> Optional[Dict[str, str]]:
+        """Záznam po stale_ttl (len ako náhrada pri výpadku upstreamu)"""
+        try:
+            entry = self.backend.get(ico)
+        except Exception:
+            return None
+        return entry[0] if entry else None
+
+    def _refresh_async(self, ico, fetch):
+        """Obnoví záznam na pozadí (max. jedna obnova na IČO naraz)"""
+        with self._lock:
+            if ico in self._refreshing:
+                return
+            self._refreshing.add(ico)
+
+        def refresh():
+            try:
+                result = fetch(ico)
+                if result:
+                    self.set(ico, result)
+            except UpstreamError:
+                pass
+            except Exception as e:
+                logger.warning('Company cache refresh error for %s: %s', ico, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(ico)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def warm(self, records):
+        """Naplní cache zo zoznamu záznamov (napr. lokálna databáza firiem)"""
+        count = 0
+        for record in records:
+            record = normalize_company(record)
+            if record and record['ico']:
+                self.backend.set(record['ico'], record, time.time())
+                count += 1
+        return count
+
+
+_company_cache = None
+
+
+def configure_company_cache(app):
+    """Vytvorí cache podľa konfigurácie aplikácie"""
+    global _company_cache
+    backend_name = app.config.get('COMPANY_CACHE_BACKEND', 'memory')
+
+    if backend_name == 'sqlite':
+        backend = SQLiteBackend(app.config['COMPANY_CACHE_PATH'])
+    elif backend_name == 'database':
+        from models import db
+        with app.app_context():
+            backend = DatabaseBackend(db.engine)
+    else:
+        backend = MemoryBackend()
+
+    _company_cache = CompanyCache(
+        backend,
+        ttl=app.config.get('COMPANY_CACHE_TTL', 7 * 86400),
+        stale_ttl=app.config.get('COMPANY_CACHE_STALE_TTL', 30 * 86400),
+        negative_ttl=app.config.get('COMPANY_CACHE_NEGATIVE_TTL', 86400),
+    )
+    return _company_cache
+
+
+def get_company_cache():
+    """Vráti globálnu inštanciu cache (predvolene in-memory)"""
+    global _company_cache
+    if _company_cache is None:
+        _company_cache = CompanyCache(MemoryBackend())
+    return _company_cache
@@ -0,0 +1,201 @@
+"""
+Vyhľadávací index nad lokálnou databázou firiem
+Zostaví sa raz pri načítaní a slúži pre autocomplete.
+
+- názvy sú normalizované (casefold, bez diakritiky)
+- prefixový index slov (zoradené pole + bisect)
+- trigramový index pre vyhľadávanie vnútri slov
+- prefixový index IČO (zoradené pole, ekvivalent trie s menšou pamäťou)
+
+Veľkosť pamäte aj čas dotazu škálujú na celý RPO dataset
+(stovky tisíc firiem), nie len na pribalenú databázu.
+"""
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Maximálny počet kandidátov z jedného prefixového rozsahu (krátke dotazy typu "a")
+MAX_CANDIDATES = 2000
+
+# Poradie výsledkov (nižšie = lepšie)
+RANK_EXACT = 0
+RANK_NAME_PREFIX = 1
+RANK_WORD_PREFIX = 2
+RANK_SUBSTRING = 3
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def fold(text: str) -> str:
+    """Normalizuje text - malé písmená, bez diakritiky a interpunkcie"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CompanyIndex:
+    """In-memory index firiem pre rýchle hľadanie podľa názvu a IČO"""
+
+    def __init__(self, records: Iterable[Dict[str, Any]],
+                 loader: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None):
+        # loader(ico) načíta plný záznam - index potom drží len IČO a názov
+        self.loader = loader
+        self.records = []
+        self._names = []
+        self._words = []
+        word_entries = []
+        trigram_lists = {}
+
+        for record in records:
+            record_id = len(self.records)
+            name = fold(record.get('name', ''))
+            words = tuple(name.split())
+            self.records.append(record)
+            self._names.append(name)
+            self._words.append(words)
+
+            for word in set(words):
+                word_entries.append((word, record_id))
+            for trigram in _trigrams(name):
+                trigram_lists.setdefault(trigram, []).append(record_id)
+
+        word_entries.sort()
+        self._word_keys = [word for word, _ in word_entries]
+        self._word_ids = array('I', (record_id for _, record_id in word_entries))
+        self._trigrams = {key: array('I', ids) for key, ids in trigram_lists.items()}
+
+        ico_entries = sorted(
+            (str(record.get('ico', '')).zfill(8), record_id)
+            for record_id, record in enumerate(self.records)
+            if record.get('ico')
+        )
+        self._icos = [ico for ico, _ in ico_entries]
+        self._ico_ids = array('I', (record_id for _, record_id in ico_entries))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _record(self, record_id: int) -> Dict[str, Any]:
+        record = self.records[record_id]
+        if self.loader is None:
+            return record
+        return self.loader(record['ico']) or record
+
+    # --------------------------------------------------------------------------
+    # IČO
+    # --------------------------------------------------------------------------
+
+    def get(self, ico: str) -> Optional[Dict[str, Any]]:
+        """Presné vyhľadanie podľa IČO"""
+        ico = str(ico).zfill(8)
+        pos = bisect_left(self._icos, ico)
+        if pos < len(self._icos) and self._icos[pos] == ico:
+            return self._record(self._ico_ids[pos])
+        return None
+
+    def search_ico(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Vráti firmy, ktorých IČO začína daným prefixom"""
+        pos = bisect_left(self._icos, prefix)
+        results = []
+        while pos < len(self._icos) and len(results) < limit and self._icos[pos].startswith(prefix):
+            results.append(self._record(self._ico_ids[pos]))
+            pos += 1
+        return results
+
+    # --------------------------------------------------------------------------
+    # NÁZOV
+    # --------------------------------------------------------------------------
+
+    def _prefix_range(self, token: str):
+        lo = bisect_left(self._word_keys, token)
+        hi = bisect_left(self._word_keys, token + '\uffff', lo)
+        return lo, hi
+
+    def _prefix_candidates(self, tokens: List[str]) -> List[int]:
+        """Kandidáti, kde každý token je prefixom niektorého slova"""
+        ranges = [self._prefix_range(token) for token in tokens]
+        lo, hi = min(ranges, key=lambda r: r[1] - r[0])
+        ids = dict.fromkeys(self._word_ids[lo:min(hi, lo + MAX_CANDIDATES)])
+
+        results = []
+        for record_id in ids:
+            words = self._words[record_id]
+            if all(any(word.startswith(token) for word in words) for token in tokens):
+                results.append(record_id)
+        return results
+
+    def _substring_candidates(self, tokens: List[str]) -> List[int]:
+        """Kandidáti, ktorých názov obsahuje dotaz (cez trigramy)"""
+        trigrams = _trigrams(max(tokens, key=len))
+        if not trigrams:
+            return []
+        postings = sorted((self._trigrams.get(t, ()) for t in trigrams), key=len)
+        if not postings[0]:
+            return []
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [
+            record_id for record_id in candidates
+            if all(token in self._names[record_id] for token in tokens)
+        ]
+
+    def _rank(self, record_id: int, query: str, first_token: str) -> tuple:
+        name = self._names[record_id]
+        if name == query:
+            rank = RANK_EXACT
+        elif name.startswith(query):
+            rank = RANK_NAME_PREFIX
+        elif any(word.startswith(first_token) for word in self._words[record_id]):
+            rank = RANK_WORD_PREFIX
+        else:
+            rank = RANK_SUBSTRING
+        return rank, len(name), name
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Vyhľadá firmy podľa názvu alebo prefixu IČO, zoradené podľa relevancie"""
+        if not query:
+            return []
+
+        digits = query.replace(' ', '')
+        if digits.isdigit():
+            return self.search_ico(digits, limit)
+
+        folded = fold(query)
+        tokens = folded.split()
+        if not tokens:
+            return []
+
+        candidates = self._prefix_candidates(tokens)
+        if len(candidates) < limit and max(len(t) for t in tokens) >= 3:
+            seen = set(candidates)
+            candidates += [
+                record_id for record_id in self._substring_candidates(tokens)
+                if record_id not in seen
+            ]
+
+        candidates.sort(key=lambda record_id: self._rank(record_id, folded, tokens[0]))
+        return [self._record(record_id) for record_id in candidates[:limit]]
+
+
+_index = None
+
+
+def get_company_index() -> CompanyIndex:
+    """Vráti index nad lokálnou databázou firiem (zostaví sa pri prvom použití)"""
+    global _index
+    if _index is None:
+        from utils.sk_companies_db import SLOVAK_COMPANIES
+        _index = CompanyIndex(SLOVAK_COMPANIES.iter_names(), loader=SLOVAK_COMPANIES.get)
+    return _index
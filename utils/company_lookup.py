@@ -2,11 +2,19 @@
 Vyhľadávanie firiem cez Ekosystém.Digital API
 Obsahuje dáta priamo z RPO (Register právnických osôb)
 """
-import requests
 from typing import Optional, Dict, Any, List
+import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from utils.sk_companies_db import SLOVAK_COMPANIES
-from utils.cache import cached
+from utils.cache import LRUCache, MISSING
+from utils.company_cache import get_company_cache, normalize_company, UpstreamError
+from utils.company_index import get_company_index, fold
+from utils.instrumentation import timed
+
+logger = logging.getLogger(__name__)
 
 
 class CompanyLookup:
@@ -18,13 +26,25 @@ class CompanyLookup:
     # Alternatívny endpoint
     EKOSYSTEM_SEARCH_URL = "https://autoform.ekosystem.slovensko.digital/api/corporate_bodies/search"
     
+    # Deadline na celý lookup (priamy lookup a search bežia súbežne)
+    TIMEOUT = 5.0
+    
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'FakturaSK/2.0 (Slovak Invoice System)',
-            'Accept': 'application/json',
-            'Accept-Language': 'sk-SK,sk;q=0.9'
-        })
+        self._async = None
+    
+    @property
+    def async_client(self) -> 'AsyncCompanyLookup':
+        """Asynchrónny klient (httpx) - dá sa použiť aj priamo z async kódu"""
+        if self._async is None:
+            # httpx sa načíta až pri prvom lookupe (rýchlejší cold start)
+            from utils.company_lookup_async import AsyncCompanyLookup
+            self._async = AsyncCompanyLookup(
+                self.EKOSYSTEM_API_URL,
+                self.EKOSYSTEM_SEARCH_URL,
+                self._parse_ekosystem_response,
+                timeout=self.TIMEOUT
+            )
+        return self._async
     
     def lookup(self, ico: str) -> Optional[Dict[str, Any]]:
         """
@@ -56,30 +76,25 @@ class CompanyLookup:
         
         try:
             # Skúsime Ekosystém.Digital search
-            url = f"{self.EKOSYSTEM_SEARCH_URL}"
-            params = {'q': query, 'limit': limit}
-            
-            response = self.session.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                items = data if isinstance(data, list) else data.get('results', data.get('items', []))
-                
-                for item in items[:limit]:
-                    parsed = self._parse_ekosystem_response(item)
-                    if parsed and parsed.get('name'):
-                        results.append(parsed)
-                
+            results = self.search_remote(query, limit)
+            if results is not None:
                 return results
-                
         except Exception as e:
-            print(f"Search error: {e}")
+            logger.warning('Search error: %s', e)
         
         # Fallback na lokálnu databázu
         return self._search_local(query, limit)
     
+    @timed('rpo')
+    def search_remote(self, query: str, limit: int = 10, timeout: float = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Vyhľadá firmy cez Ekosystém.Digital search.
+        Pri výpadku API vyhodí UpstreamError, None znamená neúspešnú odpoveď.
+        """
+        from utils.company_lookup_async import run_sync
+        timeout = timeout or self.TIMEOUT
+        return run_sync(self.async_client.search(query, limit, timeout), timeout + 1)
+    
     def _clean_ico(self, ico: str) -> str:
         """Očistí a validuje IČO"""
         ico = re.sub(r'\D', '', ico)
@@ -93,44 +108,41 @@ class CompanyLookup:
         Tento API poskytuje dáta priamo z RPO.
         """
         try:
-            # Priamy lookup podľa IČO
-            url = f"{self.EKOSYSTEM_API_URL}/{ico}"
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return self._parse_ekosystem_response(data)
-            
-            # Skúsime search endpoint
-            url = self.EKOSYSTEM_SEARCH_URL
-            params = {'q': ico}
-            response = self.session.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # API môže vrátiť list alebo objekt
-                items = data if isinstance(data, list) else data.get('results', data.get('items', []))
-                
-                if items:
-                    # Nájdeme presný match podľa IČO
-                    for item in items:
-                        item_ico = str(item.get('cin', item.get('ico', ''))).zfill(8)
-                        if item_ico == ico:
-                            return self._parse_ekosystem_response(item)
-                    
-                    # Ak nie je presný match, vrátime prvý výsledok
-                    return self._parse_ekosystem_response(items[0])
-                    
-        except requests.exceptions.Timeout:
-            print("Ekosystém API timeout")
-        except requests.exceptions.ConnectionError:
-            print("Ekosystém API connection error")
+            return self.fetch_remote(ico)
         except Exception as e:
-            print(f"Ekosystém API error: {e}")
+            logger.warning('Ekosystém API error: %s', e)
         
         return None
     
+    @timed('rpo')
+    def fetch_remote(self, ico: str) -> Optional[Dict[str, Any]]:
+        """
+        Získa údaje z Ekosystém.Digital API.
+        Priamy lookup a search bežia súbežne, worker čaká max. TIMEOUT sekúnd.
+        Pri výpadku API vyhodí UpstreamError, None znamená že firma neexistuje.
+        """
+        from utils.company_lookup_async import run_sync
+        return run_sync(self.async_client.fetch(ico), self.TIMEOUT + 1)
+    
+    def fetch(self, ico: str) -> Optional[Dict[str, Any]]:
+        """
+        Načíta firmu z API s fallbackom na lokálnu databázu (pre cache).
+        UpstreamError prepúšťa len ak nie sú dostupné ani lokálne dáta.
+        Záznam s iným IČO (search bez presnej zhody) sa nevráti - cache by
+        ho inak uložil pod požadované IČO.
+        """
+        try:
+            result = self.fetch_remote(ico)
+        except UpstreamError:
+            result = self._get_local_data(ico)
+            if result:
+                return result
+            raise
+        if result and (normalize_company(result) or {}).get('ico') != ico:
+            logger.info('Ekosystém API vrátil iné IČO pre %s: %s', ico, result.get('ico'))
+            result = None
+        return result or self._get_local_data(ico)
+    
     def _parse_ekosystem_response(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Parsuje odpoveď z Ekosystém.Digital API"""
         result = {
@@ -257,26 +269,148 @@ class CompanyLookup:
         return SLOVAK_COMPANIES.get(ico)
     
     def _search_local(self, query: str, limit: int) -> List[Dict[str, Any]]:
-        """Vyhľadá v lokálnej databáze"""
-        query_lower = query.lower()
-        results = []
-        
-        for ico, data in SLOVAK_COMPANIES.items():
-            if query_lower in data.get('name', '').lower() or query_lower in ico:
-                results.append(data)
-                if len(results) >= limit:
-                    break
-        
-        return results
+        """Vyhľadá v lokálnej databáze (cez vyhľadávací index)"""
+        return get_company_index().search(query, limit)
+
+
+_service = None
+
+
+def get_lookup_service() -> CompanyLookup:
+    """Vráti zdieľanú inštanciu služby (jeden connection pool na proces)"""
+    global _service
+    if _service is None:
+        _service = CompanyLookup()
+    return _service
 
 
 def lookup_company(ico: str) -> Optional[Dict[str, Any]]:
-    """Helper funkcia pre vyhľadanie firmy podľa IČO"""
-    service = CompanyLookup()
-    return service.lookup(ico)
+    """Helper funkcia pre vyhľadanie firmy podľa IČO (cez zdieľaný cache)"""
+    service = get_lookup_service()
+    ico = service._clean_ico(ico)
+    if not ico:
+        return None
+    
+    try:
+        return get_company_cache().lookup(ico, service.fetch)
+    except Exception as e:
+        # Výpadok alebo nezmyselná odpoveď upstreamu = firma sa nenašla, nie 500
+        logger.warning('Ekosystém API error: %s', e)
+        return None
 
 
 def search_companies(query: str, limit: int = 10) -> List[Dict[str, Any]]:
     """Helper funkcia pre vyhľadanie firiem"""
-    service = CompanyLookup()
-    return service.search(query, limit)
+    return get_lookup_service().search(query, limit)
+
+
+# ==============================================================================
+# AUTOCOMPLETE
+# ==============================================================================
+
+# Deadline pre upstream search - autocomplete nesmie blokovať workera 10 s
+AUTOCOMPLETE_TIMEOUT = 2.0
+# Maximálne čakanie endpointu na upstream (zvyšok dostane klient pri ďalšom dotaze)
+AUTOCOMPLETE_MAX_WAIT = 1.0
+AUTOCOMPLETE_WORKERS = 4
+# Max. počet rozbehnutých upstream dotazov - pri preťažení sa odpovedá len lokálne
+AUTOCOMPLETE_MAX_PENDING = 32
+# Ako dlho si pamätať výsledok upstream (a neúspech)
+AUTOCOMPLETE_CACHE_TTL = 600
+AUTOCOMPLETE_ERROR_TTL = 30
+
+_remote_searches = LRUCache(maxsize=2048, default_timeout=AUTOCOMPLETE_CACHE_TTL)
+_pending_searches = {}
+_pending_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool pre upstream search (volá sa pod _pending_lock)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=AUTOCOMPLETE_WORKERS,
+            thread_name_prefix='company-search'
+        )
+    return _executor
+
+
+def _run_remote_search(key, query: str, limit: int, submitted_at: float):
+    """Upstream search v pozadí, výsledok ide do zdieľaného cache"""
+    try:
+        if time.monotonic() - submitted_at > AUTOCOMPLETE_TIMEOUT:
+            # Čakal vo fronte dlhšie ako deadline - používateľ už píše ďalej
+            return MISSING
+        try:
+            results = get_lookup_service().search_remote(query, limit, timeout=AUTOCOMPLETE_TIMEOUT)
+        except Exception as e:
+            # Pri výpadku by sa logovalo každé stlačenie klávesu
+            logger.warning('Autocomplete upstream error: %s', e, extra={'sample_rate': 0.1})
+            _remote_searches.set(key, [], timeout=AUTOCOMPLETE_ERROR_TTL)
+            return []
+        results = results or []
+        _remote_searches.set(key, results)
+        return results
+    finally:
+        with _pending_lock:
+            _pending_searches.pop(key, None)
+
+
+def _submit_remote_search(key, query: str, limit: int):
+    """Spustí upstream search, súbežné rovnaké dotazy zdieľajú jeden (single-flight)"""
+    with _pending_lock:
+        future = _pending_searches.get(key)
+        if future is not None:
+            return future
+        if len(_pending_searches) >= AUTOCOMPLETE_MAX_PENDING:
+            return None
+        future = _pending_searches[key] = _get_executor().submit(
+            _run_remote_search, key, query, limit, time.monotonic()
+        )
+        return future
+
+
+def _merge_results(local: List[Dict[str, Any]], remote: List[Dict[str, Any]], limit: int):
+    """Lokálne výsledky prvé, z upstream len IČO ktoré ešte nemáme"""
+    seen = {r.get('ico') for r in local}
+    merged = list(local)
+    for record in remote:
+        if len(merged) >= limit:
+            break
+        if record.get('ico') not in seen:
+            seen.add(record.get('ico'))
+            merged.append(record)
+    return merged
+
+
+def autocomplete_companies(query: str, limit: int = 10, wait: float = 0.0) -> Dict[str, Any]:
+    """
+    Našepkávač firiem: okamžite vráti výsledky z lokálneho indexu
+    a na pozadí spustí upstream search.
+
+    Ak upstream nestihne do `wait` sekúnd, vráti sa more_coming=True
+    a klient zopakuje rovnaký dotaz (výsledok už bude v cache).
+    """
+    query = (query or '').strip()
+    if len(query) < 2:
+        return {'results': [], 'more_coming': False}
+
+    local = get_company_index().search(query, limit)
+    digits = query.replace(' ', '')
+    key = (digits if digits.isdigit() else fold(query), limit)
+
+    remote = _remote_searches.get(key)
+    if remote is MISSING:
+        future = _submit_remote_search(key, query, limit)
+        if future is None:
+            return {'results': local, 'more_coming': False}
+        if wait > 0:
+            try:
+                remote = future.result(timeout=min(wait, AUTOCOMPLETE_MAX_WAIT))
+            except FutureTimeout:
+                pass
+        if remote is MISSING:
+            return {'results': local, 'more_coming': True}
+
+    return {'results': _merge_results(local, remote, limit), 'more_coming': False}
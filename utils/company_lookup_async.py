@@ -0,0 +1,190 @@
+"""
+Asynchrónny klient pre Ekosystém.Digital API (httpx)
+
+- zdieľaný connection pool s keep-alive
+- priamy lookup a search bežia súbežne, vyhráva prvá platná odpoveď
+- jeden deadline na celý lookup (namiesto 10 s + 10 s za sebou)
+- synchrónna fasáda pre Flask views (event loop vo vlákne na pozadí)
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from utils.company_cache import UpstreamError
+
+
+DEFAULT_TIMEOUT = 5.0
+CONNECT_TIMEOUT = 3.0
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE = 10
+
+HEADERS = {
+    'User-Agent': 'FakturaSK/2.0 (Slovak Invoice System)',
+    'Accept': 'application/json',
+    'Accept-Language': 'sk-SK,sk;q=0.9'
+}
+
+
+def _items(data) -> list:
+    """API môže vrátiť list alebo objekt"""
+    return data if isinstance(data, list) else data.get('results', data.get('items', []))
+
+
+class AsyncCompanyLookup:
+    """Asynchrónny lookup firiem (httpx.AsyncClient viazaný na jeden event loop)"""
+
+    def __init__(self, api_url: str, search_url: str, parse: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 timeout: float = DEFAULT_TIMEOUT, max_connections: int = MAX_CONNECTIONS):
+        self.api_url = api_url
+        self.search_url = search_url
+        self.parse = parse
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._pid = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Po fork-e nesmie child používať spojenia rodiča
+        if self._client is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._client = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=MAX_KEEPALIVE
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url: str, params=None) -> httpx.Response:
+        try:
+            response = await self.client.get(url, params=params)
+        except httpx.TimeoutException:
+            raise UpstreamError("timeout")
+        except httpx.TransportError as e:
+            raise UpstreamError(f"connection error ({e.__class__.__name__})")
+        except httpx.HTTPError as e:
+            raise UpstreamError(f"HTTP error ({e.__class__.__name__})")
+        if response.status_code >= 500:
+            raise UpstreamError(f"HTTP {response.status_code}")
+        return response
+
+    @staticmethod
+    def _json(response: httpx.Response):
+        """Telo odpovede ako JSON - neplatné telo (napr. HTML chybová stránka) je výpadok"""
+        try:
+            return response.json()
+        except ValueError:
+            raise UpstreamError("invalid JSON response")
+
+    async def _direct(self, ico: str) -> Optional[Dict[str, Any]]:
+        """Priamy lookup - výsledok alebo None ak neexistuje"""
+        response = await self._get(f"{self.api_url}/{ico}")
+        if response.status_code == 200:
+            return self.parse(self._json(response))
+        return None
+
+    async def _search_exact(self, ico: str) -> Optional[Dict[str, Any]]:
+        """Search podľa IČO - len presná zhoda (iná firma nie je výsledok)"""
+        response = await self._get(self.search_url, params={'q': ico})
+        if response.status_code != 200:
+            return None
+        for item in _items(self._json(response)):
+            if str(item.get('cin', item.get('ico', ''))).zfill(8) == ico:
+                return self.parse(item)
+        return None
+
+    async def fetch(self, ico: str) -> Optional[Dict[str, Any]]:
+        """
+        Súbežne spustí priamy lookup aj search, vráti prvú platnú odpoveď.
+        Pri výpadku zdroja bez výsledku z druhého vyhodí UpstreamError,
+        None = firma neexistuje.
+        """
+        tasks = [asyncio.ensure_future(self._direct(ico)), asyncio.ensure_future(self._search_exact(ico))]
+        error = None
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=self.timeout):
+                try:
+                    result = await next_done
+                except UpstreamError as e:
+                    error = e
+                    continue
+                if result:
+                    return result
+        except asyncio.TimeoutError:
+            error = UpstreamError("timeout")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if error is not None:
+            raise error
+        return None
+
+    async def search(self, query: str, limit: int = 10, timeout: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """Vyhľadá firmy podľa názvu alebo IČO, None = neúspešná odpoveď"""
+        try:
+            response = await asyncio.wait_for(
+                self._get(self.search_url, params={'q': query, 'limit': limit}),
+                timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise UpstreamError("timeout")
+        if response.status_code != 200:
+            return None
+
+        results = []
+        for item in _items(self._json(response))[:limit]:
+            parsed = self.parse(item)
+            if parsed and parsed.get('name'):
+                results.append(parsed)
+        return results
+
+
+# ==============================================================================
+# SYNCHRÓNNA FASÁDA
+# ==============================================================================
+
+class _LoopThread:
+    """Event loop bežiaci vo vlákne na pozadí (jeden na proces)"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='company-lookup-loop', daemon=True)
+        self.thread.start()
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Vráti event loop na pozadí (po fork-e gunicorn workera sa vytvorí nový)"""
+    global _loop_thread
+    if _loop_thread is None or _loop_thread.pid != os.getpid():
+        with _loop_lock:
+            if _loop_thread is None or _loop_thread.pid != os.getpid():
+                _loop_thread = _LoopThread()
+    return _loop_thread.loop
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Spustí korutinu na loop-e na pozadí a počká na výsledok"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise UpstreamError("timeout")
@@ -5,11 +5,9 @@ Pomocné funkcie pre fakturačný systém
 """
 import io
 import base64
-import binascii
-import lzma
-import struct
-import qrcode
 from decimal import Decimal
+from utils.bysquare import encode_payment, make_qr
+from utils.instrumentation import timed
 
 
 # ==============================================================================
@@ -140,6 +138,7 @@ def format_currency(amount):
 # PAY BY SQUARE - Slovenský bankový QR kód štandard
 # ==============================================================================
 
+@timed('qr')
 def generate_pay_by_square(
     amount: float,
     iban: str,
@@ -167,14 +166,8 @@ def generate_pay_by_square(
         beneficiary_name: Meno príjemcu
         due_date: Dátum splatnosti vo formáte YYYYMMDD
     """
-    # Odstránime medzery z IBAN
-    iban = iban.replace(" ", "").upper()
-    
-    # Vytvoríme payment string podľa špecifikácie PAY by square
-    # Formát: tabulátorom oddelené polia
-    payment_data = _create_payment_string(
+    encoded = encode_payment(
         amount=amount,
-        currency="EUR",
         iban=iban,
         swift=swift,
         variable_symbol=variable_symbol,
@@ -185,161 +178,14 @@ def generate_pay_by_square(
         due_date=due_date
     )
     
-    # Komprimujeme LZMA
-    compressed = _compress_payment_data(payment_data)
-    
-    # Zakódujeme do base32hex
-    encoded = _encode_to_base32hex(compressed)
-    
-    # Vygenerujeme QR kód
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(encoded)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
+    img = make_qr(encoded).make_image(fill_color="black", back_color="white")
     
     buffer = io.BytesIO()
     img.save(buffer, format='PNG')
-    buffer.seek(0)
     
     return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
 
 
-def _create_payment_string(
-    amount: float,
-    currency: str,
-    iban: str,
-    swift: str,
-    variable_symbol: str,
-    constant_symbol: str,
-    specific_symbol: str,
-    note: str,
-    beneficiary_name: str,
-    due_date: str
-) -> str:
-    """
-    Vytvorí payment string podľa PAY by square špecifikácie verzia 1.1.0
-    """
-    # Počet platieb (vždy 1)
-    num_payments = "1"
-    
-    # Typ platby: 1 = payment order
-    payment_type = "1"
-    
-    # Formátujeme sumu (bez desatinnej čiarky, v centoch)
-    amount_str = f"{amount:.2f}"
-    
-    # Vytvoríme symboly string
-    symbols = f"{variable_symbol}/{specific_symbol}/{constant_symbol}"
-    
-    # PAY by square data format (verzia 1.1.0):
-    # Header: 0000 (verzia)
-    # Počet platieb
-    # Pre každú platbu:
-    #   - typ platby
-    #   - suma
-    #   - mena
-    #   - dátum splatnosti
-    #   - symboly
-    #   - poznámka
-    #   - počet účtov
-    #   - IBAN
-    #   - SWIFT
-    #   - meno príjemcu
-    
-    # Jednoduchšia implementácia - priamo string
-    fields = [
-        "",                # Invoice ID (prázdne)
-        num_payments,      # Počet platieb
-        "1",               # Payment options
-        amount_str,        # Suma
-        currency,          # Mena
-        due_date,          # Dátum splatnosti
-        variable_symbol,   # VS
-        constant_symbol,   # KS  
-        specific_symbol,   # SS
-        "",                # Reference
-        note,              # Poznámka
-        "1",               # Počet účtov
-        iban,              # IBAN
-        swift,             # SWIFT
-        "0",               # Standing order
-        "0",               # Direct debit
-        beneficiary_name,  # Meno príjemcu
-        "",                # Adresa 1
-        "",                # Adresa 2
-    ]
-    
-    return "\t".join(fields)
-
-
-def _compress_payment_data(data: str) -> bytes:
-    """
-    Komprimuje payment data pomocou LZMA podľa PAY by square štandardu
-    """
-    # Konvertujeme na bytes
-    data_bytes = data.encode('utf-8')
-    
-    # Pridáme CRC32 checksum (4 bytes, little endian)
-    crc = binascii.crc32(data_bytes) & 0xffffffff
-    
-    # Dáta s CRC
-    data_with_crc = data_bytes + struct.pack('<I', crc)
-    
-    # LZMA kompresia s nastaveniami pre PAY by square
-    compressed = lzma.compress(
-        data_with_crc,
-        format=lzma.FORMAT_RAW,
-        filters=[{
-            'id': lzma.FILTER_LZMA1,
-            'lc': 3,
-            'lp': 0,
-            'pb': 2,
-            'dict_size': 128 * 1024,
-        }]
-    )
-    
-    # Pridáme header s dĺžkou originálnych dát (2 bytes, little endian)
-    header = struct.pack('<H', len(data_with_crc))
-    
-    return header + compressed
-
-
-def _encode_to_base32hex(data: bytes) -> str:
-    """
-    Zakóduje bytes do base32hex (RFC 4648) s paddingom na 5-bit hranicu
-    """
-    # Zarovnanie na 5-bit hranicu
-    bit_length = len(data) * 8
-    padding_bits = (5 - (bit_length % 5)) % 5
-    
-    # Pridáme padding bity
-    if padding_bits > 0:
-        data = data + b'\x00' * ((padding_bits + 7) // 8)
-    
-    # Base32hex alphabet
-    alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUV"
-    
-    # Konvertujeme na číslo
-    num = int.from_bytes(data, 'big')
-    
-    # Počet znakov
-    num_chars = (bit_length + padding_bits) // 5
-    
-    # Enkódujeme
-    result = []
-    for _ in range(num_chars):
-        result.append(alphabet[num & 0x1F])
-        num >>= 5
-    
-    return ''.join(reversed(result))
-
-
 def get_qr_code_image_tag(qr_base64: str, size: int = 150) -> str:
     """
     Vráti HTML img tag s QR kódom
@@ -0,0 +1,287 @@
+"""
+Meranie requestov - SQL dotazy, časy a veľkosť odpovede
+Bez externého profilera: Server-Timing hlavička, /metrics (Prometheus text)
+a log pomalých requestov.
+
+Na request sa zaznamená route, počet SQL dotazov, celkový čas SQL,
+najpomalšie dotazy a trvanie úsekov (pdf, qr, rpo, external).
+Metriky sú per proces (každý gunicorn worker má vlastné).
+
+Server-Timing a /metrics prezrádzajú interné časy a route - hlavička ide
+predvolene len adminom (nikdy nie na verejné stránky) a /metrics bez
+METRICS_TOKEN mimo debug režimu neexistuje.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, Response
+
+
+# Počet najpomalších dotazov, ktoré si request pamätá
+SLOWEST_STATEMENTS = 3
+# Hranice histogramu trvania requestu (s)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """Merania jedného requestu (uložené v flask.g)"""
+    __slots__ = ('start', 'sql_count', 'sql_time', 'slowest', 'spans')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slowest = []  # [(trvanie, SQL)]
+        self.spans = {}  # názov úseku -> trvanie
+
+    def add_statement(self, statement, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        if len(self.slowest) < SLOWEST_STATEMENTS or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_STATEMENTS:]
+
+    def add_span(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+
+def current_stats():
+    """Merania aktuálneho requestu alebo None (mimo requestu, vypnuté meranie)"""
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+class timed:
+    """Zmeria úsek kódu a pripíše ho k requestu (context manager aj dekorátor)
+
+    Example:
+        with timed('pdf'):
+            pdf_bytes = generate_invoice_pdf_reportlab(invoice)
+
+        @timed('rpo')
+        def fetch_remote(self, ico): ...
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self._start
+        stats = current_stats()
+        if stats is not None:
+            stats.add_span(self.name, duration)
+        metrics.observe_span(self.name, duration)
+        return False
+
+    def __call__(self, f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with timed(self.name):
+                return f(*args, **kwargs)
+        return decorated_function
+
+
+# ==============================================================================
+# METRIKY (Prometheus text format)
+# ==============================================================================
+
+class Metrics:
+    """Počítadlá a histogramy pre /metrics (vláknovo bezpečné)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}  # (method, route, status) -> počet
+            self.durations = {}  # route -> [počty v bucketoch..., +Inf, suma]
+            self.sql_statements = {}  # route -> počet
+            self.sql_seconds = {}  # route -> sekundy
+            self.response_bytes = {}  # route -> bajty
+            self.spans = {}  # názov -> [počet, sekundy]
+            self.slow_requests = 0
+
+    def observe_request(self, method, route, status, duration, stats, size):
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            buckets = self.durations.get(route)
+            if buckets is None:
+                buckets = self.durations[route] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+            buckets[len(DURATION_BUCKETS)] += 1
+            buckets[-1] += duration
+
+            self.sql_statements[route] = self.sql_statements.get(route, 0) + stats.sql_count
+            self.sql_seconds[route] = self.sql_seconds.get(route, 0.0) + stats.sql_time
+            self.response_bytes[route] = self.response_bytes.get(route, 0) + (size or 0)
+
+    def observe_span(self, name, duration):
+        with self._lock:
+            span = self.spans.setdefault(name, [0, 0.0])
+            span[0] += 1
+            span[1] += duration
+
+    def render(self):
+        """Vráti metriky v Prometheus text formáte"""
+        def labels(**values):
+            return '{' + ','.join(f'{k}="{v}"' for k, v in values.items()) + '}'
+
+        lines = []
+        with self._lock:
+            lines.append('# HELP app_requests_total Počet requestov')
+            lines.append('# TYPE app_requests_total counter')
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'app_requests_total{labels(method=method, route=route, status=status)} {count}')
+
+            lines.append('# HELP app_request_duration_seconds Trvanie requestu')
+            lines.append('# TYPE app_request_duration_seconds histogram')
+            for route, buckets in sorted(self.durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'app_request_duration_seconds_bucket{labels(route=route, le=bound)} {count}')
+                total = buckets[len(DURATION_BUCKETS)]
+                lines.append(f'app_request_duration_seconds_bucket{labels(route=route, le="+Inf")} {total}')
+                lines.append(f'app_request_duration_seconds_sum{labels(route=route)} {buckets[-1]:.6f}')
+                lines.append(f'app_request_duration_seconds_count{labels(route=route)} {total}')
+
+            lines.append('# HELP app_sql_statements_total Počet SQL dotazov')
+            lines.append('# TYPE app_sql_statements_total counter')
+            for route, count in sorted(self.sql_statements.items()):
+                lines.append(f'app_sql_statements_total{labels(route=route)} {count}')
+
+            lines.append('# HELP app_sql_seconds_total Čas strávený v SQL')
+            lines.append('# TYPE app_sql_seconds_total counter')
+            for route, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'app_sql_seconds_total{labels(route=route)} {seconds:.6f}')
+
+            lines.append('# HELP app_response_bytes_total Veľkosť odpovedí')
+            lines.append('# TYPE app_response_bytes_total counter')
+            for route, size in sorted(self.response_bytes.items()):
+                lines.append(f'app_response_bytes_total{labels(route=route)} {size}')
+
+            lines.append('# HELP app_span_seconds_total Čas v meraných úsekoch (pdf, qr, rpo, external)')
+            lines.append('# TYPE app_span_seconds_total counter')
+            for name, (count, seconds) in sorted(self.spans.items()):
+                lines.append(f'app_span_seconds_total{labels(span=name)} {seconds:.6f}')
+            lines.append('# TYPE app_span_calls_total counter')
+            for name, (count, seconds) in sorted(self.spans.items()):
+                lines.append(f'app_span_calls_total{labels(span=name)} {count}')
+
+            lines.append('# HELP app_slow_requests_total Requesty nad SLOW_REQUEST_MS')
+            lines.append('# TYPE app_slow_requests_total counter')
+            lines.append(f'app_slow_requests_total {self.slow_requests}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+# ==============================================================================
+# FLASK INTEGRÁCIA
+# ==============================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    starts = conn.info.get('_query_start')
+    if stats is None or not starts:
+        return
+    stats.add_statement(statement, time.perf_counter() - starts.pop())
+
+
+def _server_timing(stats, total):
+    parts = [f'app;dur={total * 1000:.1f}',
+             f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"']
+    for name, duration in stats.spans.items():
+        parts.append(f'{name};dur={duration * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def _server_timing_allowed(app, response):
+    """Server-Timing podľa SERVER_TIMING ('admin', 'all', 'off'), nikdy na verejné stránky"""
+    mode = str(app.config.get('SERVER_TIMING', 'admin')).lower()
+    if mode in ('off', 'false', '0', ''):
+        return False
+    # Verejná faktúra a čokoľvek cachovateľné na CDN
+    if (request.endpoint or '').startswith('public_') or response.cache_control.public:
+        return False
+    if mode in ('all', 'true', '1'):
+        return True
+    from flask_login import current_user
+    return bool(current_user and current_user.is_authenticated and current_user.is_admin)
+
+
+def init_instrumentation(app):
+    """Zapne meranie requestov, Server-Timing hlavičku a /metrics endpoint"""
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def finish_request_stats(response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+
+        total = time.perf_counter() - stats.start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        size = response.calculate_content_length() if not response.is_streamed else None
+        if route != '/metrics':
+            metrics.observe_request(request.method, route, response.status_code, total, stats, size)
+
+        if _server_timing_allowed(app, response):
+            response.headers['Server-Timing'] = _server_timing(stats, total)
+
+        slow_ms = app.config.get('SLOW_REQUEST_MS', 1000)
+        if slow_ms is not None and total * 1000 >= slow_ms:
+            with metrics._lock:
+                metrics.slow_requests += 1
+            slowest = '; '.join(
+                f'{duration * 1000:.1f} ms: {" ".join(statement.split())[:200]}'
+                for duration, statement in stats.slowest
+            )
+            spans = ', '.join(f'{name}={duration * 1000:.0f} ms' for name, duration in stats.spans.items())
+            app.logger.warning(
+                f'Slow request {request.method} {route} {response.status_code}: {total * 1000:.0f} ms, '
+                f'SQL {stats.sql_count}x / {stats.sql_time * 1000:.0f} ms, {size or 0} B'
+                + (f', {spans}' if spans else '')
+                + (f' | slowest: {slowest}' if slowest else '')
+            )
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Metriky procesu v Prometheus text formáte"""
+        token = app.config.get('METRICS_TOKEN')
+        if not token:
+            if not app.debug:
+                return Response('Not Found\n', status=404, mimetype='text/plain')
+        elif request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
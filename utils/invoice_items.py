@@ -0,0 +1,117 @@
+"""
+Úprava položiek faktúry porovnaním s uloženými
+Odoslané položky sa spárujú s existujúcimi podľa id (skryté pole item_id[]);
+ak vstup id neobsahuje vôbec, podľa poradia (position). Zapíše sa len rozdiel - jeden hromadný
+UPDATE (executemany) zmenených, INSERT nových a DELETE odobratých
+položiek; nezmenené položky sa nezapisujú a ich id ostávajú.
+Sumy faktúry sa upravia o rozdiel (Invoice.apply_item_delta).
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, insert, update
+
+from models import db, InvoiceItem
+from utils.money import ZERO, money, to_decimal
+
+FIELDS = ('description', 'item_note', 'quantity', 'unit', 'unit_price', 'cost_price', 'total', 'position')
+
+
+def item_values(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Hodnoty stĺpcov položky z odoslaného riadku (sumy na centy, total dopočítaný)"""
+    quantity = float(row.get('quantity') or 0)
+    unit_price = money(row.get('unit_price'))
+    return {
+        'description': row['description'],
+        'item_note': row.get('item_note') or '',
+        'quantity': quantity,
+        'unit': row.get('unit') or 'ks',
+        'unit_price': unit_price,
+        'cost_price': money(row.get('cost_price')),
+        'total': money(to_decimal(quantity) * unit_price),
+        'position': row.get('position', 0),
+    }
+
+
+def _cost(values) -> Any:
+    return money(to_decimal(values['cost_price']) * to_decimal(values['quantity']))
+
+
+def reconcile_items(invoice, rows: List[Dict[str, Any]], session=None) -> Dict[str, int]:
+    """
+    Zosúladí položky faktúry s odoslanými riadkami (description, item_note, quantity,
+    unit, unit_price, cost_price, position, voliteľne id).
+    Vráti {'inserted', 'updated', 'deleted', 'unchanged'}.
+    """
+    session = session or db.session
+    existing = {item.id: item for item in invoice.items}
+    # Podľa pozície len ak formulár id neposiela (inak je riadok bez id nová položka)
+    by_position = {}
+    if not any(_int(row.get('id')) for row in rows):
+        by_position = {item.position: item for item in sorted(existing.values(), key=lambda item: item.id, reverse=True)}
+    matched = set()
+    inserts, updates = [], []
+    report = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    total_delta = cost_delta = ZERO
+
+    for row in rows:
+        values = item_values(row)
+        item_id = _int(row.get('id'))
+        # Cudzie id = nová položka
+        item = existing.get(item_id) if item_id is not None else by_position.get(values['position'])
+        if item is not None and item.id in matched:
+            item = None
+        if item is None:
+            inserts.append(dict(values, invoice_id=invoice.id))
+            total_delta += values['total']
+            cost_delta += _cost(values)
+            continue
+        matched.add(item.id)
+        current = {field: getattr(item, field) for field in FIELDS}
+        if all(_same(current[field], values[field]) for field in FIELDS):
+            report['unchanged'] += 1
+            continue
+        updates.append(dict(values, id=item.id))
+        total_delta += values['total'] - money(current['total'])
+        cost_delta += _cost(values) - item.cost_total
+
+    removed = [item for item_id, item in existing.items() if item_id not in matched]
+    for item in removed:
+        total_delta -= money(item.total)
+        cost_delta -= item.cost_total
+
+    if removed:
+        session.execute(
+            delete(InvoiceItem).where(InvoiceItem.id.in_([item.id for item in removed])),
+            execution_options={'synchronize_session': False},
+        )
+    if updates:
+        session.execute(update(InvoiceItem), updates)
+    if inserts:
+        session.execute(insert(InvoiceItem), inserts)
+
+    # Položky sa zapísali mimo ORM - pri ďalšom prístupe sa načítajú nanovo
+    for item in existing.values():
+        if item.id in matched:
+            session.expire(item)
+        else:
+            session.expunge(item)
+    session.expire(invoice, ['items'])
+    invoice.apply_item_delta(total_delta, cost_delta)
+
+    report.update(inserted=len(inserts), updated=len(updates), deleted=len(removed))
+    return report
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _same(old, new):
+    if old in (None, '') and new in (None, ''):
+        return True
+    if isinstance(new, float) or isinstance(old, float):
+        return old is not None and abs(float(old) - float(new)) < 1e-9
+    return old == new
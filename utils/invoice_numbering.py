@@ -0,0 +1,110 @@
+"""
+Prideľovanie čísel faktúr
+Číslo sa pridelí jedným atomickým príkazom nad invoice_sequences
+(INSERT ... ON CONFLICT DO UPDATE ... RETURNING). Riadok (dodávateľ, rok)
+ostane zamknutý do commitu requestu - súbežné requesty toho istého
+dodávateľa dostanú rôzne čísla a rollback nezanechá dieru v rade.
+Rôzni dodávatelia sa navzájom neblokujú.
+
+Hromadné generovanie si vyhradí blok čísel naraz (jeden príkaz, jeden zámok).
+Unikátny index (user_id, invoice_number) je posledná poistka.
+
+Rad bez ročného resetu (rok 0) pri prvom použití pokračuje od najvyššieho
+doterajšieho radu dodávateľa - inak by po vypnutí resetu prideľoval čísla,
+ktoré už v aktuálnom roku existujú.
+"""
+from datetime import date
+from typing import List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import object_session
+
+from models import db, InvoiceSequence, Supplier
+
+
+def _sequence_year(year: int) -> int:
+    """Kľúč radu - rok, alebo 0 pri vypnutom ročnom resete"""
+    if has_app_context() and not current_app.config.get('INVOICE_NUMBER_YEARLY_RESET', True):
+        return 0
+    return year
+
+
+def format_invoice_number(prefix: Optional[str], year: int, number: int) -> str:
+    """Formát čísla faktúry: prefix + rok + poradové číslo (min. 4 cifry)"""
+    return f"{prefix or ''}{year}{number:04d}"
+
+
+def _first_number(supplier_id: int, year: int):
+    """
+    Prvé číslo nového radu (SQL výraz) - ročný rad od 1, rad bez resetu
+    od najvyššieho ročného radu (alebo pôvodného počítadla) dodávateľa
+    """
+    if year != 0:
+        return literal(1)
+    table = InvoiceSequence.__table__
+    highest = (
+        select(func.max(table.c.next_number))
+        .where(table.c.supplier_id == supplier_id, table.c.year != 0)
+        .scalar_subquery()
+    )
+    legacy = select(Supplier.next_invoice_number).where(Supplier.id == supplier_id).scalar_subquery()
+    return func.coalesce(highest, legacy, 1)
+
+
+def reserve_numbers(session, supplier_id: int, year: int, count: int = 1) -> int:
+    """
+    Atomicky posunie rad o count a vráti prvé vyhradené poradové číslo.
+    Prvé použitie ročného radu (nový rok, nový dodávateľ) začína od 1.
+    """
+    if count < 1:
+        raise ValueError('count musí byť aspoň 1')
+
+    table = InvoiceSequence.__table__
+    first = _first_number(supplier_id, year)
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(supplier_id=supplier_id, year=year, next_number=first + count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.supplier_id, table.c.year],
+            set_={'next_number': table.c.next_number + count},
+        ).returning(table.c.next_number)
+        end = session.execute(stmt).scalar_one()
+        return end - count
+
+    # Ostatné databázy: zámok riadku cez SELECT ... FOR UPDATE
+    current = session.execute(
+        select(table.c.next_number)
+        .where(table.c.supplier_id == supplier_id, table.c.year == year)
+        .with_for_update()
+    ).scalar_one_or_none()
+    if current is None:
+        current = session.execute(select(first)).scalar_one()
+        session.execute(table.insert().values(supplier_id=supplier_id, year=year, next_number=current + count))
+        return current
+    session.execute(
+        table.update()
+        .where(table.c.supplier_id == supplier_id, table.c.year == year)
+        .values(next_number=current + count)
+    )
+    return current
+
+
+def allocate_invoice_numbers(supplier, count: int = 1, year: Optional[int] = None, session=None) -> List[str]:
+    """Vyhradí blok count po sebe idúcich čísel faktúr dodávateľa"""
+    session = session or object_session(supplier) or db.session
+    if supplier.id is None:
+        session.flush()
+    year = year or date.today().year
+    first = reserve_numbers(session, supplier.id, _sequence_year(year), count)
+    return [format_invoice_number(supplier.invoice_prefix, year, number)
+            for number in range(first, first + count)]
+
+
+def allocate_invoice_number(supplier, year: Optional[int] = None, session=None) -> str:
+    """Pridelí jedno číslo faktúry"""
+    return allocate_invoice_numbers(supplier, 1, year, session)[0]
@@ -0,0 +1,85 @@
+"""
+Kontrola uložených súm faktúr
+Sumy faktúry (subtotal, vat_amount, total, total_cost, profit) sa ukladajú
+a upravujú pri zmene položiek (Invoice.add_item/update_item/remove_item),
+čítanie ich už neprepočítava. check_invoice_totals() ich porovná
+s prepočtom z položiek a nájde odchýlky (zápis mimo týchto metód,
+ručný zásah do databázy). Spúšťa sa z cronu (`flask check-totals [--fix]`).
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, select
+
+from models import db, Invoice, InvoiceItem
+from utils.money import ZERO, money, to_decimal
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('subtotal', 'vat_amount', 'total', 'total_cost', 'profit')
+
+
+def expected_totals(invoice_row, items) -> Dict[str, float]:
+    """Sumy faktúry z položiek - rovnaký výpočet ako Invoice.calculate_totals()"""
+    calculated = Invoice(vat_rate=invoice_row.vat_rate or 0.0)
+    calculated.subtotal = sum((money(item.total) for item in items), ZERO)
+    calculated.total_cost = sum((money(to_decimal(item.cost_price) * to_decimal(item.quantity)) for item in items), ZERO)
+    calculated.calculate_vat()
+    return {field: getattr(calculated, field) for field in FIELDS}
+
+
+def check_invoice_totals(user_id: Optional[int] = None, fix: bool = False,
+                         batch_size: int = 500, session=None) -> Dict[str, Any]:
+    """
+    Porovná uložené sumy faktúr s prepočtom z položiek (po dávkach podľa id).
+    Vráti {'checked', 'drifted': [{'invoice_id', 'invoice_number', 'field', 'stored', 'expected'}], 'fixed'}.
+    fix=True uložené sumy opraví.
+    """
+    session = session or db.session
+    report = {'checked': 0, 'drifted': [], 'fixed': 0}
+    table = Invoice.__table__
+    repair = (
+        table.update()
+        .where(table.c.id == bindparam('b_id'))
+        .values({field: bindparam(f'b_{field}') for field in FIELDS})
+    )
+    last_id = 0
+    while True:
+        stmt = select(Invoice.id, Invoice.invoice_number, Invoice.vat_rate, *(getattr(Invoice, f) for f in FIELDS))
+        if user_id is not None:
+            stmt = stmt.where(Invoice.user_id == user_id)
+        invoices = session.execute(stmt.where(Invoice.id > last_id).order_by(Invoice.id).limit(batch_size)).all()
+        if not invoices:
+            break
+        last_id = invoices[-1].id
+
+        items = {}
+        for item in session.execute(
+            select(InvoiceItem.invoice_id, InvoiceItem.total, InvoiceItem.cost_price, InvoiceItem.quantity)
+            .where(InvoiceItem.invoice_id.in_([row.id for row in invoices]))
+        ):
+            items.setdefault(item.invoice_id, []).append(item)
+
+        repairs = []
+        for row in invoices:
+            expected = expected_totals(row, items.get(row.id, []))
+            drift = [field for field in FIELDS if money(getattr(row, field)) != expected[field]]
+            for field in drift:
+                report['drifted'].append({
+                    'invoice_id': row.id, 'invoice_number': row.invoice_number,
+                    'field': field, 'stored': getattr(row, field), 'expected': expected[field],
+                })
+            if drift:
+                logger.warning('Invoice %s totals drifted: %s', row.invoice_number, ', '.join(drift))
+                repairs.append(dict({f'b_{field}': value for field, value in expected.items()}, b_id=row.id))
+        report['checked'] += len(invoices)
+
+        if fix and repairs:
+            try:
+                session.execute(repair, repairs)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            report['fixed'] += len(repairs)
+    return report
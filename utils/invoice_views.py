@@ -0,0 +1,103 @@
+"""
+Počítanie zobrazení verejnej faktúry
+Zobrazenie hlási beacon zo stránky (HTML je cachované, link scannery
+v e-mailoch JavaScript nespúšťajú). Beacon nič nezapisuje synchrónne -
+zobrazenie ide do bufferu a writer ho po dávkach zapíše: INSERT do invoice_views (executemany) a jeden atomický
+UPDATE invoices SET view_count = view_count + n na faktúru. Žiadne
+read-modify-write, riadok faktúry je zamknutý len na čas jedného príkazu.
+
+Opakované zobrazenie tej istej faktúry z rovnakej IP a prehliadača
+v okne INVOICE_VIEW_DEDUPE_WINDOW (s) sa nepočíta (reload, link scannery
+v e-mailoch). Na serverless (Vercel, Lambda) sa zapisuje synchrónne,
+viď INVOICE_VIEWS_ASYNC.
+"""
+import hashlib
+
+from flask import current_app
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, utcnow, Invoice, InvoiceView
+from utils.buffered_writer import BufferedWriter
+from utils.cache import LRUCache, MISSING
+
+_recent_views = LRUCache(maxsize=50000)
+
+
+class InvoiceViewWriter(BufferedWriter):
+    """Hromadný zápis zobrazení a prírastkov počítadla"""
+
+    name = 'invoice-view-writer'
+    config_prefix = 'INVOICE_VIEWS_'
+
+    def write(self, engine, rows):
+        try:
+            self._write(engine, rows)
+        except IntegrityError:
+            # Faktúra bola medzitým zmazaná - jej zobrazenia sa zahodia
+            with engine.connect() as conn:
+                existing = set(conn.scalars(
+                    select(Invoice.id).where(Invoice.id.in_({row['invoice_id'] for row in rows}))
+                ))
+            self._write(engine, [row for row in rows if row['invoice_id'] in existing])
+
+    def _write(self, engine, rows):
+        if not rows:
+            return
+        counts = {}
+        for row in rows:
+            entry = counts.setdefault(row['invoice_id'], {
+                'b_invoice_id': row['invoice_id'], 'b_count': 0,
+                'b_first': row['viewed_at'], 'b_last': row['viewed_at'],
+            })
+            entry['b_count'] += 1
+            entry['b_first'] = min(entry['b_first'], row['viewed_at'])
+            entry['b_last'] = max(entry['b_last'], row['viewed_at'])
+
+        table = Invoice.__table__
+        increment = (
+            table.update()
+            .where(table.c.id == bindparam('b_invoice_id'))
+            .values(
+                view_count=func.coalesce(table.c.view_count, 0) + bindparam('b_count'),
+                first_viewed_at=func.coalesce(table.c.first_viewed_at, bindparam('b_first')),
+                last_viewed_at=bindparam('b_last'),
+                # Zobrazenie nie je zmena faktúry (revízia verejnej stránky ostáva)
+                updated_at=table.c.updated_at,
+            )
+        )
+        with engine.begin() as conn:
+            conn.execute(insert(InvoiceView.__table__), rows)
+            conn.execute(increment, list(counts.values()))
+
+
+writer = InvoiceViewWriter()
+
+
+def record_view(invoice_id, ip_address=None, user_agent=None) -> bool:
+    """
+    Zaznamená zobrazenie faktúry; False = opakované zobrazenie v okne (nepočíta sa).
+
+    Dedupe je best-effort: pamäť posledných zobrazení má každý worker (a každá
+    serverless inštancia) vlastnú, takže opakované zobrazenie obslúžené iným
+    workerom sa započíta. Presné unikátne zobrazenia dávajú až agregáty z invoice_views.
+    """
+    user_agent = (user_agent or '')[:500]
+    window = current_app.config.get('INVOICE_VIEW_DEDUPE_WINDOW', 1800)
+    if window:
+        key = (invoice_id, ip_address, hashlib.sha1(user_agent.encode('utf-8')).hexdigest())
+        if _recent_views.get(key) is not MISSING:
+            return False
+        _recent_views.set(key, True, timeout=window)
+
+    writer.enqueue(db.engine, [{
+        'invoice_id': invoice_id,
+        'viewed_at': utcnow(),
+        'ip_address': ip_address,
+        'user_agent': user_agent or None,
+    }])
+    return True
+
+
+def clear_recent_views():
+    _recent_views.clear()
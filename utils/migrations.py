@@ -0,0 +1,239 @@
+"""
+Verzované migrácie databázovej schémy
+Spúšťajú sa explicitne (`flask db-upgrade`, release fáza deploy-u),
+nie pri requestoch.
+
+Aplikácia pri prvom requeste v procese overí len číslo verzie jedným
+SELECT-om nad tabuľkou schema_version (bez dotazov do katalógu)
+a výsledok si zapamätá.
+
+Nová migrácia = nová funkcia v MIGRATIONS, SCHEMA_VERSION sa zvýši sám.
+"""
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+# Kľúč pre pg_advisory_xact_lock - súbežné deploye nemigrujú naraz
+_ADVISORY_LOCK_ID = 7302541
+
+
+def _baseline(conn):
+    """Vytvorí chýbajúce tabuľky podľa modelov (pôvodné db.create_all())"""
+    from models import db
+    db.metadata.create_all(bind=conn)
+
+
+def _invoice_numbering(conn):
+    """Rady čísel faktúr (invoice_sequences) a unikátne (user_id, invoice_number)"""
+    from models import InvoiceSequence
+    InvoiceSequence.__table__.create(bind=conn, checkfirst=True)
+
+    duplicates = conn.execute(text(
+        'SELECT user_id, invoice_number, COUNT(*) FROM invoices '
+        'GROUP BY user_id, invoice_number HAVING COUNT(*) > 1'
+    )).fetchall()
+    if duplicates:
+        listed = ', '.join(f'user {user_id}: {number} ({count}x)' for user_id, number, count in duplicates[:20])
+        raise RuntimeError(f'Duplicitné čísla faktúr, pred migráciou ich treba opraviť: {listed}')
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_invoices_user_number ON invoices (user_id, invoice_number)'
+    ))
+
+    # Rad aktuálneho roka pokračuje z pôvodného počítadla dodávateľa
+    conn.execute(text(
+        'INSERT INTO invoice_sequences (supplier_id, year, next_number) '
+        'SELECT id, :year, COALESCE(next_invoice_number, 1) FROM suppliers '
+        'WHERE id NOT IN (SELECT supplier_id FROM invoice_sequences WHERE year = :year)'
+    ), {'year': date.today().year})
+
+
+def _recurring_invoices(conn):
+    """Väzba faktúry na šablónu a obdobie, index splatných šablón"""
+    from sqlalchemy import inspect
+    columns = {column['name'] for column in inspect(conn).get_columns('invoices')}
+    if 'recurring_invoice_id' not in columns:
+        conn.execute(text(
+            'ALTER TABLE invoices ADD COLUMN recurring_invoice_id INTEGER '
+            'REFERENCES recurring_invoices (id) ON DELETE SET NULL'
+        ))
+    if 'recurring_period' not in columns:
+        conn.execute(text('ALTER TABLE invoices ADD COLUMN recurring_period DATE'))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_invoices_recurring_period '
+        'ON invoices (recurring_invoice_id, recurring_period)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_recurring_due ON recurring_invoices (is_active, next_generate_date)'
+    ))
+    # Šablóny bez dátumu by sa nikdy nevybrali - začnú od start_date
+    conn.execute(text(
+        'UPDATE recurring_invoices SET next_generate_date = start_date WHERE next_generate_date IS NULL'
+    ))
+
+
+def _activity_log(conn):
+    """Activity log: JSONB extra_data, index (user_id, created_at DESC), archívna tabuľka"""
+    from sqlalchemy import inspect
+    from models import ActivityLogArchive
+    if conn.dialect.name == 'postgresql':
+        columns = {column['name']: column for column in inspect(conn).get_columns('activity_logs')}
+        if columns['extra_data']['type'].__class__.__name__ != 'JSONB':
+            conn.execute(text(
+                'ALTER TABLE activity_logs ALTER COLUMN extra_data TYPE JSONB USING extra_data::jsonb'
+            ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_activity_logs_user_created ON activity_logs (user_id, created_at DESC)'
+    ))
+    ActivityLogArchive.__table__.create(bind=conn, checkfirst=True)
+
+
+def _view_analytics(conn):
+    """Agregáty zobrazení faktúr a indexy surových zobrazení"""
+    from models import AnalyticsState, InvoiceViewDaily, InvoiceViewer, InvoiceViewStats, UserViewDaily
+    for model in (InvoiceViewDaily, UserViewDaily, InvoiceViewer, InvoiceViewStats, AnalyticsState):
+        model.__table__.create(bind=conn, checkfirst=True)
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_invoice_views_invoice_viewed ON invoice_views (invoice_id, viewed_at)'
+    ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_invoice_views_viewed ON invoice_views (viewed_at)'))
+
+
+def _invoice_cost_totals(conn):
+    """Uložená nákupná cena a zisk faktúry (invoices.total_cost, invoices.profit)"""
+    from sqlalchemy import inspect
+    columns = {column['name'] for column in inspect(conn).get_columns('invoices')}
+    for name in ('total_cost', 'profit'):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE invoices ADD COLUMN {name} FLOAT NOT NULL DEFAULT 0'))
+    cost = (
+        'COALESCE((SELECT SUM(ROUND(CAST(COALESCE(cost_price, 0) * quantity AS NUMERIC), 2)) '
+        'FROM invoice_items WHERE invoice_items.invoice_id = invoices.id), 0)'
+    )
+    conn.execute(text(
+        f'UPDATE invoices SET total_cost = ROUND(CAST({cost} AS NUMERIC), 2), '
+        f'profit = ROUND(CAST(COALESCE(subtotal, 0) - {cost} AS NUMERIC), 2)'
+    ))
+
+
+
+MONEY_COLUMNS = {
+    'invoices': ('subtotal', 'vat_amount', 'total', 'total_cost', 'profit'),
+    'invoice_items': ('unit_price', 'cost_price', 'total'),
+}
+
+
+def _money_numeric(conn):
+    """Peňažné stĺpce ako NUMERIC(12, 2) - presné sumy namiesto float"""
+    for table, columns in MONEY_COLUMNS.items():
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f'ALTER TABLE {table} ' + ', '.join(
+                f'ALTER COLUMN {column} TYPE NUMERIC(12, 2) USING ROUND({column}::numeric, 2)' for column in columns
+            )))
+        else:
+            # SQLite typ stĺpca nemení (NUMERIC afinita) - hodnoty sa len zaokrúhlia na centy
+            conn.execute(text(f'UPDATE {table} SET ' + ', '.join(
+                f'{column} = ROUND({column}, 2)' for column in columns
+            )))
+
+
+# (verzia, popis, funkcia(conn)) - poradie sa nemení, len pridáva
+# Základná schéma vytvára tabuľky podľa aktuálnych modelov - ďalšie migrácie
+# preto musia zvládnuť aj stav, keď ich zmena už v databáze je.
+MIGRATIONS = [
+    (1, 'Základná schéma (všetky tabuľky z models.py)', _baseline),
+    (2, 'Atomické číslovanie faktúr (invoice_sequences, unikátne číslo)', _invoice_numbering),
+    (3, 'Generovanie pravidelných faktúr (väzba na šablónu, index splatných)', _recurring_invoices),
+    (4, 'Activity log (JSONB, index posledných akcií, archív)', _activity_log),
+    (5, 'Analytika zobrazení faktúr (denné agregáty, unikátni diváci)', _view_analytics),
+    (6, 'Uložená nákupná cena a zisk faktúr', _invoice_cost_totals),
+    (7, 'Peňažné stĺpce ako NUMERIC(12, 2)', _money_numeric),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Pri zastaranej schéme sa verzia znova overí najskôr po tomto čase (s)
+RECHECK_INTERVAL = 60
+
+
+class SchemaOutdated(RuntimeError):
+    """Databáza má staršiu schému, ako očakáva kód"""
+
+
+def get_schema_version(conn) -> int:
+    """Vráti aktuálnu verziu schémy (0 = databáza bez tabuľky schema_version)"""
+    try:
+        with conn.begin_nested():
+            row = conn.execute(text('SELECT MAX(version) FROM schema_version')).first()
+    except SQLAlchemyError:
+        return 0
+    return (row[0] or 0) if row else 0
+
+
+def migrate(engine, target=SCHEMA_VERSION, log=print) -> int:
+    """Aplikuje chýbajúce migrácie v jednej transakcii, vráti výslednú verziu"""
+    from models import SchemaVersion
+
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': _ADVISORY_LOCK_ID})
+        SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+
+        current = get_schema_version(conn)
+        for version, description, apply in MIGRATIONS:
+            if current < version <= target:
+                start = time.perf_counter()
+                apply(conn)
+                conn.execute(SchemaVersion.__table__.insert().values(version=version))
+                log(f'✓ Migrácia {version}: {description} ({(time.perf_counter() - start) * 1000:.0f} ms)')
+                current = version
+    return current
+
+
+class SchemaGuard:
+    """Kontrola verzie schémy raz na proces (výsledok sa cachuje)"""
+
+    def __init__(self):
+        self.version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def checked(self) -> bool:
+        return self.version is not None and self.version >= SCHEMA_VERSION
+
+    def check(self, engine, auto_migrate=False, log=print) -> int:
+        """
+        Overí verziu schémy (jeden SELECT). Pri zastaranej schéme ju
+        s auto_migrate zmigruje, inak vyhodí SchemaOutdated.
+        """
+        if self.checked:
+            return self.version
+        with self._lock:
+            if self.checked:
+                return self.version
+            if time.monotonic() < self._next_check:
+                return self.version
+            with engine.connect() as conn:
+                version = get_schema_version(conn)
+            if version < SCHEMA_VERSION:
+                if not auto_migrate:
+                    self.version = version
+                    self._next_check = time.monotonic() + RECHECK_INTERVAL
+                    raise SchemaOutdated(
+                        f'Schéma databázy má verziu {version}, očakáva sa {SCHEMA_VERSION}. '
+                        f'Spustite `flask db-upgrade`.'
+                    )
+                version = migrate(engine, log=log)
+            self.version = version
+            return version
+
+    def reset(self):
+        self.version = None
+        self._next_check = 0.0
+
+
+schema_guard = SchemaGuard()
@@ -0,0 +1,65 @@
+"""
+Peniaze - presná aritmetika na centy
+Sumy sa v databáze ukladajú ako Numeric(12, 2) (stĺpcový typ Money),
+v Pythone sú to Decimal zaokrúhlené na centy (ROUND_HALF_UP, ako na faktúre).
+Float sa do súm nedostane - money() ho prevedie cez jeho textový zápis.
+
+Hromadné súčty (dashboard, prehľady) sa nerobia cez Decimal objekty na
+riadok, ale v celých centoch priamo v SQL (sum_cents) - súčet celých čísel
+je presný na každej databáze a vráti sa jeden int. from_cents() ho
+prevedie späť na Decimal len pre zobrazenie.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import BigInteger, Numeric, cast, func
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def to_decimal(value) -> Decimal:
+    """Decimal z čísla/reťazca; float cez jeho zápis (0.1 -> Decimal('0.1'))"""
+    if value is None:
+        return ZERO
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def money(value) -> Decimal:
+    """Suma zaokrúhlená na centy"""
+    return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value) -> int:
+    return int(money(value).scaleb(2))
+
+
+def from_cents(cents) -> Decimal:
+    return Decimal(int(cents or 0)).scaleb(-2)
+
+
+def percent_of(amount, rate) -> Decimal:
+    """rate % zo sumy, zaokrúhlené na centy (DPH)"""
+    return money(to_decimal(amount) * to_decimal(rate) / 100)
+
+
+def sum_cents(column):
+    """SQL súčet stĺpca v celých centoch (0 ak nie sú riadky)"""
+    return func.coalesce(func.sum(cast(func.round(column * 100), BigInteger)), 0)
+
+
+class Money(TypeDecorator):
+    """Numeric(12, 2) - zapisuje aj float, vracia Decimal na centy"""
+
+    impl = Numeric(12, 2)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else money(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else money(value)
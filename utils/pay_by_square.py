@@ -4,14 +4,19 @@ Korektná implementácia podľa SBA/bsqr.co štandardu
 https://bsqr.co/schema/
 """
 import base64
-import struct
-import lzma
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from typing import Optional
-import qrcode
-import requests
+from utils.bysquare import encode_payment
+from utils.cache import get_cache, MISSING
+from utils.instrumentation import timed
 
+logger = logging.getLogger(__name__)
 
+
+@timed('external')
 def generate_qr_code_external(
     amount: float,
     iban: str,
@@ -29,6 +34,8 @@ def generate_qr_code_external(
     """
     Získa ORIGINÁLNE PNG (Brandované) z freebysquare.sk API (GET metóda)
     """
+    import requests
+    
     try:
         api_url = "https://api.freebysquare.sk/pay/v1/generate-png"
         
@@ -66,62 +73,28 @@ def generate_qr_code_external(
             'Referer': 'https://fakturask.sk/'
         }
 
-        print(f"Fetching Original PNG from {api_url}...")
+        logger.debug('Fetching original PNG from %s', api_url)
         response = requests.get(api_url, params=params, headers=headers, timeout=10)
         
         if response.status_code == 200:
             png_bytes = response.content
             # Check magic bytes for PNG
             if png_bytes.startswith(b'\x89PNG'):
-                print("✓ Original PNG received successfully")
                 b64_string = base64.b64encode(png_bytes).decode('ascii')
                 return f"data:image/png;base64,{b64_string}"
             else:
-                 print(f"API returned 200 but content is not PNG (Prefix: {png_bytes[:10]})")
-                 return None
+                logger.warning('QR API returned 200 but content is not PNG (prefix: %r)', png_bytes[:10])
+                return None
             
         else:
-            print(f"API Error: {response.status_code} - {response.text}")
+            logger.warning('QR API error: %s - %.200s', response.status_code, response.text)
             return None
 
     except Exception as e:
-        print(f"Chyba pri získavaní PNG: {e}")
+        logger.warning('Chyba pri získavaní PNG: %s', e)
         return None
 
 
-def crc32_bsqr(data: bytes) -> int:
-    """
-    CRC32 podľa bsqr.co špecifikácie (XOR so štandardným CRC32).
-    """
-    import binascii
-    return binascii.crc32(data) & 0xFFFFFFFF
-
-
-def lzma_compress_bysquare(data: bytes) -> bytes:
-    """
-    LZMA kompresia podľa bysquare špecifikácie.
-    Používa LZMA1 s properties byte na začiatku.
-    """
-    # LZMA properties: lc=3, lp=0, pb=2 -> properties byte = (pb * 5 + lp) * 9 + lc = 93 = 0x5D
-    # Dict size = 128KB = 0x00020000 (little-endian)
-    lzma_props = b'\x5d\x00\x00\x02\x00'
-    
-    compressed = lzma.compress(
-        data,
-        format=lzma.FORMAT_RAW,
-        filters=[{
-            'id': lzma.FILTER_LZMA1,
-            'lc': 3,
-            'lp': 0,
-            'pb': 2,
-            'dict_size': 128 * 1024
-        }]
-    )
-    
-    # Vrátime properties + compressed data
-    return lzma_props + compressed
-
-
 def generate_pay_by_square_string(
     amount: float,
     iban: str,
@@ -137,100 +110,23 @@ def generate_pay_by_square_string(
     currency: str = 'EUR'
 ) -> str:
     """
-    Generuje PAY by square string podľa SBA špecifikácie v1.1.0
-    
-    Štruktúra dát (tab-separated):
-    0: InvoiceID (voliteľné)
-    1: Payments (počet platieb, vždy "1")
-    2: PaymentOptions (0=platba, 1=standing order, vždy "1" pre bežnú platbu)
-    3: Amount
-    4: CurrencyCode
-    5: PaymentDueDate (YYYYMMDD)
-    6: VariableSymbol
-    7: ConstantSymbol
-    8: SpecificSymbol
-    9: OriginatorsReferenceInformation (voliteľné)
-    10: PaymentNote
-    11: BankAccounts (počet účtov, vždy "1")
-    12: IBAN
-    13: BIC (SWIFT)
-    14: StandingOrderExt (0 = žiadne)
-    15: DirectDebitExt (0 = žiadne)
-    16: BeneficiaryName
-    17: BeneficiaryAddressLine1
-    18: BeneficiaryAddressLine2
+    Generuje PAY by square string podľa SBA špecifikácie v1.1.0.
+    Kódovanie zabezpečuje spoločný enkodér v utils.bysquare.
     """
-    # Očistíme IBAN od medzier
-    iban = iban.replace(' ', '').replace('-', '').upper()
-    
-    # Formátujeme sumu na 2 desatinné miesta
-    amount_str = f'{amount:.2f}'
-    
-    # Zostavíme dátový reťazec podľa špecifikácie
-    # Všetky polia oddelené tabulátormi
-    fields = [
-        '',                          # 0: InvoiceID
-        '1',                         # 1: Payments (počet)
-        '1',                         # 2: PaymentOptions (regular payment)
-        amount_str,                  # 3: Amount
-        currency,                    # 4: CurrencyCode
-        due_date,                    # 5: PaymentDueDate
-        variable_symbol,             # 6: VariableSymbol
-        constant_symbol,             # 7: ConstantSymbol  
-        specific_symbol,             # 8: SpecificSymbol
-        '',                          # 9: OriginatorsReferenceInformation
-        note[:140] if note else '',  # 10: PaymentNote (max 140)
-        '1',                         # 11: BankAccounts (počet)
-        iban,                        # 12: IBAN
-        swift.upper() if swift else '',  # 13: BIC
-        '0',                         # 14: StandingOrderExt
-        '0',                         # 15: DirectDebitExt
-        beneficiary_name[:70] if beneficiary_name else '',  # 16: BeneficiaryName
-        beneficiary_address_1[:70] if beneficiary_address_1 else '',  # 17
-        beneficiary_address_2[:70] if beneficiary_address_2 else '',  # 18
-    ]
-    
-    # Spojíme tabulátormi
-    data_string = '\t'.join(fields)
-    data_bytes = data_string.encode('utf-8')
-    
-    # Vypočítame CRC32
-    crc = crc32_bsqr(data_bytes)
-    
-    # LZMA kompresia
-    try:
-        compressed = lzma_compress_bysquare(data_bytes)
-    except Exception as e:
-        print(f"LZMA compression failed: {e}")
-        # Fallback - použijeme nekomprimované dáta s headerom
-        compressed = b'\x00\x00' + data_bytes
-    
-    # Zostavíme výsledný paket podľa bsqr.co špecifikácie:
-    # [2B header] + [4B CRC32 LE] + [LZMA compressed data with props]
-    
-    # Header: horných 4 bitov = 0 (typ pay by square), dolných 12 bitov = dĺžka v bajtoch
-    # Dĺžka = 2 (header) + 4 (CRC32) + len(compressed)
-    total_length = len(compressed)
-    
-    # Header je big-endian: [type:4bit][reserved:4bit][length:8bit] - celkom 16 bit
-    # Type 0 = PAY, length v bajtoch
-    header_value = (0x00 << 12) | (total_length & 0x0FFF)
-    header = struct.pack('>H', header_value)
-    
-    # CRC32 little-endian
-    crc_bytes = struct.pack('<I', crc)
-    
-    # Kompletný paket
-    packet = header + crc_bytes + compressed
-    
-    # Padding na násobok 5 pre Base32
-    padding_needed = (5 - (len(packet) % 5)) % 5
-    packet += b'\x00' * padding_needed
-    
-    # Base32 encoding (uppercase, bez paddingu =)
-    encoded = base64.b32encode(packet).decode('ascii').rstrip('=')
-    
-    return encoded
+    return encode_payment(
+        amount=amount,
+        iban=iban,
+        swift=swift,
+        variable_symbol=variable_symbol,
+        constant_symbol=constant_symbol,
+        specific_symbol=specific_symbol,
+        beneficiary_name=beneficiary_name,
+        beneficiary_address_1=beneficiary_address_1,
+        beneficiary_address_2=beneficiary_address_2,
+        note=note,
+        due_date=due_date,
+        currency=currency
+    )
 
 
 def generate_qr_code_base64(
@@ -268,11 +164,35 @@ def generate_qr_code_base64(
     )
     
     if qr_code:
-        print("✓ QR kód vygenerovaný pomocou externého API")
         return qr_code
     
     # Pokus 2: Lokálne generovanie (fallback)
-    print("⚠ Externé API nedostupné, používam lokálne generovanie")
+    logger.info('Externé API nedostupné, používam lokálne generovanie', extra={'sample_rate': 0.1})
+    return generate_qr_code_local(
+        amount=amount,
+        iban=iban,
+        swift=swift,
+        variable_symbol=variable_symbol,
+        constant_symbol=constant_symbol,
+        specific_symbol=specific_symbol,
+        note=note,
+        beneficiary_name=beneficiary_name,
+        due_date=due_date
+    )
+
+
+def generate_qr_code_local(
+    amount: float,
+    iban: str,
+    swift: str = '',
+    variable_symbol: str = '',
+    constant_symbol: str = '',
+    specific_symbol: str = '',
+    beneficiary_name: str = '',
+    note: str = '',
+    due_date: str = ''
+) -> Optional[str]:
+    """PAY by square QR kód generovaný lokálne (bez siete)"""
     try:
         from utils.helpers import generate_pay_by_square
         
@@ -294,15 +214,90 @@ def generate_qr_code_base64(
             beneficiary_name=beneficiary_name,
             due_date=due_date
         )
-        print("✓ QR kód vygenerovaný lokálne")
         return qr_data_uri
         
-    except Exception as e:
-        print(f"✗ Chyba pri lokálnom generovaní QR: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception('Chyba pri lokálnom generovaní QR')
         return None
 
+
+# ==============================================================================
+# QR KÓD FAKTÚRY Z CACHE
+# ==============================================================================
+
+# Kľúč = obsah platby - úprava faktúry (suma, VS, splatnosť, IBAN) dá nový kľúč
+QR_CACHE_TIMEOUT = 24 * 3600
+# Neúspešné generovanie sa skúsi znova po tejto dobe (s)
+QR_FAILURE_TIMEOUT = 60
+
+_qr_cache = get_cache('qr_codes', maxsize=2048, timeout=QR_CACHE_TIMEOUT)
+_warming = set()
+_warming_lock = threading.Lock()
+_executor = None
+
+
+def invoice_qr_params(invoice) -> Optional[dict]:
+    """Parametre PAY by square pre faktúru (None = faktúra sa neplatí prevodom)"""
+    supplier = invoice.supplier
+    if invoice.payment_method != 'prevod' or not supplier or not supplier.iban:
+        return None
+    return {
+        'amount': invoice.total,
+        'iban': supplier.iban,
+        'swift': supplier.swift or '',
+        'variable_symbol': invoice.variable_symbol or '',
+        'beneficiary_name': supplier.name,
+        'due_date': invoice.due_date.strftime('%Y%m%d') if invoice.due_date else '',
+    }
+
+
+def _generate_and_store(key, params):
+    value = generate_qr_code_base64(**params)
+    _qr_cache.set(key, value, timeout=None if value else QR_FAILURE_TIMEOUT)
+    return value
+
+
+def _warm(key, params):
+    try:
+        _generate_and_store(key, params)
+    except Exception:
+        logger.exception('Chyba pri generovaní QR kódu na pozadí')
+    finally:
+        with _warming_lock:
+            _warming.discard(key)
+
+
+def _warm_in_background(key, params):
+    global _executor
+    with _warming_lock:
+        if key in _warming:
+            return
+        _warming.add(key)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='qr-warm')
+    _executor.submit(_warm, key, params)
+
+
+def get_invoice_qr_code(invoice, blocking: bool = True) -> Optional[str]:
+    """
+    QR kód faktúry z cache. Pri miss s blocking=True ho vygeneruje (externé API,
+    fallback lokálne); s blocking=False nikdy nečaká na sieť - vráti lokálne
+    vygenerovaný kód a externý sa do cache dotiahne na pozadí.
+    """
+    params = invoice_qr_params(invoice)
+    if params is None:
+        return None
+    key = tuple(sorted(params.items()))
+    value = _qr_cache.get(key)
+    if value is not MISSING:
+        return value
+    if blocking:
+        return _generate_and_store(key, params)
+    _warm_in_background(key, params)
+    return generate_qr_code_local(**params)
+
+
+@timed('qr')
 def generate_sepa_qr(
     amount: float,
     iban: str,
@@ -336,6 +331,7 @@ def generate_sepa_qr(
         
         data = '\n'.join(lines)
         
+        import qrcode
         qr = qrcode.QRCode(
             version=None,
             error_correction=qrcode.constants.ERROR_CORRECT_M,
@@ -355,5 +351,5 @@ def generate_sepa_qr(
         return f'data:image/png;base64,{b64_string}'
         
     except Exception as e:
-        print(f'Chyba pri generovaní SEPA QR: {e}')
+        logger.error('Chyba pri generovaní SEPA QR: %s', e)
         return None
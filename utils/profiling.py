@@ -0,0 +1,242 @@
+"""
+Profilovanie produkčných requestov na požiadanie
+Admin pridá k URL ?_profile=1 (cProfile -> .prof) alebo ?_profile=sample
+(vzorkovací profiler -> speedscope JSON), prípadne hlavičku X-Profile.
+Profil sa uloží na disk, jeho názov príde v hlavičke X-Profile-Id
+a stiahne sa cez /admin/profiles/<názov>.
+
+Ochrana:
+- len prihlásený admin (ADMIN_EMAILS)
+- max. jeden profil na používateľa za PROFILING_MIN_INTERVAL sekúnd
+- max. PROFILING_MAX_PER_HOUR profilov za hodinu na proces
+- na disku sa drží len PROFILING_MAX_FILES najnovších súborov
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import abort, g, jsonify, request, send_from_directory
+from flask_login import current_user
+
+
+SAMPLE_INTERVAL = 0.001  # s
+_SAFE_NAME = re.compile(r'^[\w.-]+\.(prof|speedscope\.json)$')
+
+
+class ProfilingRateLimiter:
+    """Limit počtu profilov na používateľa a na proces"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._last_by_user = {}
+            self._recent = deque()
+
+    def allow(self, user_key, min_interval=30, max_per_hour=20) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 3600:
+                self._recent.popleft()
+            if len(self._recent) >= max_per_hour:
+                return False
+            last = self._last_by_user.get(user_key)
+            if last is not None and now - last < min_interval:
+                return False
+            self._last_by_user[user_key] = now
+            self._recent.append(now)
+            return True
+
+
+class SamplingProfiler:
+    """Vzorkuje zásobník jedného vlákna (sys._current_frames), výstup pre speedscope"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self._frame_ids = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def _frame_id(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return frame_id
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def to_speedscope(self, name):
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+            'name': name,
+            'exporter': 'fakturask',
+        }
+
+
+rate_limiter = ProfilingRateLimiter()
+
+
+def _requested_mode():
+    value = request.args.get('_profile') or request.headers.get('X-Profile')
+    if not value:
+        return None
+    return 'sample' if value == 'sample' else 'cprofile'
+
+
+def _prune(directory, keep):
+    files = sorted(
+        (entry for entry in os.scandir(directory) if _SAFE_NAME.match(entry.name)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    for entry in files[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def init_profiling(app):
+    """Zapne profilovanie requestov na požiadanie pre adminov"""
+    if not app.config.get('PROFILING_ENABLED', True):
+        return
+
+    def profile_dir():
+        return app.config.get('PROFILING_DIR') or os.path.join(tempfile.gettempdir(), 'fakturask_profiles')
+
+    def is_admin():
+        return current_user.is_authenticated and current_user.is_admin
+
+    @app.before_request
+    def start_profiling():
+        mode = _requested_mode()
+        if mode is None or not is_admin():
+            return
+        allowed = rate_limiter.allow(
+            current_user.id,
+            min_interval=app.config.get('PROFILING_MIN_INTERVAL', 30),
+            max_per_hour=app.config.get('PROFILING_MAX_PER_HOUR', 20),
+        )
+        if not allowed:
+            app.logger.warning(f'Profiling rate limit: user {current_user.id} {request.path}')
+            return
+        if mode == 'sample':
+            profiler = SamplingProfiler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Iný profiler (napr. coverage/py-spy) už beží
+                app.logger.warning('Profiling skipped: another profiler is active')
+                return
+        g._profiler = (mode, profiler)
+
+    @app.after_request
+    def finish_profiling(response):
+        active = g.pop('_profiler', None)
+        if active is None:
+            return response
+        mode, profiler = active
+        endpoint = request.endpoint or 'unknown'
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{endpoint}-u{current_user.id}-{os.getpid()}"
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+
+        if mode == 'sample':
+            profiler.stop()
+            name += '.speedscope.json'
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                json.dump(profiler.to_speedscope(f'{request.method} {request.path}'), f)
+        else:
+            profiler.disable()
+            name += '.prof'
+            profiler.dump_stats(os.path.join(directory, name))
+
+        _prune(directory, app.config.get('PROFILING_MAX_FILES', 50))
+        response.headers['X-Profile-Id'] = name
+        app.logger.info(f'Profile stored: {name}')
+        return response
+
+    @app.teardown_request
+    def abort_profiling(exc=None):
+        # Výnimka pred after_request - profiler nesmie ostať zapnutý
+        active = g.pop('_profiler', None)
+        if active is not None:
+            mode, profiler = active
+            if mode == 'sample':
+                profiler.stop()
+            else:
+                profiler.disable()
+
+    @app.route('/admin/profiles')
+    def admin_profiles():
+        """Zoznam uložených profilov (len admin)"""
+        if not is_admin():
+            abort(404)
+        directory = profile_dir()
+        if not os.path.isdir(directory):
+            return jsonify({'profiles': []})
+        profiles = [
+            {'name': entry.name, 'size': entry.stat().st_size,
+             'created': datetime.fromtimestamp(entry.stat().st_mtime).isoformat(timespec='seconds')}
+            for entry in os.scandir(directory) if _SAFE_NAME.match(entry.name)
+        ]
+        profiles.sort(key=lambda p: p['created'], reverse=True)
+        return jsonify({'profiles': profiles})
+
+    @app.route('/admin/profiles/<name>')
+    def admin_profile_download(name):
+        """Stiahnutie profilu (.prof pre pstats/snakeviz, .speedscope.json pre speedscope.app)"""
+        if not is_admin() or not _SAFE_NAME.match(name):
+            abort(404)
+        return send_from_directory(profile_dir(), name, as_attachment=True)
@@ -0,0 +1,107 @@
+"""
+Verejná stránka faktúry - cache vyrenderovaného HTML
+Stránka sa mení len so zmenou faktúry, jej položiek, dodávateľa či klienta.
+Revízia (ETag) je odtlačok práve tých stĺpcov, ktoré šablóna zobrazuje
+(bez počítadiel zobrazení), takže HTML sa renderuje a QR generuje raz
+na revíziu a podmienený request dostane 304 bez renderovania.
+
+Cache-Control dovoľuje cache na CDN (URL obsahuje tajný token, rovnaký
+obsah pre všetkých). Zobrazenia sa preto nepočítajú pri HTML, ale cez
+beacon endpoint (utils.invoice_views).
+"""
+import hashlib
+import os
+
+from flask import current_app
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import db, Invoice
+from utils.cache import get_cache
+
+TEMPLATE = 'invoice_public.html'
+
+# Stĺpce, ktoré stránka nezobrazuje a menia sa pri každom zobrazení
+_IGNORED_COLUMNS = frozenset({'view_count', 'first_viewed_at', 'last_viewed_at', 'updated_at'})
+
+_pages = get_cache('public_invoice_pages', maxsize=1024)
+_template_mtime = None
+
+
+def load_public_invoice(token):
+    """Faktúra podľa verejného tokenu so všetkým, čo stránka zobrazuje (2 dotazy)"""
+    return Invoice.query.options(
+        joinedload(Invoice.supplier), joinedload(Invoice.client), selectinload(Invoice.items)
+    ).filter_by(public_token=token).first()
+
+
+def _columns(obj):
+    if obj is None:
+        return ()
+    return tuple(
+        (attr.key, getattr(obj, attr.key))
+        for attr in inspect(type(obj)).column_attrs
+        if not attr.deferred and attr.key not in _IGNORED_COLUMNS
+    )
+
+
+def _template_version():
+    global _template_mtime
+    if _template_mtime is None:
+        try:
+            _template_mtime = os.path.getmtime(os.path.join(current_app.root_path, current_app.template_folder, TEMPLATE))
+        except OSError:
+            _template_mtime = 0
+    return _template_mtime
+
+
+def invoice_revision(invoice) -> str:
+    """ETag stránky - odtlačok zobrazovaných údajov"""
+    parts = (
+        _template_version(),
+        _columns(invoice),
+        _columns(invoice.supplier),
+        _columns(invoice.client),
+        tuple(_columns(item) for item in invoice.items),
+        # Neuhradená faktúra sa po splatnosti zobrazí ako po splatnosti
+        invoice.is_overdue,
+    )
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def last_modified(invoice):
+    return invoice.updated_at or invoice.created_at
+
+
+def render_cached(token, revision, render):
+    """HTML z cache podľa (token, revízia), inak render() a uloženie"""
+    timeout = current_app.config.get('PUBLIC_PAGE_CACHE_TTL', 600)
+    if not timeout:
+        return render()
+    return _pages.get_or_set((token, revision), render, timeout)
+
+
+def cache_control() -> str:
+    """Hlavička Cache-Control pre CDN a prehliadač"""
+    max_age = current_app.config.get('PUBLIC_PAGE_MAX_AGE', 60)
+    shared_max_age = current_app.config.get('PUBLIC_PAGE_CDN_MAX_AGE', 300)
+    return f'public, max-age={max_age}, s-maxage={shared_max_age}, stale-while-revalidate=60'
+
+
+def clear_page_cache():
+    _pages.clear()
+
+
+# ==============================================================================
+# BEACON - token -> id faktúry bez načítania celej faktúry
+# ==============================================================================
+
+_token_ids = get_cache('public_invoice_tokens', maxsize=10000, timeout=300)
+
+
+def invoice_id_for_token(token):
+    """Id faktúry podľa verejného tokenu (negatívne výsledky sa tiež cachujú)"""
+    return _token_ids.get_or_set(
+        token,
+        lambda: db.session.scalar(select(Invoice.id).where(Invoice.public_token == token)),
+    )
@@ -0,0 +1,230 @@
+"""
+Generovanie faktúr z pravidelných šablón (RecurringInvoice)
+Spúšťa sa z cronu (`flask generate-recurring`) alebo lokálnym plánovačom
+(RECURRING_SCHEDULER_ENABLED).
+
+- splatné šablóny sa vyberajú jedným dotazom nad indexom ix_recurring_due
+  (is_active AND next_generate_date <= dnes), po dávkach podľa id
+- zmeškané obdobia sa dobehnú (max. max_periods faktúr na šablónu za beh)
+- faktúry, položky a ActivityLog idú bulk INSERT-om, čísla po blokoch
+  na dodávateľa a rok, dávka + posun next_generate_date = jedna transakcia
+- idempotentné: faktúra nesie (recurring_invoice_id, recurring_period)
+  s unikátnym indexom, existujúce obdobia sa preskočia - opakovaný beh
+  po páde nič nezdvojí
+- súbežné behy (viac workerov, cron + plánovač) sa na PostgreSQL
+  vyhnú cez FOR UPDATE SKIP LOCKED
+"""
+import json
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, utcnow, Invoice, RecurringInvoice, Supplier
+from utils.bulk_invoices import insert_invoice_batch, invoice_totals, parse_items
+from utils.invoice_numbering import allocate_invoice_numbers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+# Max. počet dobiehaných období na šablónu za jeden beh
+MAX_CATCHUP_PERIODS = 36
+
+
+def due_periods(template, today: date, max_periods: int = MAX_CATCHUP_PERIODS):
+    """Obdobia na vygenerovanie (od next_generate_date po dnes) a nasledujúci dátum generovania"""
+    period = template.next_generate_date or template.start_date
+    periods = []
+    while period <= today and len(periods) < max_periods:
+        if template.end_date and period > template.end_date:
+            break
+        periods.append(period)
+        period = template.get_next_date(period)
+    return periods, period
+
+
+def _due_templates(today, after_id, batch_size):
+    return (
+        select(RecurringInvoice)
+        .where(
+            RecurringInvoice.is_active == True,  # noqa: E712 - porovnanie (nie IS) kvôli indexu
+            RecurringInvoice.next_generate_date <= today,
+            RecurringInvoice.id > after_id,
+        )
+        .order_by(RecurringInvoice.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def _generate_batch(session, templates, today, max_periods, report):
+    now = utcnow()
+    suppliers = {}
+    for supplier in session.scalars(
+        select(Supplier).where(Supplier.user_id.in_({t.user_id for t in templates})).order_by(Supplier.id)
+    ):
+        suppliers.setdefault(supplier.user_id, supplier)
+
+    earliest = min(t.next_generate_date for t in templates)
+    existing = set(session.execute(
+        select(Invoice.recurring_invoice_id, Invoice.recurring_period).where(
+            Invoice.recurring_invoice_id.in_([t.id for t in templates]),
+            Invoice.recurring_period >= earliest,
+        )
+    ).all())
+
+    pending = []  # (šablóna, dodávateľ, obdobie, položky)
+    for template in templates:
+        report['templates'] += 1
+        supplier = suppliers.get(template.user_id)
+        try:
+            if supplier is None:
+                raise ValueError('používateľ nemá nastaveného dodávateľa')
+            items = parse_items(json.loads(template.items_json or '[]'))
+        except (AttributeError, TypeError, ValueError) as e:
+            report['errors'].append({'recurring_invoice_id': template.id, 'error': str(e)})
+            continue
+
+        periods, next_date = due_periods(template, today, max_periods)
+        for period in periods:
+            if (template.id, period) in existing:
+                report['skipped_existing'] += 1
+            else:
+                pending.append((template, supplier, period, items))
+
+        template.next_generate_date = next_date
+        template.last_generated_at = now
+        if template.end_date and next_date > template.end_date:
+            template.is_active = False
+            report['deactivated'] += 1
+
+    # Čísla po blokoch - jeden príkaz na (dodávateľ, rok obdobia)
+    groups = {}
+    for entry in pending:
+        groups.setdefault((entry[1].id, entry[2].year), []).append(entry)
+    rows = []
+    for (_, year), entries in groups.items():
+        numbers = allocate_invoice_numbers(entries[0][1], len(entries), year=year, session=session)
+        for number, (template, supplier, period, items) in zip(numbers, entries):
+            vat_rate = template.vat_rate or 0.0
+            subtotal, vat_amount, total = invoice_totals(items, vat_rate)
+            rows.append({
+                'user_id': template.user_id,
+                'invoice_number': number,
+                'variable_symbol': number.replace('/', ''),
+                'supplier_id': supplier.id,
+                'client_id': template.client_id,
+                'issue_date': period,
+                'delivery_date': period,
+                'due_date': period + timedelta(days=template.days_until_due or 14),
+                'payment_method': template.payment_method or Invoice.PAYMENT_TRANSFER,
+                'vat_rate': vat_rate,
+                'note': template.note or '',
+                'internal_note': '',
+                'subtotal': subtotal,
+                'vat_amount': vat_amount,
+                'total': total,
+                'recurring_invoice_id': template.id,
+                'recurring_period': period,
+                'items': items,
+                'log_description': f'Faktúra {number} vygenerovaná zo šablóny {template.name}',
+                'log_extra': {'recurring_invoice_id': template.id, 'period': period.isoformat()},
+            })
+
+    if rows:
+        insert_invoice_batch(session, rows)
+    report['created'] += len(rows)
+
+
+def generate_recurring_invoices(today: Optional[date] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                                max_periods: int = MAX_CATCHUP_PERIODS, dry_run: bool = False,
+                                session=None) -> Dict[str, Any]:
+    """
+    Vygeneruje faktúry všetkých splatných šablón.
+    Vráti report: templates, created, skipped_existing, deactivated, conflicts, batches, errors.
+    """
+    session = session or db.session
+    today = today or date.today()
+    report = {'templates': 0, 'created': 0, 'skipped_existing': 0, 'deactivated': 0,
+              'conflicts': 0, 'batches': 0, 'errors': []}
+
+    after_id = 0
+    while True:
+        templates = session.scalars(_due_templates(today, after_id, batch_size)).all()
+        if not templates:
+            break
+        after_id = templates[-1].id
+        snapshot = {key: list(value) if isinstance(value, list) else value for key, value in report.items()}
+        try:
+            _generate_batch(session, templates, today, max_periods, report)
+            if dry_run:
+                session.rollback()
+            else:
+                session.commit()
+        except IntegrityError:
+            # Súbežný beh už tieto obdobia vygeneroval - dávku prenecháme jemu
+            session.rollback()
+            report.update(snapshot)
+            report['conflicts'] += 1
+        except Exception:
+            session.rollback()
+            raise
+        report['batches'] += 1
+    return report
+
+
+# ==============================================================================
+# LOKÁLNY PLÁNOVAČ
+# ==============================================================================
+
+class RecurringScheduler:
+    """Generovanie v pozadí každých `interval` sekúnd (pre nasadenia bez cronu)"""
+
+    def __init__(self, app, interval: int = 3600):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                report = generate_recurring_invoices()
+                if report['created'] or report['errors']:
+                    logger.info('Recurring invoices: %d created from %d templates, %d errors',
+                                report['created'], report['templates'], len(report['errors']))
+                return report
+            except Exception:
+                logger.exception('Recurring invoice generation failed')
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        # Prvý beh chvíľu po štarte, aby nebrzdil nábeh aplikácie
+        if self._stop.wait(min(60, self.interval)):
+            return
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='recurring-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def init_recurring_scheduler(app) -> Optional[RecurringScheduler]:
+    """Spustí lokálny plánovač, ak je zapnutý (RECURRING_SCHEDULER_ENABLED)"""
+    if not app.config.get('RECURRING_SCHEDULER_ENABLED', False) or app.config.get('TESTING'):
+        return None
+    scheduler = RecurringScheduler(app, app.config.get('RECURRING_INTERVAL', 3600))
+    scheduler.start()
+    return scheduler
@@ -5,6 +5,7 @@ Modern, grid-based layout with strict font enforcement.
 import io
 import os
 import base64
+import logging
 from datetime import datetime
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -21,6 +22,8 @@ PRIMARY_COLOR = colors.HexColor('#1e40af')  # Blue
 TEXT_COLOR = colors.HexColor('#1e293b')     # Dark Gray/Slate
 BORDER_COLOR = colors.HexColor('#e2e8f0')   # Light Gray
 
+logger = logging.getLogger(__name__)
+
 def register_fonts():
     """
     Registers the bundled Arial fonts.
@@ -32,8 +35,7 @@ def register_fonts():
     regular = os.path.join(font_dir, 'Arial.ttf')
     bold = os.path.join(font_dir, 'Arial-Bold.ttf')
     
-    # Debug info
-    print(f"DEBUG: Registering fonts from {font_dir}")
+    logger.debug('Registering fonts from %s', font_dir)
     
     if not os.path.exists(regular):
         raise FileNotFoundError(f"Missing font: {regular}")
@@ -373,8 +375,7 @@ def generate_invoice_pdf_reportlab(invoice, qr_code_base64=None):
         # Fallback: Generate a simple PDF with the error message
         import traceback
         error_trace = traceback.format_exc()
-        print(f"PDF GENERATION ERROR: {e}")
-        print(error_trace)
+        logger.exception('PDF generation error')
         
         buffer = io.BytesIO()
         c = canvas.Canvas(buffer, pagesize=A4)
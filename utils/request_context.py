@@ -0,0 +1,81 @@
+"""
+Kontext requestu - dodávateľ prihláseného používateľa
+Načíta sa raz na request (flask.g) a zdieľajú ho routy, šablóny
+(current_supplier) aj PDF/email (invoice.supplier je vďaka identity map
+ten istý objekt, bez ďalšieho SELECT-u).
+
+Predvolene platí cache len v rámci requestu. Cache naprieč requestami je
+voliteľný (SUPPLIER_CACHE_TTL > 0): uloží sa len snímka stĺpcov bez obrázkov,
+počítadla faktúr a platobných údajov, objekt sa do session pripojí bez dotazu.
+Zmena nastavení volá invalidate_supplier(); ostatné gunicorn workery vidia
+zmenu najneskôr po TTL - okrem IBAN/SWIFT/banky, tie sa čítajú vždy z databázy.
+"""
+from flask import current_app, g, has_request_context
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.local import LocalProxy
+
+from models import db, Supplier
+from utils.cache import LRUCache, MISSING
+
+
+# Stĺpce, ktoré sa nikdy neberú z cache - počítadlo mení číslovanie faktúr,
+# platobné údaje idú do QR kódu a na faktúru a nesmú byť zastarané
+_VOLATILE_COLUMNS = frozenset({'next_invoice_number', 'bank_name', 'iban', 'swift'})
+
+_supplier_cache = LRUCache(maxsize=4096)
+
+
+def _snapshot(supplier):
+    """Hodnoty necachovaných stĺpcov (bez odložených obrázkov)"""
+    return {
+        attr.key: getattr(supplier, attr.key)
+        for attr in inspect(Supplier).column_attrs
+        if not attr.deferred and attr.key not in _VOLATILE_COLUMNS
+    }
+
+
+def _attach(values):
+    """Vytvorí perzistentný objekt zo snímky bez SQL (chýbajúce stĺpce sa dočítajú pri prístupe)"""
+    supplier = Supplier(**values)
+    make_transient_to_detached(supplier)
+    return db.session.merge(supplier, load=False)
+
+
+def load_supplier(user_id):
+    """Dodávateľ používateľa - z cache (ak je zapnutý) alebo z databázy"""
+    ttl = current_app.config.get('SUPPLIER_CACHE_TTL', 0)
+    if ttl:
+        values = _supplier_cache.get(user_id)
+        if values is not MISSING:
+            return _attach(values) if values is not None else None
+
+    supplier = Supplier.query.filter_by(user_id=user_id).first()
+    if ttl:
+        _supplier_cache.set(user_id, _snapshot(supplier) if supplier else None, timeout=ttl)
+    return supplier
+
+
+def get_current_supplier():
+    """Dodávateľ prihláseného používateľa, načítaný raz na request"""
+    if not has_request_context() or not current_user.is_authenticated:
+        return None
+    if '_current_supplier' not in g:
+        g._current_supplier = load_supplier(current_user.id)
+    return g._current_supplier
+
+
+def invalidate_supplier(user_id):
+    """Zahodí dodávateľa z cache (po uložení nastavení, pečiatky...)"""
+    _supplier_cache.delete(user_id)
+    if has_request_context():
+        g.pop('_current_supplier', None)
+
+
+def clear_supplier_cache():
+    _supplier_cache.clear()
+
+
+# Pre šablóny: {{ current_supplier.name }}
+current_supplier = LocalProxy(get_current_supplier)
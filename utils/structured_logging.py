@@ -0,0 +1,157 @@
+"""
+Štruktúrované logovanie
+Jeden handler pre celú aplikáciu (app.logger aj loggery v utils/):
+- JSON alebo textový výstup (LOG_FORMAT)
+- úrovne per logger (LOG_LEVELS="utils.pay_by_square=WARNING,app=DEBUG")
+- vzorkovanie častých udalostí (LOG_SAMPLE_RATES="utils.company_lookup=0.1"
+  alebo extra={'sample_rate': 0.01} pri konkrétnom volaní); WARNING a vyššie
+  sa vzorkujú len pri explicitnom sample_rate
+- korelačné ID requestu (X-Request-ID) a ID používateľa v každom zázname
+
+Správy používajú lenivé formátovanie loggingu:
+    logger.debug('Loaded %d invoices', len(invoices))
+"""
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+
+_HANDLER_NAME = 'fakturask'
+# Hlavička s korelačným ID (prevezme sa od proxy, inak sa vygeneruje)
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Polia LogRecord, ktoré nie sú "extra" dáta volajúceho
+_RESERVED = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _parse_mapping(value, cast):
+    """'a=1,b=2' -> {'a': cast('1'), 'b': cast('2')}"""
+    if isinstance(value, dict):
+        return {name: cast(v) for name, v in value.items()}
+    result = {}
+    for part in (value or '').split(','):
+        name, _, v = part.partition('=')
+        if name.strip() and v.strip():
+            result[name.strip()] = cast(v.strip())
+    return result
+
+
+class RequestContextFilter(logging.Filter):
+    """Doplní request_id a user_id z aktuálneho requestu"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user_id = g.get('_login_user').get_id() if g.get('_login_user') else None
+        else:
+            record.request_id = None
+            record.user_id = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Prepustí len časť záznamov (podľa loggera alebo extra sample_rate)"""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def _rate_for(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None:
+            return rate
+        if record.levelno >= logging.WARNING:
+            return 1.0
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        rate = self._rate_for(record)
+        record.sample_rate = rate
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Jeden JSON objekt na riadok"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and value is not None and not key.startswith('_'):
+                entry[key] = value
+        if entry.get('sample_rate') == 1.0:
+            del entry['sample_rate']
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Čitateľný výstup pre vývoj, korelačné ID na konci riadku"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        request_id = getattr(record, 'request_id', None)
+        return f'{line} [{request_id}]' if request_id else line
+
+
+def configure_logging(level='INFO', fmt='text', levels=None, sample_rates=None, stream=None):
+    """Nastaví handler na root loggeri (idempotentne - pri opakovanom volaní ho nahradí)"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if handler.get_name() == _HANDLER_NAME:
+            root.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.set_name(_HANDLER_NAME)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(SamplingFilter(_parse_mapping(sample_rates, float)))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    for name, logger_level in _parse_mapping(levels, str.upper).items():
+        logging.getLogger(name).setLevel(logger_level)
+    return handler
+
+
+def init_logging(app):
+    """Napojí app.logger na spoločný handler a zapne korelačné ID requestov"""
+    from flask.logging import default_handler
+
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)
+    configure_logging(
+        level=app.config.get('LOG_LEVEL', 'INFO'),
+        fmt=app.config.get('LOG_FORMAT', 'text'),
+        levels=app.config.get('LOG_LEVELS'),
+        sample_rates=app.config.get('LOG_SAMPLE_RATES'),
+    )
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming[:64] if incoming.isprintable() and incoming else uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
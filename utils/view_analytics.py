@@ -0,0 +1,269 @@
+"""
+Analytika zobrazení faktúr
+Surové záznamy (invoice_views) sa inkrementálne zhrnú do agregátov:
+- invoice_view_daily - zobrazenia a unikátni diváci faktúry za deň (UTC)
+- user_view_daily - to isté za všetky faktúry používateľa
+- invoice_viewers - unikátni diváci faktúry (hash IP + prehliadača)
+- invoice_view_stats - súčty faktúry + čas od odoslania po prvé otvorenie
+
+rollup_views() spracuje len záznamy za posledným spracovaným id
+(analytics_state) po dávkach, dotknuté dni prepočíta zo surových dát,
+takže opakovaný beh je idempotentný. Id sa prideľujú pri INSERT-e, ale
+commitujú sa v inom poradí (viac workerov) - záznam s nižším id môže byť
+viditeľný až po posunutí značky. Každý beh preto znova prejde aj už
+spracované záznamy zobrazené od predchádzajúceho behu mínus ROLLUP_LAG.
+purge_raw_views() potom maže surové záznamy staršie ako
+INVOICE_VIEWS_RETENTION_DAYS - len už spracované.
+Spúšťa sa z cronu (`flask rollup-views [--purge]`).
+
+Detail faktúry číta len agregáty (invoice_view_summary).
+"""
+import hashlib
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import Date, delete, distinct, func, insert, literal, select
+
+from models import (db, utcnow, ActivityLog, AnalyticsState, Invoice, InvoiceView, InvoiceViewDaily,
+                    InvoiceViewer, InvoiceViewStats, UserViewDaily)
+
+ROLLUP_STATE = 'invoice_views_rollup'
+# Začiatok posledného behu (minúty od epochy, UTC) - odtiaľ mínus ROLLUP_LAG sa prechádza znova
+ROLLUP_RUN_STATE = 'invoice_views_rollup_run'
+ROLLUP_LAG = timedelta(minutes=10)
+DEFAULT_BATCH_SIZE = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def viewer_hash(ip_address, user_agent) -> str:
+    return hashlib.sha1(f"{ip_address or ''}|{user_agent or ''}".encode('utf-8')).hexdigest()
+
+
+def _state(session, name, lock=False):
+    stmt = select(AnalyticsState).where(AnalyticsState.name == name)
+    if lock:
+        stmt = stmt.with_for_update()
+    state = session.scalar(stmt)
+    if state is None:
+        state = AnalyticsState(name=name, value=0)
+        session.add(state)
+    return state
+
+
+def _day_bounds(day):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _rollup_daily(session, day, invoice_ids):
+    """Prepočíta denné agregáty faktúr za deň zo surových záznamov"""
+    start, end = _day_bounds(day)
+    viewer = func.coalesce(InvoiceView.ip_address, '') + '|' + func.coalesce(InvoiceView.user_agent, '')
+    session.execute(delete(InvoiceViewDaily).where(
+        InvoiceViewDaily.day == day, InvoiceViewDaily.invoice_id.in_(invoice_ids)
+    ))
+    session.execute(insert(InvoiceViewDaily).from_select(
+        ['invoice_id', 'day', 'user_id', 'views', 'unique_viewers'],
+        select(InvoiceView.invoice_id, literal(day, Date), Invoice.user_id, func.count(), func.count(distinct(viewer)))
+        .join(Invoice, Invoice.id == InvoiceView.invoice_id)
+        .where(InvoiceView.invoice_id.in_(invoice_ids), InvoiceView.viewed_at >= start, InvoiceView.viewed_at < end)
+        .group_by(InvoiceView.invoice_id, Invoice.user_id)
+    ))
+
+
+def _rollup_user_daily(session, day, user_ids):
+    session.execute(delete(UserViewDaily).where(UserViewDaily.day == day, UserViewDaily.user_id.in_(user_ids)))
+    session.execute(insert(UserViewDaily).from_select(
+        ['user_id', 'day', 'views', 'unique_viewers', 'invoices_viewed'],
+        select(InvoiceViewDaily.user_id, literal(day, Date), func.sum(InvoiceViewDaily.views),
+               func.sum(InvoiceViewDaily.unique_viewers), func.count())
+        .where(InvoiceViewDaily.day == day, InvoiceViewDaily.user_id.in_(user_ids))
+        .group_by(InvoiceViewDaily.user_id)
+    ))
+
+
+def _rollup_batch(session, rows):
+    owners = dict(session.execute(
+        select(Invoice.id, Invoice.user_id).where(Invoice.id.in_({row.invoice_id for row in rows}))
+    ).all())
+    rows = [row for row in rows if row.invoice_id in owners]  # zmazané faktúry sa preskočia
+    if not rows:
+        return 0
+    invoice_ids = {row.invoice_id for row in rows}
+
+    days = {}
+    for row in rows:
+        days.setdefault(row.viewed_at.date(), set()).add(row.invoice_id)
+    for day, ids in sorted(days.items()):
+        _rollup_daily(session, day, ids)
+        _rollup_user_daily(session, day, {owners[invoice_id] for invoice_id in ids})
+
+    # Unikátni diváci - noví sa vložia, oneskorený skorší záznam posunie first_seen
+    known = {(viewer.invoice_id, viewer.viewer_hash): viewer for viewer in session.scalars(
+        select(InvoiceViewer).where(InvoiceViewer.invoice_id.in_(invoice_ids))
+    )}
+    new_viewers = {}
+    for row in rows:
+        key = (row.invoice_id, viewer_hash(row.ip_address, row.user_agent))
+        viewer = known.get(key)
+        if viewer is not None:
+            viewer.first_seen = min(viewer.first_seen, row.viewed_at)
+        elif key not in new_viewers or row.viewed_at < new_viewers[key]:
+            new_viewers[key] = row.viewed_at
+    if new_viewers:
+        session.execute(insert(InvoiceViewer), [
+            {'invoice_id': invoice_id, 'viewer_hash': digest, 'first_seen': first_seen}
+            for (invoice_id, digest), first_seen in new_viewers.items()
+        ])
+
+    # Súčty faktúr
+    views = dict(session.execute(
+        select(InvoiceViewDaily.invoice_id, func.sum(InvoiceViewDaily.views))
+        .where(InvoiceViewDaily.invoice_id.in_(invoice_ids)).group_by(InvoiceViewDaily.invoice_id)
+    ).all())
+    viewers = {invoice_id: (count, first) for invoice_id, count, first in session.execute(
+        select(InvoiceViewer.invoice_id, func.count(), func.min(InvoiceViewer.first_seen))
+        .where(InvoiceViewer.invoice_id.in_(invoice_ids)).group_by(InvoiceViewer.invoice_id)
+    )}
+    sent = dict(session.execute(
+        select(ActivityLog.invoice_id, func.min(ActivityLog.created_at))
+        .where(ActivityLog.action == ActivityLog.ACTION_INVOICE_SENT, ActivityLog.invoice_id.in_(invoice_ids))
+        .group_by(ActivityLog.invoice_id)
+    ).all())
+    stats = {s.invoice_id: s for s in session.scalars(
+        select(InvoiceViewStats).where(InvoiceViewStats.invoice_id.in_(invoice_ids))
+    )}
+
+    for invoice_id in invoice_ids:
+        stat = stats.get(invoice_id)
+        if stat is None:
+            stat = InvoiceViewStats(invoice_id=invoice_id, user_id=owners[invoice_id])
+            session.add(stat)
+        invoice_rows = [row.viewed_at for row in rows if row.invoice_id == invoice_id]
+        stat.views = views.get(invoice_id, 0)
+        stat.unique_viewers, stat.first_viewed_at = viewers.get(invoice_id, (0, None))
+        stat.last_viewed_at = max(filter(None, [stat.last_viewed_at, *invoice_rows]))
+        stat.sent_at = stat.sent_at or sent.get(invoice_id)
+        if stat.sent_at:
+            opened = [viewed_at for viewed_at in invoice_rows if viewed_at >= stat.sent_at]
+            if opened:
+                seconds = int((min(opened) - stat.sent_at).total_seconds())
+                if stat.first_open_seconds is None or seconds < stat.first_open_seconds:
+                    stat.first_open_seconds = seconds
+    return len(rows)
+
+
+_ROW_COLUMNS = (InvoiceView.id, InvoiceView.invoice_id, InvoiceView.viewed_at,
+                InvoiceView.ip_address, InvoiceView.user_agent)
+
+
+def _rescan(session, batch_size, since, watermark, report):
+    """Znova prejde spracované záznamy zobrazené od `since` (zachytí oneskorené commity)"""
+    cursor = 0
+    while True:
+        try:
+            rows = session.execute(
+                select(*_ROW_COLUMNS)
+                .where(InvoiceView.id > cursor, InvoiceView.id <= watermark, InvoiceView.viewed_at >= since)
+                .order_by(InvoiceView.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            report['rescanned'] += _rollup_batch(session, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        cursor = rows[-1].id
+
+
+def rollup_views(batch_size: int = DEFAULT_BATCH_SIZE, session=None,
+                 now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Zhrnie nové zobrazenia do agregátov (každá dávka = jedna transakcia).
+    report['rows'] = nové záznamy, report['rescanned'] = znova prejdené v okne ROLLUP_LAG.
+    """
+    session = session or db.session
+    report = {'rows': 0, 'batches': 0, 'rescanned': 0}
+    started = now or utcnow()
+
+    last_run = _state(session, ROLLUP_RUN_STATE).value
+    if last_run:
+        since = _EPOCH + timedelta(minutes=last_run) - ROLLUP_LAG
+        _rescan(session, batch_size, since, _state(session, ROLLUP_STATE).value, report)
+
+    while True:
+        try:
+            state = _state(session, ROLLUP_STATE, lock=True)
+            rows = session.execute(
+                select(*_ROW_COLUMNS)
+                .where(InvoiceView.id > state.value).order_by(InvoiceView.id).limit(batch_size)
+            ).all()
+            if not rows:
+                session.commit()
+                break
+            report['rows'] += _rollup_batch(session, rows)
+            state.value = rows[-1].id
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        report['batches'] += 1
+
+    _state(session, ROLLUP_RUN_STATE).value = int((started - _EPOCH).total_seconds() // 60)
+    session.commit()
+    return report
+
+
+def purge_raw_views(older_than_days: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                    session=None, now: Optional[datetime] = None) -> int:
+    """Zmaže spracované surové zobrazenia staršie ako older_than_days, vráti počet"""
+    session = session or db.session
+    if older_than_days is None:
+        older_than_days = current_app.config.get('INVOICE_VIEWS_RETENTION_DAYS', 90) if has_app_context() else 90
+    cutoff = (now or utcnow()) - timedelta(days=older_than_days)
+    processed = _state(session, ROLLUP_STATE).value
+
+    deleted = 0
+    while True:
+        ids = session.scalars(
+            select(InvoiceView.id)
+            .where(InvoiceView.viewed_at < cutoff, InvoiceView.id <= processed)
+            .order_by(InvoiceView.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        session.execute(delete(InvoiceView).where(InvoiceView.id.in_(ids)))
+        session.commit()
+        deleted += len(ids)
+    session.commit()
+    return deleted
+
+
+def invoice_view_summary(invoice_id: int, days: int = 30, today: Optional[date] = None) -> Dict[str, Any]:
+    """Štatistiky faktúry pre detail - len z agregátov (2 dotazy cez primárne kľúče)"""
+    today = today or utcnow().date()
+    stat = db.session.get(InvoiceViewStats, invoice_id)
+    daily = db.session.execute(
+        select(InvoiceViewDaily.day, InvoiceViewDaily.views, InvoiceViewDaily.unique_viewers)
+        .where(InvoiceViewDaily.invoice_id == invoice_id, InvoiceViewDaily.day > today - timedelta(days=days))
+        .order_by(InvoiceViewDaily.day)
+    ).all()
+    summary = stat.to_dict() if stat else InvoiceViewStats(views=0, unique_viewers=0).to_dict()
+    summary['daily'] = [{'day': day.isoformat(), 'views': views, 'unique_viewers': unique}
+                        for day, views, unique in daily]
+    return summary
+
+
+def user_view_summary(user_id: int, days: int = 30, today: Optional[date] = None):
+    """Denné zobrazenia všetkých faktúr používateľa"""
+    today = today or utcnow().date()
+    rows = db.session.execute(
+        select(UserViewDaily.day, UserViewDaily.views, UserViewDaily.unique_viewers, UserViewDaily.invoices_viewed)
+        .where(UserViewDaily.user_id == user_id, UserViewDaily.day > today - timedelta(days=days))
+        .order_by(UserViewDaily.day)
+    ).all()
+    return [{'day': day.isoformat(), 'views': views, 'unique_viewers': unique, 'invoices_viewed': invoices}
+            for day, views, unique, invoices in rows]